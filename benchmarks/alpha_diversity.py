@@ -0,0 +1,81 @@
+"""
+Benchmark of the vectorized alpha diversity kernel against skbio's per-sample functions,
+the way DiversityMetricsCalculator used to compute them (one `apply` call per row).
+
+Run from the repository root:
+    python -m benchmarks.alpha_diversity --samples 10000 --taxa 5000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from myson_tools.utils.alpha_diversity import alpha_diversity
+
+
+def synthetic_counts(samples: int, taxa: int, density: float, seed: int) -> np.ndarray:
+    """Over-dispersed counts where only `density` of the taxa are observed in each sample."""
+    rng = np.random.default_rng(seed)
+    counts = rng.negative_binomial(n=0.5, p=0.01, size=(samples, taxa)).astype(np.float64)
+    counts[rng.random((samples, taxa)) > density] = 0
+    return counts
+
+
+def skbio_reference(counts: np.ndarray) -> pd.DataFrame:
+    from skbio.diversity.alpha import shannon, simpson
+
+    frame = pd.DataFrame(counts)
+
+    def row_metrics(row):
+        richness = (row > 0).sum()
+        sh = shannon(row.values, base=np.e)
+        return pd.Series({
+            "shannon": sh,
+            "simpson": simpson(row.values),
+            "richness": richness,
+            "evenness": sh / np.log(richness) if richness > 1 else 0,
+        })
+
+    return frame.apply(row_metrics, axis=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized alpha diversity kernel.")
+    parser.add_argument('--samples', type=int, default=10_000)
+    parser.add_argument('--taxa', type=int, default=5_000)
+    parser.add_argument('--density', type=float, default=0.05, help="Fraction of non-zero counts.")
+    parser.add_argument('--reference-samples', type=int, default=500, help="Samples timed with skbio, extrapolated to --samples.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    counts = synthetic_counts(args.samples, args.taxa, args.density, args.seed)
+    print(f"Count matrix: {args.samples} samples × {args.taxa} taxa, {np.count_nonzero(counts)} non-zero")
+
+    start = time.perf_counter()
+    dense = alpha_diversity(counts)
+    dense_time = time.perf_counter() - start
+    print(f"vectorized (dense):  {dense_time:8.3f}s")
+
+    matrix = sparse.csr_matrix(counts)
+    start = time.perf_counter()
+    sparse_result = alpha_diversity(matrix)
+    sparse_time = time.perf_counter() - start
+    print(f"vectorized (sparse): {sparse_time:8.3f}s")
+
+    subset = counts[:args.reference_samples]
+    start = time.perf_counter()
+    reference = skbio_reference(subset)
+    reference_time = (time.perf_counter() - start) * args.samples / len(subset)
+    print(f"skbio row by row:    {reference_time:8.3f}s (extrapolated from {len(subset)} samples)")
+    print(f"speed-up: ×{reference_time / dense_time:.0f} (dense), ×{reference_time / sparse_time:.0f} (sparse)")
+
+    for metric in reference.columns:
+        for name, result in (('dense', dense), ('sparse', sparse_result)):
+            error = np.nanmax(np.abs(result[metric][:len(subset)] - reference[metric].to_numpy()))
+            print(f"max |{name:<6} - skbio| {metric:<9}: {error:.2e}")
+
+
+if __name__ == '__main__':
+    main()
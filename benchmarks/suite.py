@@ -0,0 +1,207 @@
+"""
+Benchmark suite of the pipeline stages on synthetic runs of increasing size: folder
+renaming and sorting, metadata formatting, TSV / QZA extraction and alpha diversity.
+Results are written as JSON so that two runs (e.g. before and after a change) can be compared.
+
+Run from the repository root:
+    python -m benchmarks.suite --tiers small medium --output bench.json
+    python -m benchmarks.suite --tiers small medium --compare bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy
+
+from benchmarks import synthetic
+from myson_tools.command import get_feature_table, get_qza_tables_and_taxonomy
+from myson_tools.command.alpha_div_analysis import DiversityMetricsCalculator
+from myson_tools.command.separate_metadata import format_data
+from myson_tools.utils.extraction import FREQUENCY, LEVELS, output_folder_names, run_extraction
+from myson_tools.utils.folder_manager import rename_barcode_folders, sort_samples_to_patients
+from myson_tools.utils.io_utils import read_data_frame
+
+#? a stage this much slower than in the reference file is reported as a regression (small tiers are noisy)
+REGRESSION_THRESHOLD = 1.25
+
+
+@dataclass(frozen=True, slots=True)
+class Tier:
+    patients: int
+    barcodes_per_patient: int
+    chunks: int
+    reads_per_chunk: int
+    read_length: int
+    taxa: int
+    table_samples: int
+    density: float = 0.05
+
+
+TIERS: dict[str, Tier] = {
+    'small': Tier(patients=4, barcodes_per_patient=2, chunks=2, reads_per_chunk=200, read_length=1500, taxa=300, table_samples=200),
+    'medium': Tier(patients=24, barcodes_per_patient=4, chunks=4, reads_per_chunk=500, read_length=1500, taxa=1500, table_samples=2000),
+    'large': Tier(patients=48, barcodes_per_patient=8, chunks=8, reads_per_chunk=1000, read_length=1500, taxa=5000, table_samples=10000),
+}
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the prints and Rich logging of the timed functions, they would dominate small tiers."""
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def timed(timings: dict[str, float], stage: str, func, *args, **kwargs):
+    with quiet():
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings[stage] = time.perf_counter() - start
+    return result
+
+
+def generate(root: Path, tier: Tier, seed: int) -> dict[str, Path]:
+    """Run tree of one tier : fastq_pass, sample sheets, 2_Results and a merged feature table."""
+    rng = np.random.default_rng(seed)
+    samples = synthetic.make_samples(tier.patients, tier.barcodes_per_patient)
+    paths = {
+        'fastq_pass': root / 'fastq_pass',
+        'sample_sheet': root / 'samples.xlsx',
+        'patient_sheet': root / 'patients.xlsx',
+        'results': root / '2_Results',
+        'feature_table': root / 'merged_absfreq_level7.tsv',
+        'output': root / 'output',
+    }
+    synthetic.write_sample_sheet(paths['sample_sheet'], samples, rng)
+    synthetic.write_patient_sheet(paths['patient_sheet'], samples, rng)
+    synthetic.write_fastq_tree(paths['fastq_pass'], samples, tier.chunks, tier.reads_per_chunk, tier.read_length, rng)
+    synthetic.write_results_tree(paths['results'], samples, tier.taxa, tier.density, rng)
+
+    #? the cohort table reuses the sample sheet ids, cycled up to the wanted number of samples
+    table_samples = [
+        synthetic.Sample(patient=s.patient, sample_id=s.sample_id, barcode=s.barcode + len(samples) * (idx // len(samples)))
+        for idx, s in ((idx, samples[idx % len(samples)]) for idx in range(tier.table_samples))
+    ]
+    synthetic.write_merged_table(paths['feature_table'], table_samples, tier.taxa, tier.density, rng)
+    paths['output'].mkdir()
+    return paths
+
+
+def run_stages(paths: dict[str, Path]) -> dict[str, float]:
+    timings: dict[str, float] = {}
+    sheet = read_data_frame(paths['sample_sheet'])
+    timed(timings, 'rename_barcode_folders', rename_barcode_folders, paths['fastq_pass'], sheet)
+    timed(timings, 'sort_samples_to_patients', sort_samples_to_patients, paths['fastq_pass'], paths['sample_sheet'])
+    timed(timings, 'format_data', format_data, paths['fastq_pass'], pd.read_excel(paths['patient_sheet']))
+
+    levels, frequencies = LEVELS, FREQUENCY
+    timed(
+        timings, 'extract_tsv', run_extraction, paths['results'], get_feature_table.extraction_patterns(levels),
+        output_folder_names(levels, frequencies), paths['output'] / 'tsv', force=True,
+    )
+    timed(
+        timings, 'extract_qza', run_extraction, paths['results'], get_qza_tables_and_taxonomy.extraction_patterns(),
+        output_folder_names(levels, frequencies), paths['output'] / 'qza', force=True,
+    )
+    timed(
+        timings, 'extract_qza_to_tsv', run_extraction, paths['results'], get_feature_table.extraction_patterns(levels, from_qza=True),
+        output_folder_names(levels, frequencies), paths['output'] / 'qza_tsv', force=True,
+    )
+
+    calculator = DiversityMetricsCalculator(
+        str(paths['feature_table']), str(paths['sample_sheet']), str(paths['output'] / 'alpha_diversity.csv'),
+    )
+    timed(timings, 'alpha_diversity', calculator.run)
+    return timings
+
+
+def run_tier(name: str, repeat: int, seed: int) -> dict[str, float]:
+    """Best time of every stage over `repeat` runs, each on a freshly generated tree (the stages move and rename folders)."""
+    best: dict[str, float] = {}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix=f'myson_bench_{name}_') as tmp:
+            paths = generate(Path(tmp), TIERS[name], seed)
+            for stage, seconds in run_stages(paths).items():
+                best[stage] = min(seconds, best.get(stage, float('inf')))
+    return best
+
+
+def environment() -> dict[str, str | int | None]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+    }
+
+
+def compare(results: dict, reference_file: Path, threshold: float = REGRESSION_THRESHOLD) -> int:
+    """Print the ratio of every stage to the reference file, return the number of regressions."""
+    with open(reference_file, 'r', encoding='utf-8') as f:
+        reference = json.load(f)['tiers']
+    regressions = 0
+    print(f"\nComparison with {reference_file} (ratio = new / reference):")
+    for tier, timings in results['tiers'].items():
+        for stage, seconds in timings.items():
+            old = reference.get(tier, {}).get(stage)
+            if old is None:
+                print(f"  {tier:>6} {stage:<26} {seconds:8.3f}s  (no reference)")
+                continue
+            ratio = seconds / old if old > 0 else float('inf')
+            flag = ''
+            if ratio > threshold:
+                flag = '  [REGRESSION]'
+                regressions += 1
+            print(f"  {tier:>6} {stage:<26} {seconds:8.3f}s  vs {old:8.3f}s  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic runs.")
+    parser.add_argument('--tiers', nargs='+', choices=list(TIERS), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per tier, the fastest time of each stage is kept.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, default=None, help="JSON file receiving the results.")
+    parser.add_argument('--compare', type=Path, default=None, help="JSON file of an earlier run to compare against, exits with 1 on a regression.")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help=f"Slowdown ratio reported as a regression (default: {REGRESSION_THRESHOLD}).")
+    args = parser.parse_args()
+
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'parameters': {'repeat': args.repeat, 'seed': args.seed, 'tiers': {name: asdict(TIERS[name]) for name in args.tiers}},
+        'tiers': {},
+    }
+    for name in args.tiers:
+        start = time.perf_counter()
+        results['tiers'][name] = run_tier(name, args.repeat, args.seed)
+        print(f"[OK] Tier '{name}' done in {time.perf_counter() - start:.1f}s")
+        for stage, seconds in results['tiers'][name].items():
+            print(f"  {stage:<26} {seconds:8.3f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"[OK] Results written to {args.output}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Generator of realistic synthetic inputs for the benchmarks: sample sheets, MinKNOW
+`fastq_pass/barcodeNN` trees, `2_Results/Results_*` outputs of MetONTIIME and merged
+feature tables. Everything derives from one seed, so a tier always produces the same tree.
+"""
+import gzip
+import json
+import uuid
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from myson_tools.utils.extraction import COLLAPSE_FOLDER, TAXONOMY_FOLDER
+from myson_tools.utils.feature_tables import SparseFeatureTable, write_sparse_feature_tsv
+from myson_tools.utils.sample_ids import REFERENCE
+from myson_tools.utils.taxonomy_collapse import LineageIndex, collapse_table
+
+RANK_PREFIXES = ('d', 'p', 'c', 'o', 'f', 'g', 's')
+LEVELS = (4, 5, 6, 7)
+FREQUENCIES = ('absfreq', 'relfreq')
+#? how many children each taxon has at the next rank, bounded by the number of level-7 taxa
+BRANCHING = (1, 4, 3, 3, 3, 3, 2)
+
+
+@dataclass(frozen=True, slots=True)
+class Sample:
+    patient: str
+    sample_id: str
+    barcode: int
+
+    @property
+    def barcode_folder(self) -> str:
+        return f'barcode{self.barcode:02d}'
+
+    @property
+    def renamed_folder(self) -> str:
+        """Name given by rename_barcode_folders : barcodeNN-<ID échantillon with '-' for spaces>."""
+        return f"{self.barcode_folder}-{'-'.join(REFERENCE.get(part, part) for part in self.sample_id.split())}"
+
+    @property
+    def patient_folder(self) -> str:
+        return f"Patient_{REFERENCE.get(self.patient, self.patient)}"
+
+
+def make_samples(patients: int, barcodes_per_patient: int, references: bool = True) -> list[Sample]:
+    """Patients P001… with samples 'P001 S1'…, plus one positive and one negative control (T+ / T-)."""
+    samples = []
+    barcode = 1
+    for p in range(1, patients + 1):
+        for s in range(1, barcodes_per_patient + 1):
+            samples.append(Sample(patient=f'P{p:03d}', sample_id=f'P{p:03d} S{s}', barcode=barcode))
+            barcode += 1
+    if references:
+        for tag in ('T+', 'T-'):
+            samples.append(Sample(patient=tag, sample_id=f'{tag} 1', barcode=barcode))
+            barcode += 1
+    return samples
+
+
+def write_sample_sheet(path: Path, samples: list[Sample], rng: np.random.Generator) -> None:
+    """Excel sheet with the columns read by the folder tools and DiversityMetricsCalculator."""
+    pd.DataFrame({
+        'Patient': [s.patient for s in samples],
+        'ID échantillon': [s.sample_id for s in samples],
+        'Barcode': [s.barcode for s in samples],
+        'Prélèvement': rng.choice(['selles', 'salive', 'peau'], len(samples)),
+        'Correpondance numérique': np.arange(1, len(samples) + 1),
+    }).to_excel(path, index=False)
+
+
+def write_patient_sheet(path: Path, samples: list[Sample], rng: np.random.Generator) -> None:
+    """Excel sheet keyed by '#patientID', as read by separate_metadata."""
+    patients = sorted({s.patient for s in samples})
+    pd.DataFrame({
+        '#patientID': patients,
+        'Age': rng.integers(18, 90, len(patients)),
+        'Sexe': rng.choice(['F', 'M'], len(patients)),
+        'Site': rng.choice(['Cayenne', 'Kourou', 'Saint-Laurent'], len(patients)),
+    }).to_excel(path, index=False)
+
+
+def _fastq_chunk(reads: int, read_length: int, rng: np.random.Generator) -> bytes:
+    bases = np.frombuffer(b'ACGT', dtype=np.uint8)[rng.integers(0, 4, (reads, read_length))]
+    qualities = (rng.integers(5, 40, (reads, read_length)) + 33).astype(np.uint8)
+    lines = []
+    for idx in range(reads):
+        lines.append(f'@{uuid.UUID(int=int(rng.integers(0, 2**63)))} runid=synthetic read={idx}\n'.encode())
+        lines.append(bases[idx].tobytes() + b'\n+\n' + qualities[idx].tobytes() + b'\n')
+    return b''.join(lines)
+
+
+def write_fastq_tree(fastq_pass: Path, samples: list[Sample], chunks: int, reads_per_chunk: int,
+                     read_length: int, rng: np.random.Generator) -> None:
+    """`fastq_pass/barcodeNN/` folders of gzip chunks named like MinKNOW's (`FAX00000_pass_barcodeNN_<run>_<i>.fastq.gz`)."""
+    for sample in samples:
+        folder = fastq_pass / sample.barcode_folder
+        folder.mkdir(parents=True, exist_ok=True)
+        for chunk in range(chunks):
+            with gzip.open(folder / f'FAX00000_pass_{sample.barcode_folder}_synthetic_{chunk}.fastq.gz', 'wb', compresslevel=1) as f:
+                f.write(_fastq_chunk(reads_per_chunk, read_length, rng))
+
+
+def make_lineages(taxa: int, rng: np.random.Generator) -> list[str]:
+    """`taxa` distinct level-7 lineages sharing their higher ranks like a real community."""
+    lineages = set()
+    while len(lineages) < taxa:
+        parts, node = [], 0
+        for rank, prefix in enumerate(RANK_PREFIXES):
+            node = node * BRANCHING[rank] + int(rng.integers(0, BRANCHING[rank] * (1 + rank)))
+            parts.append(f'{prefix}__{prefix.upper()}{node}')
+        lineages.add(';'.join(parts))
+    return sorted(lineages)
+
+
+def make_counts(lineages: list[str], samples: list[str], density: float, rng: np.random.Generator) -> SparseFeatureTable:
+    """Over-dispersed level-7 counts (taxa × samples) where only `density` of the taxa are seen per sample."""
+    counts = rng.negative_binomial(n=0.5, p=0.01, size=(len(lineages), len(samples))).astype(np.float64)
+    counts[rng.random(counts.shape) > density] = 0
+    return SparseFeatureTable(features=list(lineages), samples=list(samples), matrix=sparse.csr_matrix(counts))
+
+
+def write_qza(path: Path, table: SparseFeatureTable, semantic_type: str) -> None:
+    """Artifact holding the table as a BIOM 1.0 (JSON) payload, readable by qza_reader."""
+    coo = table.matrix.tocoo()
+    biom = {
+        'id': None,
+        'format': 'Biological Observation Matrix 1.0.0',
+        'type': 'OTU table',
+        'matrix_type': 'sparse',
+        'shape': list(table.matrix.shape),
+        'rows': [{'id': f, 'metadata': None} for f in table.features],
+        'columns': [{'id': s, 'metadata': None} for s in table.samples],
+        'data': np.column_stack([coo.row, coo.col, coo.data]).tolist(),
+    }
+    artifact = str(uuid.uuid4())
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(f'{artifact}/metadata.yaml', f'uuid: {artifact}\ntype: {semantic_type}\nformat: BIOMV100DirFmt\n')
+        archive.writestr(f'{artifact}/data/feature-table.biom', json.dumps(biom))
+
+
+def write_taxonomy_qza(path: Path, lineages: list[str]) -> None:
+    artifact = str(uuid.uuid4())
+    rows = ''.join(f'{idx}\t{lineage}\t0.99\n' for idx, lineage in enumerate(lineages))
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(f'{artifact}/metadata.yaml', f'uuid: {artifact}\ntype: FeatureData[Taxonomy]\nformat: TSVTaxonomyDirectoryFormat\n')
+        archive.writestr(f'{artifact}/data/taxonomy.tsv', 'Feature ID\tTaxon\tConfidence\n' + rows)
+
+
+def write_results_tree(results_dir: Path, samples: list[Sample], taxa: int, density: float, rng: np.random.Generator) -> None:
+    """
+    One `Results_Patient_<id>` per patient, as left by MetONTIIME : collapsed tables of
+    every level and frequency in collapseTables (.tsv and .qza) and the taxonomy artifact.
+    """
+    lineages = make_lineages(taxa, rng)
+    index = LineageIndex(lineages)
+    by_patient: dict[str, list[Sample]] = {}
+    for sample in samples:
+        by_patient.setdefault(sample.patient, []).append(sample)
+
+    for patient, patient_samples in by_patient.items():
+        folder = results_dir / f"Results_{patient_samples[0].patient_folder}"
+        (folder / COLLAPSE_FOLDER).mkdir(parents=True, exist_ok=True)
+        (folder / TAXONOMY_FOLDER).mkdir(parents=True, exist_ok=True)
+        level7 = make_counts(lineages, [s.renamed_folder for s in patient_samples], density, rng)
+        for level in LEVELS:
+            for freq in FREQUENCIES:
+                table = collapse_table(level7, level, relative=freq == 'relfreq', index=index)
+                stem = folder / COLLAPSE_FOLDER / f'collapsed_table-{freq}-level{level}'
+                write_sparse_feature_tsv(table, stem.with_suffix('.tsv'))
+                write_qza(stem.with_suffix('.qza'), table, 'FeatureTable[RelativeFrequency]' if freq == 'relfreq' else 'FeatureTable[Frequency]')
+        write_taxonomy_qza(folder / TAXONOMY_FOLDER / 'taxonomy.qza', lineages)
+
+
+def write_merged_table(path: Path, samples: list[Sample], taxa: int, density: float, rng: np.random.Generator) -> None:
+    """A cohort level-7 absfreq table, as produced by merging the per-patient tables."""
+    table = make_counts(make_lineages(taxa, rng), [s.renamed_folder for s in samples], density, rng)
+    write_sparse_feature_tsv(table, path)
@@ -25,6 +25,8 @@ from myson_tools.utils import (
 
 console = Console()
 console_err = Console(stderr=True)
+#? --timings / --profile / --quiet / --verbose given to the menu, appended to every Python tool it launches
+tool_args: list[str] = []
 
 colors = [
     "#66CCFF",
@@ -84,8 +86,13 @@ def display_menu():
         "9.  Get QZA tables and taxonomy",
         "10. Get feature tables",
         "11. Alpha diversity analysis",
-        "12. Help",
-        "13. Exit"
+        "12. Merge feature tables (native, without QIIME 2)",
+        "13. Beta diversity analysis",
+        "14. Audit results (completeness and integrity)",
+        "15. Filter reads (length and quality, before MetONTIIME)",
+        "16. Compress FASTQ files (raw data, before MetONTIIME)",
+        "17. Help",
+        "18. Exit"
     ]
     for option in options:
         menu_text.append(f"{option}\n", style="bold cyan")
@@ -98,14 +105,19 @@ help_texts = {
     "3" : "Move patient folders: Sorts and moves sample files into their respective patient folders based on Excel data. You can specify the Excel file, the folder, and/or a configuration file. Ensures that all samples are correctly grouped for each patient.",
     "4" : "Launch MetONTIIME pipeline: Runs the MetONTIIME bioinformatics pipeline for all patient folders in a given directory. Requires the main data directory (pathDir), and optionally the working directory, metadata file, resume flag, and skip list. Automates multi-sample analysis workflows.",
     "5" : "Launch MetONTIIME pipeline: Runs the MetONTIIME bioinformatics pipeline for all barcode folders in a given patient directory. Requires the main data directory (pathDir), and optionally the working directory. Automates multi-sample analysis workflows for failed runs.",
-    "6" : "Separate metadata: Generates a metadata.tsv file for your samples, based on the folder structure and an Excel file. Requires the folder path and optionally allows force-overwriting existing files. Ensures your metadata is ready for downstream tools.",
+    "6" : "Separate metadata: Generates a metadata.tsv file for your samples, based on the folder structure and an Excel file. Requires the folder path, or can process every run under BASE_DIR at once (the Excel file is read once and runs are handled in parallel), and optionally allows force-overwriting existing files. Ensures your metadata is ready for downstream tools.",
     "7" : "Generate skip list: Scans a directory and generates a skip list file containing the names of all subfolders. Requires the path to the directory. Useful for excluding certain folders from batch analyses or pipelines.",
     "8" : "Merge tables: Combines multiple data tables (e.g., feature tables, metadata) into a single unified table. Useful for aggregating results from different runs or experiments into one file for easier comparison and downstream analysis. Runs inside the QIIME2 conda environment.",
     "9" : "Get QZA tables and taxonomy: Extracts QIIME2 artifact (QZA) tables and taxonomy assignments from your analysis results. This helps you retrieve processed data and taxonomic classifications for further exploration or reporting.",
     "10": "Get feature table: Extracts TSV feature tables by level and frequency from your analysis results (located in the collapseTables folder), specifically the absolute frequency (absfreq) and relative frequency (relfreq) for levels 4 through 7.",
-    "11": "Alpha diversity analysis: Calculates alpha diversity metrics (Shannon, Simpson, richness, evenness) from a feature table and metadata. Prompts for a TSV feature table, Excel metadata file, and optional output file. Outputs a merged CSV with all metrics and metadata for each sample.",
-    "12": "Help: Show this help panel with detailed descriptions for each menu option.",
-    "13": "Exit: Quit the program and return to your shell. Use this option when you are done with your session.",
+    "11": "Alpha diversity analysis: Calculates alpha diversity metrics (Shannon, Simpson, richness, evenness) from a feature table and metadata. Prompts for a TSV (or QZA) feature table, or a folder / glob of tables such as the frequency_level folders, an Excel metadata file, and an output directory. Outputs a merged CSV with all metrics and metadata for each sample, plus a combined long-format CSV tagged with level and frequency when several tables are given. An optional rarefaction depth averages the metrics over random subsamples and exports rarefaction curves. Per-sample results are cached in the output directory, so re-running on a grown table only computes the new or changed samples. Optionally compares the metrics between patients and sample types (Kruskal–Wallis / Mann–Whitney with permutation p-values).",
+    "12": "Merge feature tables (native): Merges the per-patient TSV tables produced by option 10 (the frequency_level folders) into one table per level and frequency. Runs in pure Python with sparse matrices, so no QIIME2 conda environment is needed and hundreds of patients merge in seconds.",
+    "13": "Beta diversity analysis: Computes Bray–Curtis and Jaccard distance matrices between the samples of a TSV (or QZA) feature table. Distances are computed in blocks across all CPUs and written as memory-mapped condensed matrices (.npy, scipy pdist layout), so cohorts of tens of thousands of samples fit in RAM. A square TSV can also be written for smaller tables.",
+    "14": "Audit results: Checks every Results_<folder> of a run's 2_Results before extraction or merging. Verifies that the collapseTables and assignTaxonomy artifacts exist, and that each QZA archive is a valid zip whose content matches its CRCs (catches archives truncated by a full disk). Writes a JSON report and a skip list of the complete folders, usable with the launcher's skip file option.",
+    "15": "Filter reads: Drops the reads of every barcode that are outside a length window or below a mean quality before MetONTIIME classifies them. The FASTQ chunks of each barcode are streamed once and the kept reads written to one compressed file per barcode, in a staging folder (fastq_staged by default) that mirrors fastq_pass; raw data is never modified. A read cap per barcode can also be set: very deep barcodes are then downsampled to a uniform, reproducible sample of the reads passing the filters. Barcodes are filtered in parallel and the kept / dropped counts of each are written to read_filter_stats.tsv. Use the staging folder as the WorkDir of options 4 and 5.",
+    "16": "Compress FASTQ files: Compresses the uncompressed .fastq files of every barcode of a fastq_pass folder to BGZF (gzip compatible, as written by bgzip), in place. Barcodes are compressed in parallel and the blocks of each file on several threads. Each compressed file is checked to decompress to the original bytes before the original is removed. Reports the space saved and the read time saved for Nextflow and Docker.",
+    "17": "Help: Show this help panel with detailed descriptions for each menu option.",
+    "18": "Exit: Quit the program and return to your shell. Use this option when you are done with your session.",
 }
 
 def display_help_panel():
@@ -245,6 +257,7 @@ def run_python_tool(module: str, args: list | None = None, description: str = "R
     cmd = [sys.executable, '-m', module]
     if args:
         cmd += args
+    cmd += tool_args
     if subprocess_fn:
         subprocess_fn(cmd)
     else:
@@ -258,6 +271,29 @@ def parse_args() -> argparse.Namespace:
         action='store_true',
         help='Enable using relative .env file for devs'
     )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Print the per-stage timings (wall, CPU, peak memory, I/O) of every tool run from the menu'
+    )
+    parser.add_argument(
+        '--profile',
+        type=Path,
+        default=None,
+        metavar='DIR',
+        help='Run every tool under cProfile, writing <tool>_<timestamp>.prof files to DIR (implies --timings)'
+    )
+    levels = parser.add_mutually_exclusive_group()
+    levels.add_argument(
+        '--quiet',
+        action='store_true',
+        help='Only print errors, warnings and the summary of every tool (per-item lines go to their log file)'
+    )
+    levels.add_argument(
+        '--verbose',
+        action='store_true',
+        help='Print one line per folder, file or sample processed by every tool'
+    )
 
     return parser.parse_args()
 
@@ -266,6 +302,14 @@ def main():
     sys.stdout.reconfigure(encoding='utf-8')  # type: ignore
     console.print(Align.center(gradient_text(ASCII_ART, colors)))
     args = parse_args()
+    if args.timings:
+        tool_args.append('--timings')
+    if args.profile:
+        tool_args.extend(['--profile', str(args.profile.absolute())])
+    if args.quiet:
+        tool_args.append('--quiet')
+    if args.verbose:
+        tool_args.append('--verbose')
 
     if args.dev_env:
         load_dotenv()
@@ -282,20 +326,104 @@ def main():
         )
     while True:
         display_menu()
-        choice = Prompt.ask("[bold white]Enter your choice[/]", choices=[str(i) for i in range(1, 14)])
-        if choice == '13':
+        choice = Prompt.ask("[bold white]Enter your choice[/]", choices=[str(i) for i in range(1, 19)])
+        if choice == '18':
             console.print("[bold red]👋 Goodbye![/bold red] [dim]See you next time![/dim]")
             break
-        elif choice == '12':
+        elif choice == '17':
             display_help_panel()
             continue
+        elif choice == '16':
+            # Compress FASTQ files
+            fastq_pass = prompt_for_path("Path to the fastq_pass folder")
+            keep = Prompt.ask("Keep the original .fastq files (moved to fastq_uncompressed next to fastq_pass)?", choices=["yes", "no"], default="no")
+            args = ['-i', fastq_pass]
+            if keep == "yes":
+                args.append('--keep')
+
+            run_python_tool(
+                module="myson_tools.command.compress_fastq",
+                args=args,
+                description="🗜️ Compressing FASTQ files..."
+            )
+            continue
+        elif choice == '15':
+            # Filter reads
+            fastq_pass = prompt_for_path("Path to the fastq_pass folder")
+            output_dir = prompt_for_path("Staging folder (leave blank for fastq_staged next to fastq_pass)", optional=True)
+            min_length = Prompt.ask("Minimum read length", default="0")
+            max_length = Prompt.ask("Maximum read length (leave empty for no limit)", default="")
+            min_quality = Prompt.ask("Minimum mean read quality (Phred)", default="0")
+            max_reads = Prompt.ask("Maximum reads per barcode (leave empty for no cap)", default="")
+            args = ['-i', fastq_pass, '--min-length', min_length, '--min-quality', min_quality]
+            if output_dir:
+                args += ['-o', output_dir]
+            if max_length.strip():
+                args += ['--max-length', max_length.strip()]
+            if max_reads.strip():
+                args += ['--max-reads', max_reads.strip()]
+
+            run_python_tool(
+                module="myson_tools.command.filter_reads",
+                args=args,
+                description="✂️ Filtering reads..."
+            )
+            continue
+        elif choice == '14':
+            # Audit results
+            path_dir = prompt_for_path("Path to run directory (ex: 241126_ICMc..etc)")
+            output_dir = prompt_for_path("Enter an output directory for the audit report and skip list")
+            args = ['--path-dir', path_dir, '--output', output_dir]
+
+            run_python_tool(
+                module="myson_tools.command.audit_results",
+                args=args,
+                description="🔎 Auditing results folders..."
+            )
+            continue
+        elif choice == '13':
+            # Beta diversity analysis
+            feature_table = prompt_for_path("Enter the path to the TSV (or QZA) feature table file")
+            output_dir = prompt_for_path("Enter the output directory for the distance matrices (if it doesn't exist, it will be created)")
+            tsv = Prompt.ask("Also write square TSV matrices?", choices=["yes", "no"], default="no")
+
+            args = ["-f", feature_table, "-o", output_dir]
+            if tsv == "yes":
+                args.append("--tsv")
+
+            run_python_tool(
+                module="myson_tools.command.beta_div_analysis",
+                args=args,
+                description="Computing beta diversity distance matrices..."
+            )
+            continue
+        elif choice == '12':
+            # Merge feature tables natively
+            folder = prompt_for_path("Enter the directory containing the frequency_level folders (output of option 10)")
+            output_dir = prompt_for_path("Enter the directory to output the merged tables (if it doesn't exist, it will be created)")
+            overlap = Prompt.ask("Samples present in several tables?", choices=["error", "sum"], default="error")
+
+            args = ["--folder", folder, "--output", output_dir, "--overlap", overlap]
+            run_python_tool(
+                module="myson_tools.command.merge_feature_tables",
+                args=args,
+                description="Merging feature tables..."
+            )
+            continue
         elif choice == '11':
             # Alpha diversity analysis
-            feature_table = prompt_for_path("Enter the path to the TSV feature table file")
+            feature_table = prompt_for_path("Enter the path to the TSV (or QZA) feature table file, or a folder of feature tables")
             metadata = prompt_for_path("Enter the path to the Excel metadata file")
             output_file = prompt_for_path("Enter the output directory. Output filename will be <feature_table_basename>_alpha_diversity_merged.csv")
 
+            rarefy = Prompt.ask("Rarefaction depth (leave empty for raw counts)", default="")
+
             args = ["-f", feature_table, "-m", metadata, "-o", output_file]
+            if rarefy.strip().isdigit():
+                args += ["--rarefy", rarefy.strip(), "--curve"]
+            group_tests = Prompt.ask("Compare the metrics between Patient / Prélèvement groups?", choices=["yes", "no"], default="no")
+            if group_tests == "yes":
+                args.append("--group-tests")
 
             run_python_tool(
                 module="myson_tools.command.alpha_div_analysis",
@@ -450,9 +578,13 @@ def main():
             continue
         elif choice == '6':
             # Separate metadata
-            folder_path = prompt_for_path("Folder path (--folder-path, required)")
+            all_runs = Prompt.ask("Generate the metadata of every run under BASE_DIR?", choices=["yes", "no"], default="no")
+            if all_runs == "yes":
+                args = ['--all-runs']
+            else:
+                folder_path = prompt_for_path("Folder path (--folder-path, required)")
+                args = ['-p', folder_path]
             force = Prompt.ask("Force overwrite if exists?", choices=["yes", "no"], default="no")
-            args = ['-p', folder_path]
             if force == "yes":
                 args.append('--force')
 
@@ -1,28 +1,75 @@
-from skbio.diversity.alpha import shannon, simpson
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from math import log
 import pandas as pd
-import numpy as np
 import argparse
+import glob
+import os
+import re
 import sys
 
+from myson_tools.utils import metrics as textfile_metrics
+from myson_tools.utils.abundance_store import DICTIONARY_FILENAME
+from myson_tools.utils.alpha_cache import CACHE_FILENAME, cached_alpha_diversity, load_alpha_cache, save_alpha_cache
+from myson_tools.utils.alpha_diversity import METRICS, alpha_diversity
+from myson_tools.utils.group_tests import DEFAULT_GROUPINGS, DEFAULT_PERMUTATIONS, GroupTestSettings, group_tests
+from myson_tools.utils.batch_output import add_output_arguments, item, output_run
+from myson_tools.utils.feature_tables import find_freq_level_folders
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
+from myson_tools.utils.rarefaction import DEFAULT_CURVE_STEPS, DEFAULT_ITERATIONS, RarefactionSettings, depth_grid, rarefaction_curves, rarefied_alpha
+from myson_tools.utils.sample_ids import compact_ids, parse_sample_ids
+from myson_tools.utils.table_loader import TABLE_EXTENSIONS, load_feature_matrix, read_id_list
+
+METADATA_COLUMNS = ["sample_code", "Patient", "Prélèvement", "Correpondance numérique"]
+COMBINED_FILENAME = "alpha_diversity_combined.csv"
+#? matches both the <freq>_<level> folders and the merged-<freq>-<level> / <freq>_<level>.npz files
+FREQ_LEVEL_TAG = re.compile(r'(?P<freq>absfreq|relfreq)[-_](?P<level>level\d+)')
+
+#? metadata and options read once by the parent and handed to each worker process at start-up
+_worker_metadata = None
+_worker_rarefaction = None
+_worker_curve_depths = None
+_worker_cache = None
+_worker_group_tests = None
+
 class DiversityMetricsCalculator:
-    def __init__(self, feature_table_path, metadata_path, output_path):
+    def __init__(self, feature_table_path, metadata_path, output_path, metadata=None, rarefaction=None, curve_depths=None,
+                 samples=None, taxa=None, cache=None, group_tests=None, label=None):
         self.feature_table_path = feature_table_path
         self.metadata_path = metadata_path
         self.output_path = output_path
+        #? prefix of the curve and group test files, distinct for tables of the same name in a batch
+        self.label = label or Path(feature_table_path).stem
+        #? optional selection of sample / taxon ids, only these are loaded
+        self.samples = samples
+        self.taxa = taxa
+        #? per-sample results of earlier runs, keyed by count fingerprint (None : no cache)
+        self.cache = cache
+        self.new_cache_entries = {}
+        self.computed_samples = 0
+        self.group_tests = group_tests
+        self.test_results = None
+        self.rarefaction = rarefaction
+        #? None : no rarefaction curve, [] : automatic depth grid
+        self.curve_depths = curve_depths
         self.feature_table = None
-        self.meta_seq = None
+        self.sample_codes = None
+        self.metrics = None
+        self.meta_seq = metadata
         self.merged = None
         self.final_df = None
 
     def load_feature_table(self):
         try:
-            df = pd.read_csv(self.feature_table_path, sep="\t", skiprows=[0])
-            df = df.set_index("#OTU ID").T
+            table = load_feature_matrix(Path(self.feature_table_path), samples=self.samples, taxa=self.taxa)
+            #? samples as rows, taxa as columns, sharing the loaded array (no copy)
+            df = pd.DataFrame(table.counts, index=table.samples, columns=table.features, copy=False)
             df.index.name = "#Sample_ID"
-            df["sample_code"] = df.index.map(self.extract_sample_code)
             self.feature_table = df
+            self.sample_codes = parse_sample_ids(df.index)['sample_code'].to_numpy()
+            item('load', 'OK', (
+                f"{self.label}: {len(table.samples)} samples × {len(table.features)} taxa "
+                f"({table.counts.dtype}, {table.engine}), peak memory {table.peak_memory_mb:.0f} MB"
+            ))
         except FileNotFoundError:
             raise FileNotFoundError(f"❌ Feature table file not found: {self.feature_table_path}")
         except pd.errors.ParserError as e:
@@ -31,107 +78,343 @@ class DiversityMetricsCalculator:
             raise RuntimeError(f"❌ Unexpected error while loading feature table: {e}")
 
     def load_metadata(self):
-        try:
-            meta = pd.read_excel(self.metadata_path)
-            meta["ID échantillon"] = meta["ID échantillon"].astype(str)\
-                .str.replace("\u00A0", "", regex=False)\
-                .str.replace(" ", "")\
-                .str.strip()
-            self.meta_seq = meta
-        except FileNotFoundError:
-            raise FileNotFoundError(f"❌ Metadata file not found: {self.metadata_path}")
-        except ValueError as e:
-            raise ValueError(f"❌ Failed to read Excel file: {e}")
-        except Exception as e:
-            raise RuntimeError(f"❌ Unexpected error while loading metadata: {e}")
+        if self.meta_seq is None:
+            self.meta_seq = load_metadata(self.metadata_path)
 
 
-    def extract_sample_code(self, s):
-        return "".join(s.split("-")[1:]).strip().replace("\u00A0", "")
+    def counts(self):
+        return self.feature_table.to_numpy(copy=False)
+
+    def calculate_diversity_metrics(self):
+        """Metrics of every sample from the count matrix alone, before the metadata join."""
+        if (self.rarefaction is None or self.rarefaction.depth is None) and self.cache is not None:
+            metrics, self.new_cache_entries = cached_alpha_diversity(self.counts(), list(self.feature_table.columns), self.cache)
+            self.computed_samples = len(self.new_cache_entries)
+            reused = len(self.feature_table) - self.computed_samples
+            item('cache', 'OK', f"{self.label}: {reused}/{len(self.feature_table)} samples reused from the cache, {self.computed_samples} computed")
+        elif self.rarefaction is None or self.rarefaction.depth is None:
+            metrics = alpha_diversity(self.counts())
+            self.computed_samples = len(self.feature_table)
+        else:
+            #? rarefied metrics are not cached : the random draws of a sample depend on the whole table
+            rarefied = rarefied_alpha(self.counts(), self.rarefaction)
+            metrics = dict(rarefied.mean)
+            metrics.update({f"{name}_sd": values for name, values in rarefied.std.items()})
+            self.computed_samples = len(self.feature_table)
+        self.metrics = pd.DataFrame(metrics, index=self.feature_table.index)
+        self.metrics.insert(0, "sample_code", self.sample_codes)
+
+    def metric_columns(self):
+        return [col for col in self.metrics.columns if col != "sample_code"]
+
+    def export_rarefaction_curve(self):
+        """Long-format curve (sample_code, depth, metric, mean, sd) next to the merged CSV."""
+        counts = self.counts()
+        depths = self.curve_depths or depth_grid(counts)
+        curves = rarefaction_curves(counts, depths, self.rarefaction or RarefactionSettings(depth=None))
+
+        frames = []
+        for curve in curves:
+            for name in METRICS:
+                frames.append(pd.DataFrame({
+                    "sample_code": self.sample_codes,
+                    "depth": curve.depth,
+                    "metric": name,
+                    "mean": curve.mean[name].round(3),
+                    "sd": curve.std[name].round(3),
+                }))
+        curve_path = Path(self.output_path).with_name(f"{self.label}_rarefaction_curve.csv")
+        pd.concat(frames, ignore_index=True).to_csv(curve_path, index=False, na_rep="N/A")
+        item('export', 'OK', f"Rarefaction curve exported : {curve_path}")
 
     def merge_data(self):
-        self.merged = self.feature_table.merge(
+        self.merged = self.metrics.merge(
             self.meta_seq,
             left_on="sample_code",
             right_on="ID échantillon",
             how="left"
         )
 
-    def richness(self, row):
-        return (row > 0).sum()
-
-    def evenness(self, row):
-        r = self.richness(row)
-        sh = shannon(row.values, base=np.e)
-        return sh / log(r) if r > 1 else 0
-
-    def calculate_diversity_metrics(self):
-        abundance_cols = self.feature_table.columns.difference(["sample_code"])
-
-        self.merged[["shannon", "simpson", "richness", "evenness"]] = self.merged[abundance_cols].apply(
-            lambda row: pd.Series({
-                "shannon": shannon(row.values, base=np.e),
-                "simpson": simpson(row.values),
-                "richness": self.richness(row),
-                "evenness": self.evenness(row)
-            }), axis=1
-        )
-
     def format_and_export(self):
-        for col in ["shannon", "simpson", "richness", "evenness"]:
+        for col in self.metric_columns():
             self.merged[col] = self.merged[col].round(3)
 
-        self.merged.fillna("N/A", inplace=True)
+        self.merged = self.merged.astype(object).fillna("N/A")
 
-        self.final_df = self.merged[[
-            "sample_code", "Patient", "Prélèvement", "Correpondance numérique",
-            "shannon", "simpson", "richness", "evenness"
-        ]]
+        self.final_df = self.merged[METADATA_COLUMNS + self.metric_columns()]
 
         self.final_df.to_csv(self.output_path, index=False)
-        print(f"✅ Final file exported : {self.output_path}")
+        item('export', 'OK', f"Final file exported : {self.output_path}")
+
+    def run_group_tests(self):
+        """Kruskal–Wallis / Mann–Whitney and permutation tests of the metrics between metadata groups, next to the merged CSV."""
+        self.test_results = group_tests(self.merged, list(METRICS), self.group_tests)
+        tests_path = Path(self.output_path).with_name(f"{self.label}_group_tests.csv")
+        self.test_results.to_csv(tests_path, index=False, na_rep="N/A")
+        item('export', 'OK', f"Group tests exported : {tests_path}")
 
     def run(self):
-        self.load_feature_table()
-        self.load_metadata()
-        self.merge_data()
-        self.calculate_diversity_metrics()
-        self.format_and_export()
+        with stage("load"):
+            self.load_feature_table()
+            self.load_metadata()
+        with stage("compute"):
+            self.calculate_diversity_metrics()
+            self.merge_data()
+        with stage("write"):
+            self.format_and_export()
+        if self.curve_depths is not None:
+            with stage("rarefaction curve"):
+                self.export_rarefaction_curve()
+        if self.group_tests is not None:
+            with stage("group tests"):
+                self.run_group_tests()
+
+def load_metadata(metadata_path):
+    try:
+        meta = pd.read_excel(metadata_path)
+        meta["ID échantillon"] = compact_ids(meta["ID échantillon"]).to_numpy()
+        return meta
+    except FileNotFoundError:
+        raise FileNotFoundError(f"❌ Metadata file not found: {metadata_path}")
+    except ValueError as e:
+        raise ValueError(f"❌ Failed to read Excel file: {e}")
+    except Exception as e:
+        raise RuntimeError(f"❌ Unexpected error while loading metadata: {e}")
+
+
+def is_feature_table(path: Path) -> bool:
+    return path.is_file() and path.suffix.lower() in TABLE_EXTENSIONS and path.name != DICTIONARY_FILENAME
+
+
+def resolve_feature_tables(spec: str) -> list[Path]:
+    """
+    Feature tables designated by `spec` : a single file, a glob pattern or a directory.
+    In the output of get_feature_table, only the TSV tables of its <freq>_<level> folders
+    are taken (not the taxon dictionary, nor the .npz stores that hold the same counts);
+    any other directory gives the tables it contains, of the first extension found.
+    """
+    path = Path(spec)
+    if path.is_file():
+        return [path]
+    if path.is_dir():
+        folders = find_freq_level_folders(path)
+        if folders:
+            return sorted(table for tables in folders.values() for table in tables if is_feature_table(table))
+        candidates = [p for p in path.iterdir() if is_feature_table(p)]
+        for extension in TABLE_EXTENSIONS:
+            tables = sorted(p for p in candidates if p.suffix.lower() == extension)
+            if tables:
+                return tables
+        return []
+    if glob.has_magic(spec):
+        return sorted(p for p in map(Path, glob.glob(spec, recursive=True)) if is_feature_table(p))
+    return []
+
+
+def table_labels(tables: list[Path]) -> dict[Path, str]:
+    """
+    Name of every table in the outputs : its path below the folder common to all tables,
+    without extension and with '_' for '/', so that tables of the same name in different
+    <freq>_<level> folders do not overwrite each other.
+    """
+    root = Path(os.path.commonpath([table.parent for table in tables]))
+    return {table: '_'.join(table.relative_to(root).with_suffix('').parts) for table in tables}
+
+
+def table_tags(table: Path) -> tuple[str, str]:
+    """(frequency, level) of a table, taken from its name or else from its folder name."""
+    for name in (table.stem, table.parent.name):
+        match = FREQ_LEVEL_TAG.search(name)
+        if match:
+            return match['freq'], match['level']
+    return 'N/A', 'N/A'
+
+
+def output_path_for(label: str, output_dir: Path) -> Path:
+    return output_dir / f"{label}_alpha_diversity_merged.csv"
+
+
+def _init_worker(metadata: pd.DataFrame, rarefaction: RarefactionSettings | None, curve_depths: list[int] | None,
+                 cache: dict[str, list[float]] | None, tests: GroupTestSettings | None) -> None:
+    global _worker_metadata, _worker_rarefaction, _worker_curve_depths, _worker_cache, _worker_group_tests
+    _worker_metadata = metadata
+    _worker_rarefaction = rarefaction
+    _worker_curve_depths = curve_depths
+    _worker_cache = cache
+    _worker_group_tests = tests
+
+
+def record_samples(total: int, computed: int) -> None:
+    textfile_metrics.inc("alpha_samples_total", computed, source="computed")
+    textfile_metrics.inc("alpha_samples_total", total - computed, source="cache")
+
+
+def analyse_table(table: Path, label: str, output_dir: Path) -> tuple[pd.DataFrame, dict[str, list[float]], tuple[int, int]]:
+    """
+    Run the calculator on one table and return its metrics in long format, tagged with the
+    table's frequency and level, with the cache entries of the samples it computed and
+    its (samples, computed samples) counts.
+    """
+    calculator = DiversityMetricsCalculator(
+        feature_table_path=str(table),
+        metadata_path=None,
+        output_path=str(output_path_for(label, output_dir)),
+        metadata=_worker_metadata,
+        rarefaction=_worker_rarefaction,
+        curve_depths=_worker_curve_depths,
+        cache=_worker_cache,
+        group_tests=_worker_group_tests,
+        label=label
+    )
+    calculator.run()
+
+    freq, level = table_tags(table)
+    long_df = calculator.final_df.melt(id_vars=METADATA_COLUMNS, value_vars=calculator.metric_columns(), var_name="metric", value_name="value")
+    long_df.insert(0, "table", label)
+    long_df.insert(1, "frequency", freq)
+    long_df.insert(2, "level", level)
+    return long_df, calculator.new_cache_entries, (len(calculator.feature_table), calculator.computed_samples)
+
+
+def run_batch(tables: list[Path], metadata_path: str, output_dir: Path, workers: int | None,
+              rarefaction: RarefactionSettings | None = None, curve_depths: list[int] | None = None, use_cache: bool = True,
+              tests: GroupTestSettings | None = None) -> None:
+    """
+    Brief
+    -------------
+    Alpha diversity of several feature tables in one go : the Excel metadata is read once,
+    the tables are processed in parallel, and besides the per-table CSVs a combined
+    long-format file (one row per table, sample and metric) is written in `output_dir`.
+
+    The workers only read the cache, their new entries are merged and saved here once.
+    """
+    with stage("load"):
+        metadata = load_metadata(metadata_path)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        cache_path = output_dir / CACHE_FILENAME
+        cache = load_alpha_cache(cache_path) if use_cache else None
+
+    results = []
+    #? tables are already spread over the pool, the rarefaction iterations and permutations of each table run inline
+    if rarefaction is not None:
+        rarefaction = RarefactionSettings(rarefaction.depth, rarefaction.iterations, rarefaction.seed, workers=1)
+    if tests is not None:
+        tests = GroupTestSettings(tests.groupings, tests.permutations, tests.seed, workers=1)
+    with stage("compute"), ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(metadata, rarefaction, curve_depths, cache, tests)) as pool:
+        labels = table_labels(tables)
+        futures = {table: pool.submit(analyse_table, table, labels[table], output_dir) for table in tables}
+        for table, future in futures.items():
+            try:
+                long_df, new_entries, (total, computed) = future.result()
+                results.append(long_df)
+                if cache is not None:
+                    cache.update(new_entries)
+                record_samples(total, computed)
+                textfile_metrics.inc("alpha_tables_total", status="ok")
+                #? the workers' own lines stay in their process, the table's outcome is recorded here
+                item('analyse', 'OK', f"{labels[table]}: {total} samples, {computed} computed")
+            except Exception as e:
+                item('analyse', 'ERROR', f"{table}: {e}")
+                textfile_metrics.inc("alpha_tables_total", status="failed")
+
+    if not results:
+        print("[ERROR] No feature table could be analysed.", file=sys.stderr)
+        exit(1)
+
+    with stage("write"):
+        if cache is not None:
+            save_alpha_cache(cache_path, cache)
+        combined_path = output_dir / COMBINED_FILENAME
+        pd.concat(results, ignore_index=True).to_csv(combined_path, index=False)
+    print(f"[OK] {len(results)}/{len(tables)} tables analysed, combined file exported : {combined_path}")
+
 
 def main():
     parser = argparse.ArgumentParser(description="Calculate alpha diversity metrics from a feature table and metadata.")
-    parser.add_argument("-f", "--feature_table", required=True, help="Path to the TSV feature table file.")
+    parser.add_argument("-f", "--feature_table", required=True, help="Path to the TSV feature table file (or its .qza artifact, or a .npz store), or a directory / quoted glob pattern of feature tables.")
     parser.add_argument("-m", "--metadata", required=True, help="Path to the Excel metadata file.")
-    parser.add_argument("-o", "--output", required=True, help="Output directory. Output file will be <feature_table_basename>_alpha_diversity_merged.csv")
+    parser.add_argument("-o", "--output", required=True, help=f"Output directory. Output file will be <feature_table_basename>_alpha_diversity_merged.csv, plus {COMBINED_FILENAME} for several tables.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes used for the tables, or for the rarefaction iterations of a single table (defaults to the number of CPUs).")
+    parser.add_argument("--rarefy", type=int, default=None, metavar="DEPTH", help="Rarefy every sample to DEPTH reads before computing the metrics (mean and sd over the iterations). Samples with fewer reads get N/A. Needs absolute counts.")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help=f"Number of random subsamples for --rarefy and --curve (default: {DEFAULT_ITERATIONS}).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the random subsamples, for reproducible rarefaction.")
+    parser.add_argument("--curve", action="store_true", help=f"Also export <feature_table_basename>_rarefaction_curve.csv, over {DEFAULT_CURVE_STEPS} depths up to the deepest sample unless --curve-depths is given.")
+    parser.add_argument("--curve-depths", type=int, nargs="+", default=None, help="Depths of the rarefaction curve (implies --curve).")
+    parser.add_argument("--group-tests", action="store_true", help="Also test the metrics between metadata groups (Kruskal–Wallis, or Mann–Whitney for two groups, with permutation p-values), exported as <feature_table_basename>_group_tests.csv.")
+    parser.add_argument("--group-by", nargs="+", default=list(DEFAULT_GROUPINGS), help=f"Metadata columns defining the groups for --group-tests (default: {' '.join(DEFAULT_GROUPINGS)}).")
+    parser.add_argument("--permutations", type=int, default=DEFAULT_PERMUTATIONS, help=f"Number of label permutations for --group-tests (default: {DEFAULT_PERMUTATIONS}). Uses --seed.")
+    parser.add_argument("--no-cache", action="store_true", help=f"Recompute every sample instead of reusing the per-sample results kept in <output>/{CACHE_FILENAME}.")
+    parser.add_argument("--samples-file", type=Path, default=None, help="Only load the samples listed in this file (one sample id per line). Single table only.")
+    parser.add_argument("--taxa-file", type=Path, default=None, help="Only load the taxa listed in this file (one lineage per line). Single table only.")
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
 
     args = parser.parse_args()
+    with profiled_run(args, "alpha_div_analysis"), output_run(args, "alpha_div_analysis"), textfile_metrics.metrics_run("alpha_div_analysis"):
+        run_command(args)
+
+
+def run_command(args: argparse.Namespace) -> None:
+
+    rarefaction = None
+    if args.rarefy is not None or args.curve or args.curve_depths:
+        rarefaction = RarefactionSettings(depth=args.rarefy, iterations=args.iterations, seed=args.seed, workers=args.workers)
+    curve_depths = args.curve_depths if args.curve_depths else ([] if args.curve else None)
+    tests = None
+    if args.group_tests:
+        tests = GroupTestSettings(groupings=tuple(args.group_by), permutations=args.permutations, seed=args.seed, workers=args.workers)
 
     feature_table_path = Path(args.feature_table)
-    if not feature_table_path.exists():
+    if not feature_table_path.exists() and not glob.has_magic(args.feature_table):
         print(f"[ERROR] The path '{feature_table_path}' does not exist. Please check the path and try again.", file=sys.stderr)
         exit(1)
-        
-    if feature_table_path.suffix.lower() != '.tsv':
-        print("[ERROR] The feature table file must be a .tsv file.", file=sys.stderr)
+
+    if feature_table_path.is_file() and feature_table_path.suffix.lower() not in TABLE_EXTENSIONS:
+        print("[ERROR] The feature table file must be a .tsv, .qza or .npz file.", file=sys.stderr)
         exit(1)
 
-    base = feature_table_path.stem
-    output_filename = f"{base}_alpha_diversity_merged.csv"
-    if args.output:
-        output_dir = Path(args.output)
-        output_path = output_dir / output_filename
-    else:
-        output_path = Path.cwd() / output_filename
+    output_dir = Path(args.output) if args.output else Path.cwd()
+    if not feature_table_path.is_file():
+        if args.samples_file or args.taxa_file:
+            print("[ERROR] --samples-file and --taxa-file only apply to a single feature table.", file=sys.stderr)
+            exit(1)
+        tables = resolve_feature_tables(args.feature_table)
+        if not tables:
+            print(f"[ERROR] No .tsv, .qza or .npz feature table found in '{args.feature_table}'.", file=sys.stderr)
+            exit(1)
+        try:
+            run_batch(tables, args.metadata, output_dir, args.workers, rarefaction, curve_depths, use_cache=not args.no_cache, tests=tests)
+        except Exception as e:
+            print(str(e))
+            exit(1)
+        return
+
+    output_path = output_path_for(feature_table_path.stem, output_dir)
+    cache_path = output_dir / CACHE_FILENAME
+    cache = None if args.no_cache else load_alpha_cache(cache_path)
 
     try:
         calculator = DiversityMetricsCalculator(
             feature_table_path=str(feature_table_path),
             metadata_path=args.metadata,
-            output_path=str(output_path)
+            output_path=str(output_path),
+            rarefaction=rarefaction,
+            curve_depths=curve_depths,
+            samples=read_id_list(args.samples_file) if args.samples_file else None,
+            taxa=read_id_list(args.taxa_file) if args.taxa_file else None,
+            cache=cache,
+            group_tests=tests
         )
         calculator.run()
+        record_samples(len(calculator.feature_table), calculator.computed_samples)
+        textfile_metrics.inc("alpha_tables_total", status="ok")
+        if cache is not None and calculator.new_cache_entries:
+            with stage("write"):
+                cache.update(calculator.new_cache_entries)
+                save_alpha_cache(cache_path, cache)
     except Exception as e:
         print(str(e))
+        textfile_metrics.inc("alpha_tables_total", status="failed")
         exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+import argparse
+import json
+import re
+import sys
+import zipfile
+import zlib
+
+from myson_tools.utils.extraction import COLLAPSE_FOLDER, FREQUENCY, LEVELS, TAXONOMY_FOLDER, ArtifactPattern, table_patterns
+from myson_tools.utils import metrics
+from myson_tools.utils.batch_output import add_output_arguments, item, output_run
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
+
+RESULTS_FOLDER = '2_Results'
+RESULTS_PREFIX = 'Results_'
+TAXONOMY_ARTIFACT = 'taxonomy.qza'
+
+
+@dataclass(slots=True)
+class FolderAudit:
+    name: str
+    status: str = 'complete'
+    missing: list[str] = field(default_factory=list)
+    corrupt: dict[str, str] = field(default_factory=dict)
+
+
+def expected_artifacts(levels: list[str], with_tsv: bool) -> dict[str, ArtifactPattern]:
+    """
+    Artifacts that a finished MetONTIIME run leaves behind in a Results_<folder>, keyed by
+    the name reported when they are missing. They are matched as the extractors match them :
+    subfolder by name, collapsed tables by `<freq>-<level><ext>` anywhere in the file name.
+    """
+    extensions = ['.qza', '.tsv'] if with_tsv else ['.qza']
+    expected = {
+        f'{COLLAPSE_FOLDER}/*{freq}-{level}{ext}': pattern
+        for ext in extensions for level in levels for freq in FREQUENCY
+        for pattern in table_patterns([level], [freq], ext)
+    }
+    expected[f'{TAXONOMY_FOLDER}/{TAXONOMY_ARTIFACT}'] = ArtifactPattern(
+        label='taxonomy', subfolder=TAXONOMY_FOLDER, pattern=f'^{re.escape(TAXONOMY_ARTIFACT)}$', destinations=(),
+    )
+    return expected
+
+
+def locate_artifacts(folder: Path, expected: dict[str, ArtifactPattern]) -> dict[str, Path | None]:
+    """The file of `folder` matching every expected artifact (None when missing), each subfolder being listed once."""
+    subfolders = [f for f in folder.iterdir() if f.is_dir()]
+    listings: dict[str, list[Path]] = {}
+    located: dict[str, Path | None] = {}
+    for name, pattern in expected.items():
+        if pattern.subfolder not in listings:
+            subfolder = next((f for f in subfolders if pattern.subfolder in f.name), None)
+            listings[pattern.subfolder] = sorted(subfolder.iterdir()) if subfolder is not None else []
+        regex = re.compile(pattern.pattern)
+        located[name] = next((file for file in listings[pattern.subfolder] if regex.search(file.name)), None)
+    return located
+
+
+def check_artifact(path: Path, check_crc: bool) -> str | None:
+    """
+    None when the artifact looks sound, else the reason. A `.qza` must open as a zip
+    (its central directory is at the end, so a truncated archive fails here) and, with
+    `check_crc`, every member must match its CRC. Other files must not be empty.
+    """
+    try:
+        if path.stat().st_size == 0:
+            return 'empty file'
+        if path.suffix != '.qza':
+            return None
+        with zipfile.ZipFile(path) as archive:
+            if check_crc:
+                bad_member = archive.testzip()
+                if bad_member is not None:
+                    return f'CRC mismatch in {bad_member}'
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError) as e:
+        return f'invalid zip archive ({e})'
+    #? damaged deflate data is reported by zlib itself rather than as a CRC mismatch
+    except zlib.error as e:
+        return f'corrupt compressed data ({e})'
+    except OSError as e:
+        return f'unreadable ({e})'
+    return None
+
+
+def audit_results(results_dir: Path, levels: list[str], with_tsv: bool, check_crc: bool, workers: int | None) -> list[FolderAudit]:
+    """
+    Brief
+    -------------
+    Check every `Results_<folder>` of `results_dir` : the expected collapseTables and
+    assignTaxonomy artifacts must exist and be readable.
+
+    Folders are listed and every present artifact is checked in the same thread pool
+    (zip CRC checks release the GIL while inflating).
+
+    Returns
+    --------------
+    One `FolderAudit` per results folder, sorted by name
+    """
+    folders = sorted(p for p in results_dir.iterdir() if p.is_dir() and p.name.startswith(RESULTS_PREFIX))
+    expected = expected_artifacts(levels, with_tsv)
+    audits = {folder.name: FolderAudit(name=folder.name) for folder in folders}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        located = pool.map(lambda folder: locate_artifacts(folder, expected), folders)
+        checks = []
+        for folder, artifacts in zip(folders, located):
+            for name, path in artifacts.items():
+                if path is None:
+                    audits[folder.name].missing.append(name)
+                else:
+                    relative = path.relative_to(folder).as_posix()
+                    checks.append((folder.name, relative, pool.submit(check_artifact, path, check_crc)))
+        for name, relative, future in checks:
+            error = future.result()
+            if error is not None:
+                audits[name].corrupt[relative] = error
+
+    for audit in audits.values():
+        if audit.corrupt:
+            audit.status = 'corrupt'
+        elif audit.missing:
+            audit.status = 'incomplete'
+    return list(audits.values())
+
+
+def write_reports(audits: list[FolderAudit], run_name: str, results_dir: Path, output_dir: Path) -> tuple[Path, Path]:
+    """JSON report of every folder, and the skip list of the complete ones (launch_metontiime --skip @file)."""
+    report_file = output_dir / f'{run_name}_results_audit.json'
+    skip_file = output_dir / f'{run_name}_completed_skip_list.txt'
+    summary = {status: sum(a.status == status for a in audits) for status in ('complete', 'incomplete', 'corrupt')}
+
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'results_dir': str(results_dir),
+            'audited_at': datetime.now().isoformat(timespec='seconds'),
+            'summary': summary,
+            'folders': [asdict(audit) for audit in audits],
+        }, f, indent=2, ensure_ascii=False)
+
+    with open(skip_file, 'w', encoding='utf-8') as f:
+        for audit in audits:
+            if audit.status == 'complete':
+                f.write(audit.name.removeprefix(RESULTS_PREFIX) + '\n')
+    return report_file, skip_file
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Audit the completeness and integrity of the Results_<folder> of a run before extraction or merging.")
+    parser.add_argument("--path-dir", type=Path, required=True, help="Path to the run directory, containing the 2_Results folder.")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="Output directory. Files will be <run_basename>_results_audit.json and <run_basename>_completed_skip_list.txt")
+    parser.add_argument("--levels", type=int, nargs="+", default=None, help="Taxonomic levels expected in collapseTables (default: 4 5 6 7).")
+    parser.add_argument("--no-tsv", action="store_true", help="Do not expect the exported .tsv tables next to the .qza artifacts.")
+    parser.add_argument("--no-crc", action="store_true", help="Only check the zip central directory of the .qza artifacts, without reading their content.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of threads (defaults to Python's ThreadPoolExecutor default).")
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    with profiled_run(args, "audit_results"), output_run(args, "audit_results"), metrics.metrics_run("audit_results"):
+        results_dir = args.path_dir / RESULTS_FOLDER
+        if not results_dir.is_dir():
+            print(f"[ERROR] The path {results_dir} is invalid. Please check the directory.", file=sys.stderr)
+            sys.exit(1)
+        if not args.output.is_dir():
+            print(f"[ERROR] The path {args.output} is invalid. Please check the directory.", file=sys.stderr)
+            sys.exit(1)
+
+        with stage("scan"):
+            levels = [f'level{level}' for level in args.levels] if args.levels else LEVELS
+            audits = audit_results(results_dir, levels, not args.no_tsv, not args.no_crc, args.workers)
+        for audit in audits:
+            if audit.status == 'incomplete':
+                item('audit', 'WARNING', f"{audit.name}: {len(audit.missing)} missing artifact(s), e.g. {audit.missing[0]}")
+            elif audit.status == 'corrupt':
+                relative, error = next(iter(audit.corrupt.items()))
+                item('audit', 'ERROR', f"{audit.name}: {len(audit.corrupt)} corrupt artifact(s), e.g. {relative}: {error}")
+            else:
+                item('audit', 'OK', f"{audit.name}: complete")
+
+        with stage("write"):
+            report_file, skip_file = write_reports(audits, args.path_dir.resolve().name, results_dir, args.output)
+        for status in ('complete', 'incomplete', 'corrupt'):
+            metrics.set_gauge("audit_folders", sum(audit.status == status for audit in audits), status=status)
+        complete = sum(audit.status == 'complete' for audit in audits)
+        print(f"[OK] {complete}/{len(audits)} results folders complete. Report written to {report_file}")
+        print(f"[OK] Skip list of complete folders written to {skip_file} (use with --skip @{skip_file})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+from pathlib import Path
+import argparse
+import sys
+import time
+
+from myson_tools.utils.beta_diversity import BLOCK_SIZE, METRICS, beta_diversity, write_square_tsv
+from myson_tools.utils import metrics as textfile_metrics
+from myson_tools.utils.batch_output import add_output_arguments, item, output_run
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
+from myson_tools.utils.table_loader import TABLE_EXTENSIONS, load_sparse_feature_matrix, read_id_list
+
+#? above this many samples the square TSV would weigh gigabytes, the condensed .npy is enough
+MAX_TSV_SAMPLES = 5000
+
+
+def beta_div_analysis(feature_table: Path, output_dir: Path, metrics: list[str], block_size: int,
+                      workers: int | None, tsv: bool, samples: list[str] | None = None, taxa: list[str] | None = None) -> None:
+    #? the distance kernels work on CSR rows, the table is never densified
+    with stage("load"):
+        table = load_sparse_feature_matrix(feature_table, samples=samples, taxa=taxa)
+    counts = table.counts
+    samples = [str(sample) for sample in table.samples]
+    item('load', 'OK', f"{feature_table.name}: {len(samples)} samples × {len(table.features)} taxa, {counts.nnz} non-zero ({table.engine})")
+
+    textfile_metrics.set_gauge("beta_samples", len(samples))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    samples_file = output_dir / f"{feature_table.stem}_samples.txt"
+    samples_file.write_text('\n'.join(samples) + '\n', encoding='utf-8')
+
+    for metric in metrics:
+        start = time.perf_counter()
+        output_file = output_dir / f"{feature_table.stem}_{metric}.npy"
+        with stage("compute"):
+            condensed = beta_diversity(counts, metric, output_file, block_size=block_size, workers=workers)
+        textfile_metrics.inc("beta_pairs_total", len(condensed), metric=metric)
+        item('compute', 'OK', f"{metric}: {len(samples)} samples, condensed matrix written to {output_file} in {time.perf_counter() - start:.2f}s")
+
+        if tsv:
+            if len(samples) > MAX_TSV_SAMPLES:
+                item('write', 'WARNING', f"{metric}: {len(samples)} samples, square TSV skipped (limit {MAX_TSV_SAMPLES}).")
+                continue
+            tsv_file = output_file.with_suffix('.tsv')
+            with stage("write"):
+                write_square_tsv(condensed, samples, tsv_file)
+            item('write', 'OK', f"{metric}: square distance matrix written to {tsv_file}")
+    print(f"[OK] Sample order written to {samples_file}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compute beta diversity distance matrices (Bray–Curtis, Jaccard) between the samples of a feature table."
+    )
+    parser.add_argument("-f", "--feature_table", type=Path, required=True, help="Path to the TSV feature table file (or its .qza artifact, or a .npz store).")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="Output directory. Each matrix is written as <feature_table_basename>_<metric>.npy, a condensed (scipy pdist) float64 array, with the sample order in <feature_table_basename>_samples.txt.")
+    parser.add_argument("--metrics", nargs="+", choices=METRICS, default=list(METRICS), help="Distances to compute (default: all).")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help=f"Samples per tile side (default: {BLOCK_SIZE}).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of threads computing the tiles (defaults to the number of CPUs).")
+    parser.add_argument("--tsv", action="store_true", help=f"Also write each matrix as a square TSV (up to {MAX_TSV_SAMPLES} samples).")
+    parser.add_argument("--samples-file", type=Path, default=None, help="Only load the samples listed in this file (one sample id per line).")
+    parser.add_argument("--taxa-file", type=Path, default=None, help="Only load the taxa listed in this file (one lineage per line).")
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.feature_table.is_file():
+        print(f"[ERROR] The path '{args.feature_table}' does not exist. Please check the path and try again.", file=sys.stderr)
+        sys.exit(1)
+    if args.feature_table.suffix.lower() not in TABLE_EXTENSIONS:
+        print("[ERROR] The feature table file must be a .tsv, .qza or .npz file.", file=sys.stderr)
+        sys.exit(1)
+
+    with profiled_run(args, "beta_div_analysis"), output_run(args, "beta_div_analysis"), textfile_metrics.metrics_run("beta_div_analysis"):
+        try:
+            beta_div_analysis(
+                args.feature_table, args.output, args.metrics, args.block_size, args.workers, args.tsv,
+                samples=read_id_list(args.samples_file) if args.samples_file else None,
+                taxa=read_id_list(args.taxa_file) if args.taxa_file else None,
+            )
+        except Exception as e:
+            print(str(e))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 from myson_tools.utils import rename_barcode_folders
 from myson_tools.utils import read_data_frame, get_paths
+from myson_tools.utils.batch_output import add_output_arguments, output_run
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
 import argparse
 import sys
 
@@ -21,8 +23,15 @@ def main():
     parser.add_argument('-e', '--excel', help='Path to Excel file')
     parser.add_argument('-f', '--folder', help='Path to folder containing sample folders')
     parser.add_argument('-c', '--config', help='Path to config file (.conf)')
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
 
     args = parser.parse_args()
+    with profiled_run(args, "cli_barcode_folder_renamer"), output_run(args, "cli_barcode_folder_renamer"):
+        rename_folders(args)
+
+
+def rename_folders(args):
     try:
         excel_path, folder_path = get_paths(args)
         
@@ -42,7 +51,8 @@ def main():
         sys.exit(1)
     
     try:
-        df = read_data_frame(excel_path)
+        with stage("load"):
+            df = read_data_frame(excel_path)
     except Exception as e:
         print(f"\n❌[ERROR] Error reading dataframe: {e}")
         sys.exit(1)
@@ -50,7 +60,8 @@ def main():
     if df is None:
         print("[ERROR] Dataframe is Empty, please verify the Excel file's content.")
         sys.exit(1)
-    rename_barcode_folders(folder_path, df)
+    with stage("rename"):
+        rename_barcode_folders(folder_path, df)
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,8 @@
 from myson_tools.utils import create_patient_folders, read_patient_ids, sort_samples_to_patients
 from myson_tools.utils import verify_folders_creation, verify_renaming
 from myson_tools.utils import get_paths
+from myson_tools.utils.batch_output import add_output_arguments, output_run
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
 import argparse
 import sys
 
@@ -46,12 +48,19 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Sort sample files into patient folders"
     )
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
     return parser.parse_args()
 
 
 def main():
     print(ASCII_ART.strip())
     args = parse_args()
+    with profiled_run(args, "cli_patient_folder_manager"), output_run(args, "cli_patient_folder_manager"):
+        manage_folders(args)
+
+
+def manage_folders(args):
 
     try:
         excel_path, folder_path = get_paths(args)
@@ -71,7 +80,8 @@ def main():
         print(f"\n❌ Error while retrieving paths: {e}")
         sys.exit(1)
 
-    patient_ids = read_patient_ids(excel_path)
+    with stage("load"):
+        patient_ids = read_patient_ids(excel_path)
     
     if patient_ids is None:
         print("[ERROR] No patient ID found in Excel file.")
@@ -88,16 +98,20 @@ def main():
         if not folder_path:
             print("❌ Folder path is required to create folders (via --folder or --config).")
             sys.exit(1)
-        verify_renaming(folder_path)
-        create_patient_folders(folder_path, patient_ids)
+        with stage("verify"):
+            verify_renaming(folder_path)
+        with stage("create"):
+            create_patient_folders(folder_path, patient_ids)
 
     elif args.sort_samples:
         if not folder_path:
             print("❌ Folder path is required to sort samples (via --folder or --config).")
             sys.exit(1)
         try:
-            verify_folders_creation(folder_path, excel_path)
-            sort_samples_to_patients(folder_path, excel_path)
+            with stage("verify"):
+                verify_folders_creation(folder_path, excel_path)
+            with stage("sort"):
+                sort_samples_to_patients(folder_path, excel_path)
             print("\n✅ Samples sorted successfully!")
         except Exception as e:
             print(f"❌ Error during sorting samples: {e}")
@@ -0,0 +1,113 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import os
+import sys
+import time
+
+from myson_tools.utils import metrics
+from myson_tools.utils.batch_output import add_output_arguments, item, output_run
+from myson_tools.utils.fastq_compression import (
+    ORIGINALS_FOLDER,
+    READ_THROUGHPUT_MB_S,
+    CompressionStats,
+    compress_barcode,
+    find_uncompressed_barcodes,
+)
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
+
+
+def compress_fastq(fastq_pass: Path, level: int, workers: int | None, threads: int | None, keep_dir: Path | None) -> dict[str, CompressionStats]:
+    """
+    Brief
+    -------------
+    Compress the uncompressed FASTQ files of every barcode folder of `fastq_pass` in place,
+    one barcode per process and several compression threads per barcode. When there are
+    fewer barcodes than CPUs, the spare CPUs go to the threads of each barcode. With
+    `keep_dir`, the originals are moved to the same relative folders under it.
+
+    Returns
+    --------------
+    The stats of every barcode processed, keyed by folder relative to `fastq_pass`
+    """
+    with stage("scan"):
+        folders = find_uncompressed_barcodes(fastq_pass)
+    if not folders:
+        return {}
+
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, len(folders))
+    threads = threads or max(1, cpus // workers)
+    print(f"[INFO] {len(folders)} barcodes to compress, {workers} at a time with {threads} threads each.")
+
+    compressed: dict[str, CompressionStats] = {}
+    with stage("compress"), ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for folder in folders:
+            label = str(folder.relative_to(fastq_pass))
+            futures[label] = pool.submit(compress_barcode, folder, level, threads, keep_dir / label if keep_dir else None, label)
+        for label, future in futures.items():
+            try:
+                stats = future.result()
+            except OSError as e:
+                item('compress', 'ERROR', f"{label}: {e}")
+                continue
+            compressed[label] = stats
+            for name, error in stats.failed.items():
+                item('compress', 'ERROR', f"{label}/{name}: {error}")
+            if stats.already_compressed:
+                item('compress', 'SKIP', f"{label}: {stats.already_compressed} files already compressed by a previous run")
+            if stats.files:
+                item('compress', 'OK', f"{label}: {stats.files} files, {stats.bytes_in / 1e6:,.1f} MB -> {stats.bytes_out / 1e6:,.1f} MB in {stats.seconds:.1f}s")
+            metrics.inc('compress_fastq_bytes_total', stats.bytes_in, state='uncompressed')
+            metrics.inc('compress_fastq_bytes_total', stats.bytes_out, state='compressed')
+            metrics.inc('compress_fastq_files_total', stats.files, status='compressed')
+            metrics.inc('compress_fastq_files_total', len(stats.failed), status='failed')
+    return compressed
+
+
+def report(compressed: dict[str, CompressionStats], elapsed: float, read_speed: float) -> None:
+    failed = sum(len(s.failed) for s in compressed.values())
+    if failed:
+        print(f"[ERROR] {failed} files could not be compressed, their originals were left in place (see the errors above).", file=sys.stderr)
+    if not any(s.files for s in compressed.values()):
+        print("[OK] No FASTQ file compressed in this run.")
+        return
+    bytes_in = sum(s.bytes_in for s in compressed.values())
+    bytes_out = sum(s.bytes_out for s in compressed.values())
+    saved = bytes_in - bytes_out
+    print(
+        f"[OK] {sum(s.files for s in compressed.values())} files of {len(compressed)} barcodes compressed in {elapsed:.1f}s: "
+        f"{bytes_in / 1e9:,.2f} GB -> {bytes_out / 1e9:,.2f} GB, {saved / 1e9:,.2f} GB saved ({saved / bytes_in if bytes_in else 0.0:.0%})."
+    )
+    #? Nextflow and the Docker bind mounts read every input byte at least once per analysis
+    print(f"[OK] About {saved / (read_speed * 1e6):,.1f}s less read time per pass over the data at {read_speed:g} MB/s.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compress the uncompressed FASTQ files of every barcode of a fastq_pass folder to BGZF (gzip compatible), in place."
+    )
+    parser.add_argument("-i", "--input", type=Path, required=True, help="The fastq_pass folder (barcode folders, or patient folders of barcode folders).")
+    parser.add_argument("--level", type=int, default=6, choices=range(1, 10), metavar="1-9", help="Compression level (default: 6).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of barcodes compressed in parallel (defaults to the number of CPUs, at most one per barcode).")
+    parser.add_argument("--threads", type=int, default=None, help="Compression threads per barcode (defaults to the CPUs left over by the workers).")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the original .fastq files, moved out of the barcode folders to {ORIGINALS_FOLDER} next to the input (same layout).")
+    parser.add_argument("--read-speed", type=float, default=READ_THROUGHPUT_MB_S, help=f"Read throughput in MB/s used to estimate the read time saved (default: {READ_THROUGHPUT_MB_S:g}).")
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    with profiled_run(args, "compress_fastq"), output_run(args, "compress_fastq"), metrics.metrics_run("compress_fastq"):
+        if not args.input.is_dir():
+            print(f"[ERROR] The path {args.input} is invalid. Please check the directory.", file=sys.stderr)
+            sys.exit(1)
+
+        start = time.perf_counter()
+        keep_dir = args.input.parent / ORIGINALS_FOLDER if args.keep else None
+        compressed = compress_fastq(args.input, args.level, args.workers, args.threads, keep_dir)
+        report(compressed, time.perf_counter() - start, args.read_speed)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,9 @@ from pathlib import Path
 import argparse
 import sys
 
+from myson_tools.utils.batch_output import add_output_arguments, output_run
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
+
 def generate_skip_list(path_dir: Path, output_dir:Path):
     if not path_dir.exists() or not path_dir.is_dir():
         print(f"[ERROR] The path {path_dir} is invalid. Please check the directory.", file=sys.stderr)
@@ -12,11 +15,12 @@ def generate_skip_list(path_dir: Path, output_dir:Path):
     subdir = '1_Raw_data/fastq_pass'
     path = path_dir / subdir
 
-    subdirs = [p.name for p in path.iterdir() if p.is_dir() and 'patient' in p.name.lower()]
+    with stage("scan"):
+        subdirs = [p.name for p in path.iterdir() if p.is_dir() and 'patient' in p.name.lower()]
     file_name = f"{path_dir.name}_skip_list.txt"
     output_file = (output_dir / file_name)
 
-    with open(output_file, 'w') as f:
+    with stage("write"), open(output_file, 'w') as f:
         for name in subdirs:
             f.write(name + '\n')
 
@@ -26,7 +30,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate skip list file from folder names.")
     parser.add_argument("--path-dir", type=Path, required=True, help="Path to the directory")
     parser.add_argument("-o", "--output", type=Path, required=True, help="Output directory.Output file will be <run_basename>_skip_list.txt")
-    
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
 
     args = parser.parse_args()
-    generate_skip_list(args.path_dir, args.output)
+    with profiled_run(args, "generate_skip_list"), output_run(args, "generate_skip_list"):
+        generate_skip_list(args.path_dir, args.output)
@@ -1,16 +1,31 @@
+from functools import lru_cache
 from pathlib import Path
 import argparse
 import logging
-import shutil
-import sys
 import re
+import threading
 from rich.logging import RichHandler
 
+from myson_tools.utils.abundance_store import DICTIONARY_FILENAME, STORE_EXTENSION, TaxonDictionary, write_abundance_store
+from myson_tools.utils.extraction import COLLAPSE_FOLDER, FREQUENCY, LEVELS, ArtifactPattern, output_folder_names, run_extraction, table_patterns
+from myson_tools.utils.feature_tables import (
+    FREQ_LEVEL_FOLDER,
+    SparseFeatureTable,
+    find_freq_level_folders,
+    merge_sparse_tables,
+    read_sparse_feature_table,
+    write_sparse_feature_tsv,
+)
+from myson_tools.utils.metrics import metrics_run
+from myson_tools.utils.batch_output import add_output_arguments, output_run
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
+from myson_tools.utils.qza_reader import qza_to_tsv, read_qza_matrix
+from myson_tools.utils.taxonomy_collapse import LineageIndex, collapse_table
+
 
-LEVELS:list = ['level4', 'level5', 'level6', 'level7']
-FREQUENCY:list = ['relfreq', 'absfreq']
 EXTENSION:str = '.tsv'
-REFERENCE:list = ['Tpos','Tneg']
+QZA_EXTENSION:str = '.qza'
+SOURCE_TABLE:str = 'absfreq-level7'
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,136 +34,86 @@ logging.basicConfig(
 )
 log = logging.getLogger("rich")
 
-#add an optional outpout folder to this script if it's not given the folders will be created in the working dir (modify myson_tools.py accordingly for the prompt)
-
-def create_output_folders(output_dir: Path ) -> None:
-    base_dir = output_dir if output_dir else Path.cwd()
-    for level in LEVELS:
-        for freq in FREQUENCY:
-            folder_name = base_dir / f'{freq}_{level}'
-            if not folder_name.exists():
-                folder_name.mkdir(parents=True)
-
-
+#? one lock per source : the levels derived from a table are converted concurrently and must wait for its first load
+_level7_locks: dict[Path, threading.Lock] = {}
+_level7_locks_guard = threading.Lock()
 
 
-def get_run_name(path: Path) -> (str | None):
-    match = re.search((r'(\d{6})_ICMc'), str(path))
-    return match.group(0) if match else None
-
-def new_file_name(root_folder: Path, filename:str) -> str:
-    pid = root_folder.name.split('_', 2)[2]
-    if any(ref in pid for ref in REFERENCE):
-        return f'{filename.removesuffix(EXTENSION)}-{get_run_name(root_folder)}_{pid}{EXTENSION}'
+@lru_cache(maxsize=16)
+def _read_level7_table(source: Path) -> tuple[SparseFeatureTable, LineageIndex]:
+    if source.suffix == QZA_EXTENSION:
+        table = SparseFeatureTable(*read_qza_matrix(source))
     else:
-        return f'{filename.removesuffix(EXTENSION)}-{pid}{EXTENSION}'
-
-def to_plural_if_needed(x:int, string:str) -> str:
-    return f'{string}s' if x > 1 and not string.endswith('s') else string
-
-
-def verify_files_existence(path: Path) -> None:
-    table_success:int = 0
-    files_checked:int = 0
-    folders_skipped:int = 0
-    skipped_folder:dict = {}
-
-    if not path.exists() or not path.is_dir():
-        print(f"[ERROR] The path {path} is invalid. Please check the directory.", file=sys.stderr)
-        sys.exit(1)
-
-    for folder in path.iterdir():
-        if folder.is_dir() and 'Result' in folder.name:
-            collapse_folder = next(
-                (f for f in folder.iterdir() if f.is_dir() and 'collapseTables' in f.name),
-                None
-            )
-
-            if collapse_folder :
-                for level in LEVELS:
-                    for freq in FREQUENCY:
-                        target_sequence = Path(f'{freq}-{level}{EXTENSION}')
-
-                        # Check files in collapseFolder
-                        for table in collapse_folder.iterdir():
-                            if target_sequence.name in table.name:
-                                log.info("[bold green][OK][/bold green] File '%s' found at '%s'", table.name, table.parent)
-                                table_success += 1
-                            files_checked += 1
-
-                            files_checked += 1
-            elif not collapse_folder:
-                log.info("[cyan][SKIP][/cyan] Folder collapseTables was not found for %s — Skipping copy.", folder.name)
-                folders_skipped += 1
-                skipped_folder[folder.name] = ' reason : Folder collapseTables not found.'
-
-    total_found = table_success
-    if total_found == 0 and files_checked > 0:
-        log.warning("[yellow][WARNING][/yellow] No matching files found for the target levels.")
-        sys.exit(1)
-    elif total_found == 0 and files_checked == 0:
-        log.warning("[yellow][WARNING][/yellow] No files found in the specified directory. Check the folder and file locations.")
-        sys.exit(1)
-
-    # Summary of results
-    print('\n')
-    log.info("[bold green][INFO][/bold green] Verification complete: %d %s checked.", files_checked, to_plural_if_needed(files_checked, 'file'))
-    if table_success > 0:
-        log.info("[bold green][OK][/bold green] %d collapsed %s found.", table_success, to_plural_if_needed(table_success, 'table'))
-    if folders_skipped > 0:
-        log.warning("[yellow][WARNING][/yellow] %d %s skipped : ", folders_skipped, to_plural_if_needed(folders_skipped, 'folder'))
-        for key, value in skipped_folder.items():
-            log.warning("[yellow]%s, reason : %s[/yellow]", key, value)
-
-
-
-    print('\n')
-    log.info("[bold green][INFO][/bold green] Proceeding to the file copy process.")
-    log.info("[bold green][INFO][/bold green] Starting the transfer of target files to the custom (frequency_level/) destination folder.\nPlease wait while the operation completes...")
-    print('\n\n')
-
-
-def copy_collapsed_tables(path: Path, output_dir: Path ) -> None:
-
-    base_dir = output_dir
-
-    if not path.exists() or not path.is_dir():
-        print(f"[ERROR] The path {path} is invalid. Please check the directory.", file=sys.stderr)
-        sys.exit(1)
-
-    create_output_folders(output_dir)
-
-    for folder in path.iterdir():
-        if folder.is_dir() and 'Result' in folder.name:
-            collapse_folder = next(
-                (f for f in folder.iterdir() if f.is_dir() and 'collapseTables' in f.name),
-                None
+        table = read_sparse_feature_table(source)
+    return table, LineageIndex(table.features)
+
+
+def load_level7_table(source: Path) -> tuple[SparseFeatureTable, LineageIndex]:
+    """Level-7 absolute table (TSV or QZA) and its lineage index, read once and shared by every level derived from it."""
+    with _level7_locks_guard:
+        lock = _level7_locks.setdefault(source, threading.Lock())
+    with lock:
+        return _read_level7_table(source)
+
+
+def derive_table(source: Path, destination: Path) -> None:
+    """Write the table of the destination's `<freq>_<level>` folder, collapsed from a level-7 absolute table."""
+    match = FREQ_LEVEL_FOLDER.match(destination.parent.name)
+    table, index = load_level7_table(source)
+    level = int(match['level'].removeprefix('level'))
+    write_sparse_feature_tsv(collapse_table(table, level, relative=match['freq'] == 'relfreq', index=index), destination)
+
+
+def extraction_patterns(levels: list, from_qza: bool = False, derive: bool = False) -> list[ArtifactPattern]:
+    """
+    The exported TSV tables, or with `from_qza` the collapsed `.qza` tables
+    read natively and written as TSV (no QIIME 2 environment needed).
+    With `derive`, only the level-7 absolute table is read and every level and
+    frequency is computed from it.
+    """
+    extension = QZA_EXTENSION if from_qza else EXTENSION
+    if derive:
+        return [
+            ArtifactPattern(
+                label='level-7 table',
+                subfolder=COLLAPSE_FOLDER,
+                pattern=re.escape(f'{SOURCE_TABLE}{extension}'),
+                destinations=output_folder_names(levels, FREQUENCY),
+                convert=derive_table,
+                output_extension=EXTENSION,
+                rename=lambda file_name, destination: file_name.replace(SOURCE_TABLE, destination.replace('_', '-')),
             )
-            if collapse_folder:
-                for level in LEVELS:
-                    for freq in FREQUENCY:
-                        folder_name = base_dir / f'{freq}_{level}'
-                        target_sequence = Path(f'{folder_name.name.replace("_", "-")}{EXTENSION}')
-                        folder_abs_path = folder_name.absolute()
-
-                        if not folder_abs_path.exists():
-                            log.info("[yellow][WARNING][/yellow] Folder %s was not created.", folder_name)
-                            continue
-
-                        for table in collapse_folder.iterdir():
-                            if target_sequence.name in table.name:
-                                table_output = folder_abs_path / new_file_name(folder, table.name)
-                                try:
-                                    shutil.copy(table, table_output)
-                                    log.info("[bold green][OK][/bold green] Success: File '%s' was copied to '%s'", table.name, table_output)
-                                except Exception as e:
-                                    log.error("[bold red][ERROR][/bold red] %s", e)
-
-
-            elif not collapse_folder:
-                log.info("[yellow][WARNING][/yellow] Folder collapseTables was not found for %s — Skipping copy.", folder.name)
-                continue
-
+        ]
+    if not from_qza:
+        return table_patterns(levels, FREQUENCY, EXTENSION)
+    return [
+        ArtifactPattern(
+            label=pattern.label,
+            subfolder=pattern.subfolder,
+            pattern=pattern.pattern,
+            destinations=pattern.destinations,
+            convert=qza_to_tsv,
+            output_extension=EXTENSION,
+        )
+        for pattern in table_patterns(levels, FREQUENCY, QZA_EXTENSION)
+    ]
+
+
+def write_abundance_stores(output_dir: Path, dictionary_path: Path | None) -> None:
+    """
+    Merge the tables of every `<freq>_<level>` folder into a compact `<freq>_<level>.npz`
+    store, taxa being encoded with the shared taxon dictionary.
+    """
+    dictionary = TaxonDictionary(dictionary_path or output_dir / DICTIONARY_FILENAME)
+    for (freq, level), tables in find_freq_level_folders(output_dir).items():
+        try:
+            merged = merge_sparse_tables([read_sparse_feature_table(table) for table in tables])
+        except ValueError as e:
+            log.error("[bold red][ERROR][/bold red] %s_%s : %s", freq, level, e)
+            continue
+        store = output_dir / f'{freq}_{level}{STORE_EXTENSION}'
+        write_abundance_store(merged, store, dictionary)
+        log.info("[bold green][OK][/bold green] Store '%s' written (%d taxa × %d samples).", store, len(merged.features), len(merged.samples))
 
 
 def main() -> None:
@@ -182,9 +147,60 @@ def main() -> None:
         default=None,
         help="Optional output directory for the frequency_level folders. If not provided, folders will be created in the working directory."
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help="Number of threads used to copy the artifacts."
+    )
+    parser.add_argument(
+        '--no-links',
+        action='store_true',
+        help="Always make full copies instead of reflinks/hardlinks to the Results files."
+    )
+    parser.add_argument(
+        '--from-qza',
+        action='store_true',
+        help="Build the TSV tables from the collapsed .qza artifacts instead of the exported TSV files."
+    )
+    parser.add_argument(
+        '--derive-levels',
+        action='store_true',
+        help="Extract only the absfreq-level7 table and compute every other level and frequency from it."
+    )
+    parser.add_argument(
+        '--levels',
+        type=int,
+        nargs='+',
+        default=None,
+        help="Taxonomic levels to produce (default: 4 5 6 7). Levels below 4 need --derive-levels."
+    )
+    parser.add_argument(
+        '--store',
+        action='store_true',
+        help="Also write one compact <frequency>_<level>.npz store per folder (sparse counts, dictionary-encoded taxa)."
+    )
+    parser.add_argument(
+        '--taxon-dictionary',
+        type=Path,
+        default=None,
+        help="Taxon dictionary shared across runs, used with --store. Defaults to <output>/taxon_dictionary.tsv."
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help="Copy every artifact again, ignoring the manifest of the previous extraction."
+    )
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
     args = parser.parse_args()
-    verify_files_existence(args.folder)
-    copy_collapsed_tables(args.folder, args.output)
+    levels = [f'level{level}' for level in args.levels] if args.levels else LEVELS
+    with profiled_run(args, "get_feature_table"), output_run(args, "get_feature_table"), metrics_run("get_feature_table"):
+        run_extraction(args.folder, extraction_patterns(levels, args.from_qza, args.derive_levels), output_folder_names(levels, FREQUENCY), args.output,
+                       workers=args.workers, allow_links=not args.no_links, force=args.full)
+        if args.store:
+            with stage("store"):
+                write_abundance_stores((args.output if args.output else Path.cwd()).absolute(), args.taxon_dictionary)
 
 
 if __name__ == '__main__':
@@ -4,6 +4,7 @@ import re
 import shutil
 import subprocess
 import sys
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Tuple
@@ -13,8 +14,22 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 
+from myson_tools.utils.disk_space import (
+    GIGABYTE,
+    PeakUsageTracker,
+    directory_size,
+    docker_root,
+    load_usage_history,
+    record_usage,
+    required_free_bytes,
+    wait_for_free_space,
+    watched_volumes,
+)
+from myson_tools.utils import metrics
 from myson_tools.utils.io_utils import env_var_missing
 from myson_tools.utils.path_utils import notify_missing_folder
+from myson_tools.utils.batch_output import add_output_arguments, item, output_run
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
 
 BARCODE_LEVEL:str = "barcode_level"
 PATIENT_LEVEL:str = "patient_level"
@@ -139,6 +154,20 @@ def parse_args():
         required=True,
         help='The conf database that will be used by metontiime to perform its analysis'
     )
+    parser.add_argument(
+        '--min-free-gb',
+        type=float,
+        default=10.0,
+        help='Minimum free space (in GB) to keep on the work, results and Docker volumes before launching a new folder.'
+    )
+    parser.add_argument(
+        '--disk-poll-interval',
+        type=float,
+        default=60.0,
+        help='Seconds between two free space checks while launches are held back.'
+    )
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
 
     args = parser.parse_args()
 
@@ -235,11 +264,31 @@ def automate_analysis() -> None:
     metadata_path = Path(_metadata_folder)
     resume = set_resume_value(args)
 
+    volumes = watched_volumes({'work': Path.cwd(), 'results': defaultResultDir, 'docker': docker_root()})
+    usageHistory:Path = defaultResultDir / 'disk_usage_history.json'
+    pauseLog:Path = defaultResultDir / 'disk_space_pauses.log'
+
     console.print(Align.center(gradient_text(ASCII_LOGO, colors)))
     print()
     skip_folders(args)
     print()
 
+    def hold_until_disk_space(folder: Path) -> int:
+        """
+        Wait until the watched volumes can absorb the run of `folder`,
+        the threshold is learned from the peak usage per GB of input of past runs.
+
+        Returns:
+            The size of the folder in bytes, used to record the usage of this run.
+        """
+        with stage("disk space"):
+            input_bytes = directory_size(folder)
+            required = required_free_bytes(volumes, input_bytes, load_usage_history(usageHistory), int(args.min_free_gb * GIGABYTE))
+            start = time.monotonic()
+            wait_for_free_space(volumes, required, folder.name, pauseLog, console, args.disk_poll_interval)
+            metrics.inc('disk_space_wait_seconds_total', time.monotonic() - start, level=args.level)
+        return input_bytes
+
     def patient_level_analysis():
         folder_count = get_folder_count(workDir, args)
         total_folders = folder_count
@@ -250,6 +299,7 @@ def automate_analysis() -> None:
         if folder_count == 0:
             notify_missing_folder(workDir, console)
             return
+        metrics.set_gauge('queue_folders', folder_count, level=args.level)
 
         try:
             for folder in workDir.iterdir():
@@ -260,18 +310,28 @@ def automate_analysis() -> None:
                     console.print(f"[bold magenta]Remaining folders to analyse:[/bold magenta] [white]{folder_count - 1}[/white]")
                     resultDir = defaultResultDir / f"Results_{folder.name}"
                     sampleMetadataPath = set_metadata_path(metadata_path, args.pathDir, args, resultDir)
-
-                    result = subprocess.run([
-                            'nextflow', '-c', confPath, 'run', metontiimeScript,
-                            f'--workDir={folder}',
-                            f'--resultsDir={resultDir}',
-                            f'--sampleMetadata={sampleMetadataPath}',
-                            '-profile', 'docker', f'{resume}'
-                        ],stderr=subprocess.PIPE, text=True, check=True)
+                    input_bytes = hold_until_disk_space(folder)
+
+                    nextflow_start = time.monotonic()
+                    with stage("nextflow"), PeakUsageTracker(volumes) as tracker:
+                        result = subprocess.run([
+                                'nextflow', '-c', confPath, 'run', metontiimeScript,
+                                f'--workDir={folder}',
+                                f'--resultsDir={resultDir}',
+                                f'--sampleMetadata={sampleMetadataPath}',
+                                '-profile', 'docker', f'{resume}'
+                            ],stderr=subprocess.PIPE, text=True, check=True)
+                    metrics.observe('nextflow_run_duration_seconds', time.monotonic() - nextflow_start, level=args.level)
                     if result.returncode == 0:
                         folder_analyzed_successfully += 1
+                        record_usage(usageHistory, folder.name, input_bytes, tracker.peak_bytes)
+                        metrics.inc('folders_processed_total', level=args.level)
+                        item('analysis', 'OK', f"{folder.name} analysed, results in {resultDir}")
 
                     folder_count -= 1
+                    metrics.set_gauge('queue_folders', folder_count, level=args.level)
+                    #? the next update may be a whole Nextflow run away
+                    metrics.flush()
                     if folder_analyzed_successfully == total_folders:
                         console.print("[bold green]✅ Done. All folders have been analyzed.[/bold green]")
                     else:
@@ -289,6 +349,8 @@ def automate_analysis() -> None:
                             )
                         )
         except subprocess.CalledProcessError as e:
+            metrics.inc('folders_failed_total', level=args.level)
+            item('analysis', 'ERROR', f"{current_patient}: Nextflow failed, see {failedPatientFolder}")
             block = re.search(r"ERROR ~[\s\S]*?(?=\n\S|$)", e.stderr)
             if block:
                 with open(failedPatientFolder, 'a') as failed_runs:
@@ -524,6 +586,7 @@ def automate_analysis() -> None:
         if folder_count == 0:
             notify_missing_folder(workDir, console, patient_level=False)
             return
+        metrics.set_gauge('queue_folders', folder_count, level=args.level)
         try:
             for folder in workDir.iterdir():
                 if folder.is_dir() and 'barcode' in folder.name.lower() and (args.skip is None or folder.name not in args.skip):
@@ -531,21 +594,39 @@ def automate_analysis() -> None:
                     console.print(f"[bold magenta]Remaining folders to analyse:[/bold magenta] [white]{folder_count - 1}[/white]")
                     resultDir = defaultResultDir / f"Results_{folder.name}"
                     sampleMetadataPath = set_metadata_path(metadata_path, args.pathDir, args, resultDir)
-                    retval = ensure_concatenate_fastq(folder, workDir)
+                    input_bytes = hold_until_disk_space(folder)
+                    with stage("stage fastq"):
+                        retval = ensure_concatenate_fastq(folder, workDir)
                     if retval:
                         move, workingDir = retval
                         if move.failed:
+                            metrics.inc('folders_failed_total', level=args.level)
+                            item('analysis', 'ERROR', f"{folder.name}: the fastq files could not be staged")
                             continue
 
-                        subprocess.run([
-                            'nextflow', '-c', confPath, 'run', metontiimeScript,
-                            f'--workDir={workingDir}',
-                            f'--resultsDir={resultDir}',
-                            f'--sampleMetadata={sampleMetadataPath}',
-                            '-profile', 'docker', f'{resume}'
-                        ])
-                        ensure_concatenate_fastq(folder, workDir, return_to_original=True)
+                        nextflow_start = time.monotonic()
+                        with stage("nextflow"), PeakUsageTracker(volumes) as tracker:
+                            result = subprocess.run([
+                                'nextflow', '-c', confPath, 'run', metontiimeScript,
+                                f'--workDir={workingDir}',
+                                f'--resultsDir={resultDir}',
+                                f'--sampleMetadata={sampleMetadataPath}',
+                                '-profile', 'docker', f'{resume}'
+                            ])
+                        metrics.observe('nextflow_run_duration_seconds', time.monotonic() - nextflow_start, level=args.level)
+                        if result.returncode == 0:
+                            record_usage(usageHistory, folder.name, input_bytes, tracker.peak_bytes)
+                            metrics.inc('folders_processed_total', level=args.level)
+                            item('analysis', 'OK', f"{folder.name} analysed, results in {resultDir}")
+                        else:
+                            metrics.inc('folders_failed_total', level=args.level)
+                            item('analysis', 'ERROR', f"{folder.name}: Nextflow exited with code {result.returncode}")
+                        with stage("restore fastq"):
+                            ensure_concatenate_fastq(folder, workDir, return_to_original=True)
                     folder_count -= 1
+                    metrics.set_gauge('queue_folders', folder_count, level=args.level)
+                    #? the next update may be a whole Nextflow run away
+                    metrics.flush()
                     if folder_count == 0:
                         console.print("[bold green]✅ Done. All folders have been analyzed.[/bold green]")
         except FileNotFoundError:
@@ -579,16 +660,17 @@ def automate_analysis() -> None:
             console.print("[bold yellow]⏹ Interrupted by user. Exiting...[/bold yellow]")
 
 
-    if args.level == PATIENT_LEVEL:
-        patient_level_analysis()
-    elif args.level == BARCODE_LEVEL:
-        barcode_level_analysis()
-    else:
-        console_err.print(
-            "[bold red]✖ ERROR[/bold red] — Something went wrong.\n"
-            "[dim]Are you sure you didn’t modify the source code?[/dim]"
-        )
-        sys.exit(1)
+    with profiled_run(args, "launch_metontiime"), output_run(args, "launch_metontiime"), metrics.metrics_run(f"launch_metontiime_{args.level}"):
+        if args.level == PATIENT_LEVEL:
+            patient_level_analysis()
+        elif args.level == BARCODE_LEVEL:
+            barcode_level_analysis()
+        else:
+            console_err.print(
+                "[bold red]✖ ERROR[/bold red] — Something went wrong.\n"
+                "[dim]Are you sure you didn’t modify the source code?[/dim]"
+            )
+            sys.exit(1)
 
 
 if __name__ == '__main__':
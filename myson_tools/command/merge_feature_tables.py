@@ -0,0 +1,95 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import sys
+import time
+
+from myson_tools.utils.feature_tables import (
+    EXTENSION,
+    SparseFeatureTable,
+    find_freq_level_folders,
+    merge_sparse_tables,
+    read_sparse_feature_table,
+    write_sparse_feature_tsv,
+)
+from myson_tools.utils import metrics
+from myson_tools.utils.batch_output import add_output_arguments, item, output_run
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
+
+
+def merge_folder(tables: list[Path], output_file: Path, pool: ProcessPoolExecutor, overlap: str) -> SparseFeatureTable:
+    with stage("load"):
+        loaded = list(pool.map(read_sparse_feature_table, tables))
+    with stage("compute"):
+        merged = merge_sparse_tables(loaded, overlap=overlap)
+    with stage("write"):
+        write_sparse_feature_tsv(merged, output_file)
+    return merged
+
+
+def merge_feature_tables(path: Path, output_dir: Path, workers: int, overlap: str) -> None:
+    if not path.exists() or not path.is_dir():
+        print(f"[ERROR] The path {path} is invalid. Please check the directory.", file=sys.stderr)
+        sys.exit(1)
+
+    with stage("scan"):
+        folders = find_freq_level_folders(path)
+    if not folders:
+        print(f"[ERROR] No <frequency>_<level> folder with {EXTENSION} tables found in {path}.", file=sys.stderr)
+        sys.exit(1)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (freq, level), tables in folders.items():
+            start = time.perf_counter()
+            output_file = output_dir / f'merged-{freq}-{level}{EXTENSION}'
+            try:
+                merged = merge_folder(tables, output_file, pool, overlap)
+            except ValueError as e:
+                item('merge', 'ERROR', f"{freq}_{level}: {e}")
+                continue
+            metrics.inc("merged_tables_total", len(tables), frequency=freq, level=level)
+            item('merge', 'OK', (
+                f"{freq}_{level}: {len(tables)} tables merged into {output_file.name} "
+                f"({len(merged.features)} features × {len(merged.samples)} samples, "
+                f"{merged.matrix.nnz} non-zero) in {time.perf_counter() - start:.2f}s"
+            ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Merge the per-patient TSV feature tables produced by get_feature_table into one table per level and frequency, without QIIME 2."
+    )
+    parser.add_argument(
+        '--folder',
+        type=Path,
+        required=True,
+        help="Output directory of get_feature_table, containing the <frequency>_<level> folders."
+    )
+    parser.add_argument(
+        '--output',
+        type=Path,
+        required=True,
+        help="Directory where the merged-<frequency>-<level>.tsv tables will be written (created if needed)."
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help="Number of processes used to read the tables (defaults to the number of CPUs)."
+    )
+    parser.add_argument(
+        '--overlap',
+        choices=['error', 'sum'],
+        default='error',
+        help="What to do with a sample id found in several tables: stop with an error, or sum its counts."
+    )
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    with profiled_run(args, "merge_feature_tables"), output_run(args, "merge_feature_tables"), metrics.metrics_run("merge_feature_tables"):
+        merge_feature_tables(args.folder, args.output, args.workers, args.overlap)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 import logging
 import os
 import re
@@ -11,6 +12,8 @@ from rich.text import Text
 
 from myson_tools.utils import REFERENCE
 from myson_tools.utils.io_utils import env_var_missing
+from myson_tools.utils.batch_output import add_output_arguments, item, output_run
+from myson_tools.utils.profiling import add_profiling_arguments, profiled_run, stage
 
 ASCII_LOGO = r"""
 ███████╗███████╗██████╗  █████╗ ██████╗  █████╗ ████████╗███████╗
@@ -72,18 +75,31 @@ def parge_args() -> argparse.Namespace:
 
     parser = argparse.ArgumentParser(description='A script to create metadata.tsv file for samples')
 
-    parser.add_argument(
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument(
         '-p', '--folder-path',
         type=str,
-        required=True,
         default=None,
         help='This is refer to the folders where the Patients folders are located in.'
     )
+    target.add_argument(
+        '--all-runs',
+        action='store_true',
+        help='Create the metadata file of every run under BASE_DIR (folders containing DEFAULT_WORK_DIR), reading the Excel file once.'
+    )
     parser.add_argument(
             '--force',
             action='store_true',
             help='Force overwrite if metadata file already exists.'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of processes used with --all-runs (defaults to the number of CPUs).'
+    )
+    add_profiling_arguments(parser)
+    add_output_arguments(parser)
 
     return parser.parse_args()
 
@@ -123,15 +139,36 @@ def format_and_save_to_tsv(path: Path, excel_path: Path, metadata_output: Path,
     elif not path.is_dir():
         logging.error(f"❌ Path is not a directory: {path}")
         sys.exit(1)
-    data = format_data(folder_path=path, df=load_excel_as_df(excel_path))
-    data.to_csv(metadata_tsv, sep='\t', index=False, encoding='utf-8')
+    with stage("load"):
+        df = load_excel_as_df(excel_path)
+    with stage("scan"):
+        data = format_data(folder_path=path, df=df)
+    with stage("write"):
+        data.to_csv(metadata_tsv, sep='\t', index=False, encoding='utf-8')
     console.print(f'✅Successfully created file : {savefile} at : {metadata_tsv.parent}')
 
 
-def format_data(folder_path: Path, df: pd.DataFrame) -> pd.DataFrame:
+def index_patients(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Rows of the Excel file grouped by '#patientID', built once instead of filtering the sheet for every barcode."""
+    if "#patientID" not in df.columns:
+        logging.error("❌ Required column '#patientID' is missing from the Excel file.")
+        sys.exit(1)
+    return {str(patient_id): rows for patient_id, rows in df.groupby("#patientID", sort=False)}
+
+
+def collect_metadata(folder_path: Path, df: pd.DataFrame, patients: dict[str, pd.DataFrame], verbose: bool = True,
+                     unmatched: list[tuple[str, str]] | None = None) -> pd.DataFrame:
+    """
+    Metadata rows of every barcode of the patient folders in `folder_path` : the rows of
+    its patient with the barcode as '#SampleID'. Rows are collected and concatenated
+    once, an empty frame (with the '#SampleID' column) is returned when nothing matched.
+
+    `verbose` only controls the OK / SKIP lines : a barcode whose patient is not in the
+    sheet is always reported, or appended as (patient_id, barcode) to `unmatched` when given.
+    """
     folder:Path
     barcode:Path
-    new_dataframe: pd.DataFrame = create_empty_dataframe(df)
+    frames: list[pd.DataFrame] = []
     reference_tags = set(REFERENCE.values())
     for folder in folder_path.iterdir():
         if folder.is_dir() and 'Patient' in folder.name:
@@ -139,30 +176,110 @@ def format_data(folder_path: Path, df: pd.DataFrame) -> pd.DataFrame:
             if match:
                 patient_id = match.group(1)
             else:
-                console_err.print(f"Error while retrieving {folder.name} ID's.")
+                item('metadata', 'ERROR', f"Error while retrieving {folder.name} ID's.")
                 continue
             if any(tag in patient_id for tag in reference_tags):
-                logging.info(f"⏭️ Reference patient '{patient_id}' detected — skipping metadata entry.")
+                if verbose:
+                    item('metadata', 'SKIP', f"Reference patient '{patient_id}' detected — skipping metadata entry.")
                 continue
-            print(f"📁 Processing Metadata for: {folder.name}")
+            rows = patients.get(patient_id)
             for barcode in folder.iterdir():
                 if barcode.is_dir() and 'barcode' in barcode.name:
                     sample_id = barcode.name
-                    if "#patientID" not in df.columns:
-                        logging.error("❌ Required column '#patientID' is missing from the Excel file.")
-                        sys.exit(1)
-                    rows_to_add = df[df["#patientID"] == patient_id].copy()
-                    if rows_to_add.empty:
-                        logging.warning(f"⚠️ Unable to create dataframe: No data found for patient ID: {patient_id}")
+                    if rows is None:
+                        if unmatched is not None:
+                            unmatched.append((patient_id, sample_id))
+                        else:
+                            item('metadata', 'WARNING', f"Unable to create dataframe: No data found for patient ID: {patient_id} ({sample_id})")
                         continue
-                    rows_to_add["#SampleID"] = sample_id
-                    new_dataframe = pd.concat([new_dataframe, rows_to_add], ignore_index=True)
-                    console.print(f"🧬 Metadata for sample '{sample_id}' added successfully.")
+                    frames.append(rows.assign(**{"#SampleID": sample_id}))
+                    if verbose:
+                        item('metadata', 'OK', f"Metadata for sample '{sample_id}' of {folder.name} added.")
+    columns = ["#SampleID"] + list(df.columns)
+    if not frames:
+        return create_empty_dataframe(df)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+def format_data(folder_path: Path, df: pd.DataFrame) -> pd.DataFrame:
+    new_dataframe = collect_metadata(folder_path, df, index_patients(df))
     if new_dataframe.empty:
         logging.warning("⚠️ No matching patient IDs found in the source metadata file. Metadata DataFrame is empty — no metadata file will be created.")
         sys.exit(1)
     return new_dataframe
 
+
+def find_runs(base_dir: Path, workdir: str) -> list[Path]:
+    """Run folders of BASE_DIR, i.e. those holding the DEFAULT_WORK_DIR folder."""
+    return sorted(run for run in base_dir.iterdir() if run.is_dir() and (run / workdir).is_dir())
+
+
+#? Excel sheet and its patient index, read once by the parent and handed to each worker process
+_worker_df = None
+_worker_patients = None
+
+
+def _init_worker(df: pd.DataFrame, patients: dict[str, pd.DataFrame]) -> None:
+    global _worker_df, _worker_patients
+    _worker_df = df
+    _worker_patients = patients
+
+
+def write_run_metadata(run: Path, workdir: str, metadata_output: Path, force: bool) -> tuple[str, str, list[tuple[str, str]]]:
+    """
+    Write the `<run>_sample-metadata.tsv` of one run, returns its status ('created', 'exists'
+    or 'empty'), the file and the (patient_id, barcode) pairs missing from the sheet.
+    """
+    metadata_tsv = metadata_output / f"{run.name}_sample-metadata.tsv"
+    if metadata_tsv.exists() and not force:
+        return 'exists', str(metadata_tsv), []
+    #? reported by the parent : items printed by the workers would interleave and miss the log file
+    unmatched: list[tuple[str, str]] = []
+    data = collect_metadata(run / workdir, _worker_df, _worker_patients, verbose=False, unmatched=unmatched)
+    if data.empty:
+        return 'empty', str(metadata_tsv), unmatched
+    data.to_csv(metadata_tsv, sep='\t', index=False, encoding='utf-8')
+    return 'created', str(metadata_tsv), unmatched
+
+
+def format_all_runs(base_dir: Path, workdir: str, excel_path: Path, metadata_output: Path, force: bool, workers: int | None) -> None:
+    """
+    Brief
+    -------------
+    Create the sample metadata file of every run under `base_dir` in one pass : the Excel
+    file is read and indexed once, the runs are processed in parallel. Existing files are
+    kept unless `force`, runs without any matching patient are reported and skipped.
+    """
+    with stage("scan"):
+        runs = find_runs(base_dir, workdir)
+    if not runs:
+        logging.error(f"❌ No run folder containing '{workdir}' found in {base_dir}")
+        sys.exit(1)
+
+    with stage("load"):
+        df = load_excel_as_df(excel_path)
+        patients = index_patients(df)
+    created = 0
+    with stage("compute"), ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(df, patients)) as pool:
+        futures = {run: pool.submit(write_run_metadata, run, workdir, metadata_output, force) for run in runs}
+        for run, future in futures.items():
+            try:
+                status, metadata_tsv, unmatched = future.result()
+            except Exception as e:
+                item('run', 'ERROR', f"{run.name}: {e}")
+                continue
+            for patient_id, sample_id in unmatched:
+                item('metadata', 'WARNING', f"{run.name}: Unable to create dataframe: No data found for patient ID: {patient_id} ({sample_id})")
+            if status == 'created':
+                created += 1
+                item('run', 'CREATED', f"Successfully created file : {Path(metadata_tsv).name} at : {metadata_output}")
+            elif status == 'exists':
+                item('run', 'SKIP', f"{run.name}: metadata file already exists (use --force to overwrite).")
+            else:
+                item('run', 'EMPTY', f"{run.name}: no matching patient IDs found in the source metadata file, no metadata file created.")
+    console.print(f"[OK] {created}/{len(runs)} metadata files created.")
+
+
 if __name__ == '__main__':
     arg = parge_args()
 
@@ -192,7 +309,11 @@ if __name__ == '__main__':
         )
 
     console.print(gradient_text(ASCII_LOGO, colors))
-    final_path = Path(_base_dir) / Path(arg.folder_path) / _workdir
     metadata_path = Path(_metadata_folder) 
     excel_file = Path(_metadata_excel) 
-    format_and_save_to_tsv(path=final_path, excel_path=excel_file, metadata_output=metadata_path, args=arg)
+    with profiled_run(arg, "separate_metadata"), output_run(arg, "separate_metadata"):
+        if arg.all_runs:
+            format_all_runs(Path(_base_dir), _workdir, excel_file, metadata_path, arg.force, arg.workers)
+        else:
+            final_path = Path(_base_dir) / Path(arg.folder_path) / _workdir
+            format_and_save_to_tsv(path=final_path, excel_path=excel_file, metadata_output=metadata_path, args=arg)
@@ -0,0 +1,108 @@
+import os
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from .feature_tables import SparseFeatureTable
+
+STORE_EXTENSION: str = '.npz'
+DICTIONARY_FILENAME: str = 'taxon_dictionary.tsv'
+FORMAT_VERSION: int = 1
+
+
+class TaxonDictionary:
+    """
+    Brief
+    -------------
+    Append-only mapping between lineage strings (`d__Bacteria;p__...;g__...`) and integer ids.
+
+    The dictionary is a two-column TSV (id, lineage) meant to be shared by every run, so
+    the same lineage always gets the same id and stores only hold small integers.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lineages: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._saved = 0
+        if path.is_file():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    taxon_id, lineage = line.rstrip('\n').split('\t', 1)
+                    self._ids[lineage] = int(taxon_id)
+                    self._lineages.append(lineage)
+            self._saved = len(self._lineages)
+
+    def __len__(self) -> int:
+        return len(self._lineages)
+
+    def encode(self, lineages: list[str]) -> np.ndarray:
+        """Ids of the given lineages, unseen lineages are appended to the dictionary."""
+        ids = np.empty(len(lineages), dtype=np.int32)
+        for idx, lineage in enumerate(lineages):
+            taxon_id = self._ids.get(lineage)
+            if taxon_id is None:
+                taxon_id = self._ids[lineage] = len(self._lineages)
+                self._lineages.append(lineage)
+            ids[idx] = taxon_id
+        return ids
+
+    def decode(self, ids: np.ndarray) -> list[str]:
+        return [self._lineages[i] for i in ids]
+
+    def save(self) -> None:
+        """Append the lineages added since the dictionary was loaded."""
+        if self._saved == len(self._lineages):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for taxon_id in range(self._saved, len(self._lineages)):
+                f.write(f'{taxon_id}\t{self._lineages[taxon_id]}\n')
+        self._saved = len(self._lineages)
+
+
+def compact_dtype(values: np.ndarray) -> np.dtype:
+    """int32 for counts (absfreq), float32 for relative frequencies."""
+    if values.size == 0 or np.all(np.mod(values, 1) == 0):
+        return np.dtype(np.int32)
+    return np.dtype(np.float32)
+
+
+def write_abundance_store(table: SparseFeatureTable, path: Path, dictionary: TaxonDictionary) -> None:
+    """
+    Write a feature table as a compressed `.npz` : taxa are stored as their dictionary ids
+    and each sample is a sparse column (CSC) of int32 counts or float32 frequencies.
+    """
+    taxon_ids = dictionary.encode(table.features)
+    matrix = table.matrix.tocsc()
+    matrix = matrix.astype(compact_dtype(matrix.data))
+    tmp_file = path.with_name(f'{path.stem}.tmp{STORE_EXTENSION}')
+    np.savez_compressed(
+        tmp_file,
+        format_version=np.int32(FORMAT_VERSION),
+        taxon_ids=taxon_ids,
+        samples=np.asarray(table.samples, dtype=np.str_),
+        shape=np.asarray(matrix.shape, dtype=np.int64),
+        data=matrix.data,
+        indices=matrix.indices.astype(np.int32),
+        indptr=matrix.indptr.astype(np.int64),
+    )
+    os.replace(tmp_file, path)
+    dictionary.save()
+
+
+def read_abundance_store(path: Path, dictionary: TaxonDictionary | None = None) -> SparseFeatureTable:
+    """
+    Read a store written by `write_abundance_store`. Without a dictionary, the features
+    are named after their ids (`taxon:<id>`), which is enough for the diversity metrics.
+    """
+    with np.load(path, allow_pickle=False) as store:
+        if int(store['format_version']) != FORMAT_VERSION:
+            raise ValueError(f"❌ Unsupported abundance store version in {path}: {int(store['format_version'])}")
+        taxon_ids = store['taxon_ids']
+        samples = [str(s) for s in store['samples']]
+        matrix = sparse.csc_matrix((store['data'], store['indices'], store['indptr']), shape=tuple(store['shape']))
+
+    features = dictionary.decode(taxon_ids) if dictionary is not None else [f'taxon:{i}' for i in taxon_ids]
+    return SparseFeatureTable(features=features, samples=samples, matrix=matrix.tocsr())
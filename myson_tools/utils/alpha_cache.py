@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .alpha_diversity import METRICS, alpha_diversity
+
+CACHE_FILENAME: str = '.alpha_cache.json'
+#? part of every key : bump it when a metric definition changes so old results are not reused
+CACHE_VERSION: int = 1
+
+
+def load_alpha_cache(path: Path) -> dict[str, list[float]]:
+    """Cached metrics (in `METRICS` order) keyed by sample fingerprint, empty when missing or unreadable."""
+    if not path.is_file():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def save_alpha_cache(path: Path, entries: dict[str, list[float]]) -> None:
+    tmp_file = path.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(entries, f)
+    os.replace(tmp_file, path)
+
+
+def feature_fingerprints(features: list[str]) -> np.ndarray:
+    """One 64-bit hash per taxon name, so a sample key does not depend on the column order of the table."""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(str(feature).encode('utf-8'), digest_size=8).digest(), 'little') for feature in features],
+        dtype=np.uint64,
+    )
+
+
+def sample_keys(counts: np.ndarray, features: list[str]) -> list[str]:
+    """
+    Key of every sample (row) of a (samples × taxa) matrix : a hash of its non-zero
+    (taxon, count) pairs and of the metric parameters. Adding taxa or samples to a
+    table leaves the keys of the unchanged samples as they were.
+    """
+    fingerprints = feature_fingerprints(features)
+    parameters = f'{CACHE_VERSION}:{",".join(METRICS)}'.encode()
+    keys = []
+    for row in counts:
+        present = np.flatnonzero(row)
+        order = np.argsort(fingerprints[present])
+        digest = hashlib.blake2b(parameters, digest_size=16)
+        digest.update(fingerprints[present][order].tobytes())
+        digest.update(row[present][order].astype(np.float64).tobytes())
+        keys.append(digest.hexdigest())
+    return keys
+
+
+def cached_alpha_diversity(counts: np.ndarray, features: list[str], cache: dict[str, list[float]]) -> tuple[dict[str, np.ndarray], dict[str, list[float]]]:
+    """
+    Brief
+    -------------
+    `alpha_diversity` of a (samples × taxa) matrix computing only the samples whose key
+    is not in `cache` yet.
+
+    Returns
+    --------------
+    The metrics of every sample, and the cache entries of the samples just computed
+    """
+    keys = sample_keys(counts, features)
+    missing = [idx for idx, key in enumerate(keys) if key not in cache]
+
+    values = np.empty((len(keys), len(METRICS)))
+    for idx, key in enumerate(keys):
+        if key in cache:
+            values[idx] = cache[key]
+
+    new_entries: dict[str, list[float]] = {}
+    if missing:
+        computed = alpha_diversity(counts[missing])
+        values[missing] = np.column_stack([computed[name] for name in METRICS])
+        new_entries = {keys[idx]: values[idx].tolist() for idx in missing}
+
+    metrics = {name: values[:, col] for col, name in enumerate(METRICS)}
+    metrics['richness'] = metrics['richness'].astype(np.int64)
+    return metrics, new_entries
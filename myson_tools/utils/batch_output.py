@@ -0,0 +1,134 @@
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import argparse
+import logging
+import os
+import sys
+import threading
+
+from rich.console import Console
+from rich.table import Table
+
+QUIET: int = 0
+NORMAL: int = 1
+VERBOSE: int = 2
+
+LOG_DIR: Path = Path.home() / '.myson-tools' / 'logs'
+#? per-item lines are written in large blocks, a batch of thousands of files costs a handful of writes
+LOG_BUFFER_SIZE: int = 1 << 20
+#? item statuses shown on the console at every level (-q included), the others only in verbose mode
+ALWAYS_SHOWN: frozenset[str] = frozenset({'ERROR', 'WARNING'})
+
+
+class BatchOutput:
+    """
+    Brief
+    -------------
+    Leveled output of the per-item loops of a command (one line per folder, file or sample).
+
+    `item` counts the outcome of one item by step and status and writes its line to the
+    buffered log file, opened on the first line so that a command without items leaves no
+    log behind; the console only gets it in verbose mode (errors and warnings are always shown).
+    At the end of the command the counts are printed as one Rich summary table, so a batch
+    of thousands of items costs a few lines of terminal and no Rich rendering per item.
+    Thread-safe : the extractors report from their copy threads.
+    """
+
+    def __init__(self):
+        self.level = NORMAL
+        self.counts: dict[tuple[str, str], int] = {}
+        self.log_path: Path | None = None
+        self.log_file = None
+        self.log_failed = False
+        self.lock = threading.Lock()
+        #? pool workers forked while the log is open inherit its buffer, only the command itself writes to it
+        self.pid = os.getpid()
+
+    def item(self, step: str, status: str, message: str) -> None:
+        with self.lock:
+            key = (step, status)
+            self.counts[key] = self.counts.get(key, 0) + 1
+            if self.log_file is None and self.log_path is not None and not self.log_failed and os.getpid() == self.pid:
+                self._open_log_file()
+            if self.log_file is not None and os.getpid() == self.pid:
+                self.log_file.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} [{status}] {step}: {message}\n")
+            if self.level >= VERBOSE or status in ALWAYS_SHOWN:
+                sys.stdout.write(f"[{status}] {message}\n")
+
+    def open_log(self, path: Path) -> None:
+        """Send the per-item lines to `path`, created with the first line."""
+        self.log_path = path
+        self.log_file = None
+        self.log_failed = False
+        self.pid = os.getpid()
+
+    def _open_log_file(self) -> None:
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self.log_file = open(self.log_path, 'a', encoding='utf-8', buffering=LOG_BUFFER_SIZE)
+        except OSError as e:
+            self.log_failed = True
+            sys.stdout.write(f"[WARNING] Could not open the log file {self.log_path}: {e}\n")
+
+    def close_log(self) -> None:
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
+            elif self.log_path is not None:
+                #? no item was written : no log file to point to
+                self.log_path = None
+
+    def report(self, console: Console) -> None:
+        table = Table(title="Summary")
+        for column in ('step', 'status', 'items'):
+            table.add_column(column, justify='right' if column == 'items' else 'left')
+        for (step, status), count in sorted(self.counts.items()):
+            table.add_row(step, status, str(count))
+        console.print(table)
+
+
+#? one output per process : the helpers of a command report to it without passing it around
+_output = BatchOutput()
+
+
+def item(step: str, status: str, message: str) -> None:
+    """Record the outcome of one item of a batch (e.g. `item('sort', 'OK', 'barcode01 -> Patient_12')`)."""
+    _output.item(step, status, message)
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("output")
+    levels = group.add_mutually_exclusive_group()
+    levels.add_argument("-q", "--quiet", action="store_true", help="Only print errors, warnings and the final summary.")
+    levels.add_argument("-v", "--verbose", action="store_true", help="Also print one line per folder, file or sample processed.")
+    group.add_argument("--log-file", type=Path, default=None, metavar="PATH", help=f"File receiving the per-item lines (default: {LOG_DIR}/<command>_<timestamp>.log).")
+
+
+@contextmanager
+def output_run(args: argparse.Namespace, command: str):
+    """
+    Brief
+    -------------
+    Wrap the body of a command's `main` : sets the output level from -q / -v (logging
+    included), sends the per-item lines to the log file and prints the summary table
+    of the items when the command ends, `sys.exit` included.
+    """
+    if getattr(args, 'quiet', False):
+        _output.level = QUIET
+    elif getattr(args, 'verbose', False):
+        _output.level = VERBOSE
+    logging.getLogger().setLevel(logging.WARNING if _output.level == QUIET else logging.INFO)
+
+    _output.open_log(getattr(args, 'log_file', None) or LOG_DIR / f"{command}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    try:
+        yield
+    finally:
+        _output.close_log()
+        if _output.counts:
+            console = Console(soft_wrap=True)
+            _output.report(console)
+            if _output.log_path is not None:
+                console.print(f"Details of every item in {_output.log_path}", markup=False, highlight=False)
+        _output.counts.clear()
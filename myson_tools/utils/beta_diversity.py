@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from scipy import sparse
+
+METRICS: tuple[str, ...] = ('braycurtis', 'jaccard')
+#? samples per tile side : a (BLOCK_SIZE × taxa) dense tile stays within a few tens of MB
+BLOCK_SIZE: int = 1024
+
+
+def condensed_size(n_samples: int) -> int:
+    return n_samples * (n_samples - 1) // 2
+
+
+def condensed_offset(i: int, n_samples: int) -> int:
+    """Position of the pair (i, i + 1) in a condensed matrix, the pairs (i, j > i) follow contiguously."""
+    return n_samples * i - i * (i + 1) // 2
+
+
+def _braycurtis_tile(rows: sparse.csr_matrix, columns: np.ndarray) -> np.ndarray:
+    """
+    Bray–Curtis between every row of `rows` (sparse) and of `columns` (dense), as
+    (Sx + Sy - 2 Σ min(x, y)) / (Sx + Sy). Only the taxa present in x matter to the
+    min, so each row costs nnz(x) × len(columns).
+    """
+    row_totals = np.asarray(rows.sum(axis=1)).ravel()
+    column_totals = columns.sum(axis=1)
+    shared = np.empty((rows.shape[0], columns.shape[0]))
+    for r in range(rows.shape[0]):
+        start, stop = rows.indptr[r], rows.indptr[r + 1]
+        shared[r] = np.minimum(columns[:, rows.indices[start:stop]], rows.data[start:stop]).sum(axis=1)
+    totals = row_totals[:, None] + column_totals[None, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (totals - 2.0 * shared) / totals
+
+
+def _jaccard_tile(rows: sparse.csr_matrix, columns: sparse.csr_matrix) -> np.ndarray:
+    """Jaccard on presence / absence, the intersections of a whole tile being one sparse product."""
+    intersection = (rows @ columns.T).toarray()
+    union = np.asarray(rows.sum(axis=1)) + np.asarray(columns.sum(axis=1)).T - intersection
+    #? two empty samples are at distance 0, like scipy
+    return 1.0 - np.divide(intersection, union, out=np.ones_like(intersection), where=union > 0)
+
+
+def _fill_row_block(counts: sparse.csr_matrix, presence: sparse.csr_matrix, metric: str, start: int, stop: int,
+                    block_size: int, out: np.memmap) -> None:
+    """Write the pairs (i, j > i) of the rows [start, stop) into the condensed matrix, tile by tile."""
+    n_samples = counts.shape[0]
+    rows = counts[start:stop] if metric == 'braycurtis' else presence[start:stop]
+    for column_start in range(start, n_samples, block_size):
+        column_stop = min(column_start + block_size, n_samples)
+        if metric == 'braycurtis':
+            tile = _braycurtis_tile(rows, counts[column_start:column_stop].toarray())
+        else:
+            tile = _jaccard_tile(rows, presence[column_start:column_stop])
+
+        for i in range(start, stop):
+            first = max(i + 1, column_start)
+            if first >= column_stop:
+                continue
+            offset = condensed_offset(i, n_samples) + (first - i - 1)
+            out[offset:offset + column_stop - first] = tile[i - start, first - column_start:]
+
+
+def beta_diversity(counts: np.ndarray | sparse.spmatrix, metric: str, output: Path,
+                   block_size: int = BLOCK_SIZE, workers: int | None = None) -> np.memmap:
+    """
+    Brief
+    -------------
+    Pairwise distances between the samples of a (samples × taxa) count matrix, written
+    into a condensed `.npy` (the layout of scipy's `pdist`) memory-mapped on `output`.
+
+    The upper triangle is computed in (block_size × block_size) tiles, one row of tiles
+    per task in a thread pool; only the tiles and the pages being written stay in RAM,
+    so the matrix of 20k samples (1.6 GB) does not need to fit in memory.
+
+    Returns
+    --------------
+    The condensed matrix, still memory-mapped
+    """
+    if metric not in METRICS:
+        raise ValueError(f"❌ Unknown beta diversity metric '{metric}', expected one of {', '.join(METRICS)}.")
+
+    matrix = sparse.csr_matrix(counts, dtype=np.float64)
+    matrix.eliminate_zeros()
+    presence = matrix.copy()
+    presence.data[:] = 1.0
+
+    n_samples = matrix.shape[0]
+    out = open_memmap(output, mode='w+', dtype=np.float64, shape=(condensed_size(n_samples),))
+    starts = range(0, n_samples, block_size)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_fill_row_block, matrix, presence, metric, start, min(start + block_size, n_samples), block_size, out)
+            for start in starts
+        ]
+        for future in futures:
+            future.result()
+    out.flush()
+    return out
+
+
+def write_square_tsv(condensed: np.ndarray, samples: list[str], path: Path, chunk_rows: int = BLOCK_SIZE) -> None:
+    """Write a condensed matrix as a square, QIIME-style TSV distance matrix, `chunk_rows` rows at a time."""
+    n_samples = len(samples)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\t' + '\t'.join(samples) + '\n')
+        for start in range(0, n_samples, chunk_rows):
+            stop = min(start + chunk_rows, n_samples)
+            block = np.zeros((stop - start, n_samples))
+            for i in range(start, stop):
+                #? left of the diagonal : (j, i) for j < i, read column-wise from the earlier rows
+                j = np.arange(i)
+                block[i - start, :i] = condensed[condensed_offset(j, n_samples) + (i - j - 1)]
+                block[i - start, i + 1:] = condensed[condensed_offset(i, n_samples):condensed_offset(i, n_samples) + n_samples - i - 1]
+            for sample, row in zip(samples[start:stop], block):
+                f.write(sample + '\t' + '\t'.join(f'{v:.6g}' for v in row) + '\n')
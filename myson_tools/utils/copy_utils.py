@@ -0,0 +1,173 @@
+import hashlib
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+#? from linux/fs.h : _IOW(0x94, 9, int), clones the extents of one file into another (btrfs, xfs, ...)
+FICLONE: int = 0x40049409
+HASH_CHUNK_SIZE: int = 1024 * 1024
+
+HARDLINK: str = 'hardlink'
+REFLINK: str = 'reflink'
+COPY: str = 'copy'
+
+
+@dataclass(slots=True)
+class CopyReport:
+    methods: dict[str, int] = field(default_factory=dict)
+    bytes_copied: int = 0
+    bytes_linked: int = 0
+    failed: list[tuple[Path, str]] = field(default_factory=list)
+    digests: dict[Path, str] = field(default_factory=dict)
+
+    def add(self, method: str, size: int) -> None:
+        self.methods[method] = self.methods.get(method, 0) + 1
+        if method == COPY:
+            self.bytes_copied += size
+        else:
+            self.bytes_linked += size
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(source: Path, destination: Path) -> bool:
+    if sys.platform != 'linux':
+        return False
+    import fcntl
+    try:
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        destination.unlink(missing_ok=True)
+        return False
+
+
+def link_or_copy(source: Path, destination: Path, allow_links: bool = True) -> str:
+    """
+    Brief
+    -------------
+    Put the content of `source` at `destination` as cheaply as the filesystem allows.
+
+    On the same device a reflink (copy-on-write clone) is tried first, then a hardlink.
+    A full copy is only made across devices, or when links are disabled.
+
+    Returns
+    --------------
+    The method used : 'reflink', 'hardlink' or 'copy'
+    """
+    if destination.exists() or destination.is_symlink():
+        destination.unlink()
+
+    if allow_links and os.stat(source).st_dev == os.stat(destination.parent).st_dev:
+        if _reflink(source, destination):
+            return REFLINK
+        try:
+            os.link(source, destination)
+            return HARDLINK
+        except OSError:
+            pass
+
+    shutil.copyfile(source, destination)
+    shutil.copystat(source, destination)
+    return COPY
+
+
+def group_by_content(sources: list[Path], digests: dict[Path, str] | None = None) -> list[list[Path]]:
+    """
+    Group identical files together. Only files sharing their size with another
+    file are hashed, so unique sizes cost a single stat. Hashes already in `digests`
+    are reused and the computed ones are stored in it when given.
+    """
+    by_size: dict[int, list[Path]] = {}
+    for source in dict.fromkeys(sources):
+        by_size.setdefault(os.stat(source).st_size, []).append(source)
+
+    groups: list[list[Path]] = []
+    for same_size in by_size.values():
+        if len(same_size) == 1:
+            groups.append(same_size)
+            continue
+        by_digest: dict[str, list[Path]] = {}
+        for source in same_size:
+            digest = digests.get(source) if digests is not None else None
+            if digest is None:
+                digest = file_digest(source)
+            if digests is not None:
+                digests[source] = digest
+            by_digest.setdefault(digest, []).append(source)
+        groups.extend(by_digest.values())
+    return groups
+
+
+def copy_deduplicated(
+    pairs: list[tuple[Path, Path]],
+    workers: int = 4,
+    allow_links: bool = True,
+    on_done: Callable[[Path, Path, str], None] | None = None,
+    with_digests: bool = False,
+    digests: dict[Path, str] | None = None,
+) -> CopyReport:
+    """
+    Brief
+    -------------
+    Copy `(source, destination)` pairs with a thread pool, storing each distinct content once.
+
+    The first destination of a content is filled with `link_or_copy`, every other
+    destination of the same content is then hardlinked to it (outputs share the same
+    output filesystem), so e.g. a taxonomy copied into 8 folders costs one copy.
+    With `with_digests`, the report also holds the content hash of every source; the
+    hashes already known by the caller can be handed over in `digests`.
+    """
+    destinations: dict[Path, list[Path]] = {}
+    for source, destination in pairs:
+        destinations.setdefault(source, []).append(destination)
+
+    report = CopyReport(digests=dict(digests or {}))
+
+    def copy_group(group: list[Path]) -> list[tuple[Path, Path, str, int]]:
+        if with_digests and group[0] not in report.digests:
+            digest = file_digest(group[0])
+            for source in group:
+                report.digests[source] = digest
+        done = []
+        targets = [(source, destination) for source in group for destination in destinations[source]]
+        size = os.stat(group[0]).st_size
+        first_source, first_destination = targets[0]
+        done.append((first_source, first_destination, link_or_copy(first_source, first_destination, allow_links), size))
+        for source, destination in targets[1:]:
+            try:
+                if destination.exists():
+                    destination.unlink()
+                os.link(first_destination, destination)
+                method = HARDLINK
+            except OSError:
+                method = link_or_copy(source, destination, allow_links)
+            done.append((source, destination, method, size))
+        return done
+
+    groups = group_by_content(list(destinations), report.digests)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {pool.submit(copy_group, group): group for group in groups}
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                for source in futures[future]:
+                    report.failed.append((source, str(e)))
+                continue
+            for source, destination, method, size in results:
+                report.add(method, size)
+                if on_done:
+                    on_done(source, destination, method)
+    return report
@@ -0,0 +1,215 @@
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from rich.console import Console
+
+GIGABYTE: int = 1024 ** 3
+DEFAULT_DOCKER_ROOT: str = '/var/lib/docker'
+#? headroom kept on top of the learned peak usage, past runs are only an estimate
+SAFETY_FACTOR: float = 1.25
+
+
+@dataclass(frozen=True, slots=True)
+class WatchedVolume:
+    role: str
+    path: Path
+    device: int
+
+
+@dataclass(slots=True)
+class PeakUsageTracker:
+    """
+    Brief
+    -------------
+    Polls the free space of the watched volumes in a background thread while a
+    pipeline run is in progress and keeps the lowest value seen for each role.
+
+    The peak usage of a role is the difference between the free space at the start
+    of the run and the lowest free space observed during it.
+    """
+    volumes: list[WatchedVolume]
+    poll_interval: float = 5.0
+    _start_free: dict[str, int] = field(default_factory=dict)
+    _min_free: dict[str, int] = field(default_factory=dict)
+    _stop: threading.Event = field(default_factory=threading.Event)
+    _thread: threading.Thread | None = None
+
+    def _sample(self) -> None:
+        for volume in self.volumes:
+            free = free_bytes(volume.path)
+            self._min_free[volume.role] = min(self._min_free.get(volume.role, free), free)
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self._sample()
+
+    def __enter__(self) -> "PeakUsageTracker":
+        self._start_free = {volume.role: free_bytes(volume.path) for volume in self.volumes}
+        self._min_free = dict(self._start_free)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+
+    @property
+    def peak_bytes(self) -> dict[str, int]:
+        return {role: max(self._start_free[role] - self._min_free[role], 0) for role in self._start_free}
+
+
+def free_bytes(path: Path) -> int:
+    return shutil.disk_usage(existing_parent(path)).free
+
+
+def existing_parent(path: Path) -> Path:
+    """Return `path` or its closest existing parent, the results folder may not be created yet."""
+    path = path.absolute()
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return path
+
+
+def directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def watched_volumes(roles: dict[str, Path | None]) -> list[WatchedVolume]:
+    """
+    Build the list of volumes to watch from a `role -> path` mapping.
+    Roles whose path is None (e.g. no Docker root on this machine) are ignored, and
+    roles living on the same device are watched once under a joined name (e.g. `work+results`).
+    """
+    by_device: dict[int, WatchedVolume] = {}
+    for role, path in roles.items():
+        if path is None:
+            continue
+        location = existing_parent(path)
+        device = os.stat(location).st_dev
+        if device in by_device:
+            known = by_device[device]
+            by_device[device] = WatchedVolume(role=f"{known.role}+{role}", path=known.path, device=device)
+        else:
+            by_device[device] = WatchedVolume(role=role, path=location, device=device)
+    return list(by_device.values())
+
+
+def docker_root() -> Path | None:
+    _docker_root = os.getenv('DOCKER_ROOT', DEFAULT_DOCKER_ROOT)
+    path = Path(_docker_root)
+    return path if path.exists() else None
+
+
+def load_usage_history(history_file: Path) -> list[dict]:
+    if not history_file.is_file():
+        return []
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return []
+
+
+def record_usage(history_file: Path, folder_name: str, input_bytes: int, peak_bytes: dict[str, int]) -> None:
+    history = load_usage_history(history_file)
+    history.append({
+        'folder': folder_name,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'input_bytes': input_bytes,
+        'peak_bytes': peak_bytes,
+    })
+    history_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = history_file.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_file, history_file)
+
+
+def usage_ratios(history: list[dict]) -> dict[str, float]:
+    """Highest peak usage per GB of input seen in past runs, for each role."""
+    ratios: dict[str, float] = {}
+    for entry in history:
+        input_gb = entry.get('input_bytes', 0) / GIGABYTE
+        if input_gb <= 0:
+            continue
+        for role, peak in entry.get('peak_bytes', {}).items():
+            ratios[role] = max(ratios.get(role, 0.0), peak / GIGABYTE / input_gb)
+    return ratios
+
+
+def required_free_bytes(volumes: list[WatchedVolume], input_bytes: int, history: list[dict], min_free_bytes: int) -> dict[int, int]:
+    """Free space needed on each device (keyed by st_dev) before a run can be launched."""
+    ratios = usage_ratios(history)
+    input_gb = input_bytes / GIGABYTE
+    return {
+        volume.device: max(int(input_gb * ratios.get(volume.role, 0.0) * SAFETY_FACTOR * GIGABYTE), min_free_bytes)
+        for volume in volumes
+    }
+
+
+def _format_gb(value: int) -> str:
+    return f"{value / GIGABYTE:.1f} GB"
+
+
+def wait_for_free_space(
+    volumes: list[WatchedVolume],
+    required: dict[int, int],
+    folder_name: str,
+    pause_log: Path,
+    stream: Console,
+    poll_interval: float = 60.0,
+) -> None:
+    """
+    Block until every watched device has at least its required free space.
+    Each pause and resume is written to `pause_log`.
+    """
+    by_device = {volume.device: volume for volume in volumes}
+    paused_since: float | None = None
+
+    while True:
+        free = {device: free_bytes(by_device[device].path) for device in required}
+        lacking = {
+            device: (free[device], needed)
+            for device, needed in required.items()
+            if free[device] < needed
+        }
+        if not lacking:
+            break
+
+        if paused_since is None:
+            paused_since = time.monotonic()
+            details = ', '.join(
+                f"{by_device[device].role} ({by_device[device].path}): {_format_gb(available)} free / {_format_gb(needed)} needed"
+                for device, (available, needed) in lacking.items()
+            )
+            _log_pause(pause_log, f"PAUSE before {folder_name} - {details}")
+            stream.print(f"[bold yellow]⏸ Low disk space, holding back {folder_name}:[/bold yellow] {details}")
+        time.sleep(poll_interval)
+
+    if paused_since is not None:
+        waited = time.monotonic() - paused_since
+        _log_pause(pause_log, f"RESUME {folder_name} after {waited:.0f}s")
+        stream.print(f"[bold green]▶ Disk space available again, resuming with {folder_name}[/bold green]")
+
+
+def _log_pause(pause_log: Path, message: str) -> None:
+    pause_log.parent.mkdir(parents=True, exist_ok=True)
+    with open(pause_log, 'a', encoding='utf-8') as f:
+        f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}\n")
@@ -0,0 +1,318 @@
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Callable
+
+from . import metrics
+from .batch_output import item
+from .copy_utils import copy_deduplicated, file_digest
+from .manifest import ManifestEntry, destination_key, is_tracked, is_unchanged, load_manifest, save_manifest, vanished_sources
+from .profiling import stage
+from . import sample_ids
+
+log = logging.getLogger("rich")
+
+REFERENCE: tuple[str, ...] = tuple(sample_ids.REFERENCE.values())
+COLLAPSE_FOLDER: str = 'collapseTables'
+#? taxonomic levels and frequencies of the collapsed tables produced by the pipeline
+LEVELS: list[str] = ['level4', 'level5', 'level6', 'level7']
+FREQUENCY: list[str] = ['relfreq', 'absfreq']
+TAXONOMY_FOLDER: str = 'assignTaxonomy'
+
+
+@dataclass(frozen=True, slots=True)
+class ArtifactPattern:
+    """
+    One wanted artifact : the Results subfolder it lives in, the pattern its file name
+    must contain and the output folders (relative to the output directory) it is copied to.
+    When `convert` is set, the artifact is written through it (e.g. `.qza` -> `.tsv`)
+    under `output_extension` instead of being copied, and `rename(file_name, destination)`
+    can give it a different name in each destination.
+    """
+    label: str
+    subfolder: str
+    pattern: str
+    destinations: tuple[str, ...]
+    convert: Callable[[Path, Path], None] | None = None
+    output_extension: str | None = None
+    rename: Callable[[str, str], str] | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedCopy:
+    label: str
+    source: Path
+    destination: Path
+    convert: Callable[[Path, Path], None] | None = None
+
+
+@dataclass(slots=True)
+class ExtractionPlan:
+    copies: list[PlannedCopy] = field(default_factory=list)
+    found: dict[str, int] = field(default_factory=dict)
+    skipped: dict[str, str] = field(default_factory=dict)
+    files_checked: int = 0
+
+
+def table_patterns(levels: list, frequencies: list, extension: str) -> list[ArtifactPattern]:
+    """Collapsed tables : one pattern per level × frequency, copied to its `<freq>_<level>` folder."""
+    return [
+        ArtifactPattern(
+            label='collapsed table',
+            subfolder=COLLAPSE_FOLDER,
+            pattern=re.escape(f'{freq}-{level}{extension}'),
+            destinations=(f'{freq}_{level}',),
+        )
+        for level in levels
+        for freq in frequencies
+    ]
+
+
+def output_folder_names(levels: list, frequencies: list) -> tuple[str, ...]:
+    return tuple(f'{freq}_{level}' for level in levels for freq in frequencies)
+
+
+def get_run_name(path: Path) -> (str | None):
+    return sample_ids.SampleID.from_path(path).run
+
+
+def new_file_name(root_folder: Path, filename: str) -> str:
+    sample = sample_ids.SampleID.from_path(root_folder)
+    #? barcode-level results (Results_barcodeNN-…) have no patient folder in their name
+    pid = sample.patient or root_folder.name.split('_', 1)[-1]
+    stem, extension = filename.rsplit('.', 1)
+    if any(ref in pid for ref in REFERENCE):
+        return f'{stem}-{sample.run}_{pid}.{extension}'
+    else:
+        return f'{stem}-{pid}.{extension}'
+
+
+def to_plural_if_needed(x: int, string: str) -> str:
+    return f'{string}s' if x > 1 and not string.endswith('s') else string
+
+
+def _compile_pattern_table(patterns: list[ArtifactPattern]) -> dict[str, tuple[re.Pattern, list[ArtifactPattern]]]:
+    """
+    Group the patterns by subfolder and fold each group into a single alternation,
+    so every file name is matched once whatever the number of wanted artifacts.
+    """
+    grouped: dict[str, list[ArtifactPattern]] = {}
+    for pattern in patterns:
+        grouped.setdefault(pattern.subfolder, []).append(pattern)
+    return {
+        subfolder: (re.compile('|'.join(f'(?P<p{idx}>{p.pattern})' for idx, p in enumerate(group))), group)
+        for subfolder, group in grouped.items()
+    }
+
+
+def build_extraction_plan(path: Path, patterns: list[ArtifactPattern], output_dir: Path) -> ExtractionPlan:
+    """
+    Brief
+    -------------
+    Walks the `2_Results` folder once and lists every artifact to copy.
+
+    Each `Results_*` folder and each of its wanted subfolders is listed a single time,
+    and every file name is matched against the precompiled pattern table. A Results
+    folder missing one of the wanted subfolders is skipped as a whole.
+    """
+    if not path.exists() or not path.is_dir():
+        print(f"[ERROR] The path {path} is invalid. Please check the directory.", file=sys.stderr)
+        sys.exit(1)
+
+    pattern_table = _compile_pattern_table(patterns)
+    plan = ExtractionPlan()
+
+    for folder in path.iterdir():
+        if not (folder.is_dir() and 'Result' in folder.name):
+            continue
+
+        subfolders = [f for f in folder.iterdir() if f.is_dir()]
+        located: dict[str, Path] = {}
+        for wanted in pattern_table:
+            match = next((f for f in subfolders if wanted in f.name), None)
+            if match is None:
+                item('scan', 'SKIP', f"Folder {wanted} was not found for {folder.name} — Skipping copy.")
+                plan.skipped[folder.name] = f' reason : Folder {wanted} not found.'
+                break
+            located[wanted] = match
+        else:
+            for wanted, subfolder in located.items():
+                regex, group = pattern_table[wanted]
+                for file in subfolder.iterdir():
+                    plan.files_checked += 1
+                    match = regex.search(file.name)
+                    if match is None:
+                        continue
+                    artifact = group[int(match.lastgroup[1:])]
+                    item('scan', 'FOUND', f"File '{file.name}' found at '{file.parent}'")
+                    plan.found[artifact.label] = plan.found.get(artifact.label, 0) + 1
+                    file_name = new_file_name(folder, file.name)
+                    if artifact.output_extension:
+                        file_name = f'{file_name.rsplit(".", 1)[0]}{artifact.output_extension}'
+                    for destination in artifact.destinations:
+                        plan.copies.append(PlannedCopy(
+                            label=artifact.label,
+                            source=file,
+                            destination=output_dir / destination / (artifact.rename(file_name, destination) if artifact.rename else file_name),
+                            convert=artifact.convert,
+                        ))
+
+    return plan
+
+
+def report_plan(plan: ExtractionPlan) -> None:
+    total_found = sum(plan.found.values())
+    if total_found == 0 and plan.files_checked > 0:
+        log.warning("[yellow][WARNING][/yellow] No matching files found for the target levels.")
+        sys.exit(1)
+    elif total_found == 0 and plan.files_checked == 0:
+        log.warning("[yellow][WARNING][/yellow] No files found in the specified directory. Check the folder and file locations.")
+        sys.exit(1)
+
+    # Summary of results
+    print('\n')
+    log.info("[bold green][INFO][/bold green] Verification complete: %d %s checked.", plan.files_checked, to_plural_if_needed(plan.files_checked, 'file'))
+    for label, count in plan.found.items():
+        log.info("[bold green][OK][/bold green] %d %s %s found.", count, label, to_plural_if_needed(count, 'file'))
+    if plan.skipped:
+        log.warning("[yellow][WARNING][/yellow] %d %s skipped (see the log file for the reasons).", len(plan.skipped), to_plural_if_needed(len(plan.skipped), 'folder'))
+
+    print('\n')
+    log.info("[bold green][INFO][/bold green] Proceeding to the file copy process.")
+    log.info("[bold green][INFO][/bold green] Starting the transfer of target files to the custom (frequency_level/) destination folder.\nPlease wait while the operation completes...")
+    print('\n\n')
+
+
+def execute_plan(
+    plan: ExtractionPlan,
+    output_folders: tuple[str, ...],
+    output_dir: Path,
+    workers: int = 4,
+    allow_links: bool = True,
+    force: bool = False,
+) -> None:
+    """
+    Copy the planned artifacts that are new or whose source changed since the last run,
+    according to the manifest kept in `output_dir`. With `force`, everything is copied again.
+    Outputs whose source has disappeared are reported and dropped from the manifest, their
+    files are left in place.
+    """
+    for name in output_folders:
+        (output_dir / name).mkdir(parents=True, exist_ok=True)
+
+    manifest = load_manifest(output_dir)
+    pending: list[tuple[PlannedCopy, str, os.stat_result]] = []
+    touched: list[tuple[PlannedCopy, str, os.stat_result]] = []
+    unchanged = 0
+    for copy in plan.copies:
+        key = destination_key(output_dir, copy.destination)
+        source_stat = os.stat(copy.source)
+        if not force and is_unchanged(manifest.get(key), copy.source, source_stat, copy.destination):
+            unchanged += 1
+        elif not force and is_tracked(manifest.get(key), copy.source, copy.destination):
+            touched.append((copy, key, source_stat))
+        else:
+            pending.append((copy, key, source_stat))
+
+    #? sources with a new size or mtime are hashed : an identical content (e.g. a `touch`) is not copied again
+    touched_sources = list(dict.fromkeys(copy.source for copy, _, _ in touched))
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        digests = dict(zip(touched_sources, pool.map(file_digest, touched_sources)))
+    for copy, key, source_stat in touched:
+        if digests[copy.source] == manifest[key].digest:
+            unchanged += 1
+            manifest[key] = replace(manifest[key], size=source_stat.st_size, mtime_ns=source_stat.st_mtime_ns)
+        else:
+            pending.append((copy, key, source_stat))
+
+    if unchanged:
+        log.info("[cyan][SKIP][/cyan] %d unchanged %s already up to date in the output directory.", unchanged, to_plural_if_needed(unchanged, 'file'))
+
+    def on_done(source: Path, destination: Path, method: str) -> None:
+        item('copy', method.upper(), f"File '{source.name}' was copied to '{destination}' ({method})")
+
+    report = copy_deduplicated(
+        [(copy.source, copy.destination) for copy, _, _ in pending if copy.convert is None],
+        workers=workers,
+        allow_links=allow_links,
+        on_done=on_done,
+        with_digests=True,
+        digests=digests,
+    )
+    conversions = [copy for copy, _, _ in pending if copy.convert is not None]
+    failed_before = len(report.failed)
+    convert_artifacts(conversions, report.digests, report.failed, workers)
+    if conversions:
+        report.methods['converted'] = len(conversions) - (len(report.failed) - failed_before)
+    for method, count in report.methods.items():
+        metrics.inc('extraction_files_total', count, method=method)
+    metrics.inc('extraction_files_total', len(report.failed), method='failed')
+    metrics.inc('extraction_bytes_total', report.bytes_copied, method='copy')
+    metrics.inc('extraction_bytes_total', report.bytes_linked, method='link')
+    failed_sources = {source for source, _ in report.failed}
+    for source, error in report.failed:
+        item('copy', 'ERROR', f"{source} : {error}")
+
+    for copy, key, source_stat in pending:
+        if copy.source in failed_sources:
+            continue
+        manifest[key] = ManifestEntry(
+            source=str(copy.source),
+            size=source_stat.st_size,
+            mtime_ns=source_stat.st_mtime_ns,
+            digest=report.digests[copy.source],
+        )
+
+    vanished = vanished_sources(manifest)
+    if vanished:
+        log.warning("[yellow][WARNING][/yellow] %d %s whose source has disappeared, dropped from the manifest (see the log file).", len(vanished), to_plural_if_needed(len(vanished), 'output'))
+        for destination, source in vanished.items():
+            item('manifest', 'VANISHED', f"{destination} (source : {source})")
+            del manifest[destination]
+    save_manifest(output_dir, manifest)
+
+    print('\n')
+    log.info(
+        "[bold green][INFO][/bold green] Transfer complete (%s) : %.1f MB copied, %.1f MB linked.",
+        ', '.join(f'{method}: {count}' for method, count in report.methods.items()) or 'nothing to transfer',
+        report.bytes_copied / 1e6,
+        report.bytes_linked / 1e6,
+    )
+
+
+def convert_artifacts(copies: list[PlannedCopy], digests: dict[Path, str], failed: list[tuple[Path, str]], workers: int) -> None:
+    """Write the artifacts that need a conversion with a thread pool, hashing their source for the manifest."""
+    def convert(copy: PlannedCopy) -> None:
+        try:
+            copy.convert(copy.source, copy.destination)
+            if copy.source not in digests:
+                digests[copy.source] = file_digest(copy.source)
+            item('copy', 'CONVERTED', f"File '{copy.source.name}' was converted to '{copy.destination}'")
+        except Exception as e:
+            failed.append((copy.source, str(e)))
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        list(pool.map(convert, copies))
+
+
+def run_extraction(
+    path: Path,
+    patterns: list[ArtifactPattern],
+    output_folders: tuple[str, ...],
+    output_dir: Path | None,
+    workers: int = 4,
+    allow_links: bool = True,
+    force: bool = False,
+) -> ExtractionPlan:
+    """Verify and copy in one go : build the plan, report it, then execute it."""
+    base_dir = (output_dir if output_dir else Path.cwd()).absolute()
+    with stage("scan"):
+        plan = build_extraction_plan(path, patterns, base_dir)
+    report_plan(plan)
+    with stage("copy"):
+        execute_plan(plan, output_folders, base_dir, workers=workers, allow_links=allow_links, force=force)
+    return plan
@@ -0,0 +1,154 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import gzip
+import os
+import shutil
+import struct
+import time
+import zlib
+
+from myson_tools.utils.read_filter import find_barcode_folders
+
+UNCOMPRESSED_SUFFIXES: tuple[str, ...] = ('.fastq', '.fq')
+COMPRESSED_SUFFIX: str = '.gz'
+#? kept originals leave the barcode folders : MetONTIIME and the read filter would read them next to their .gz
+ORIGINALS_FOLDER: str = 'fastq_uncompressed'
+#? uncompressed bytes per BGZF block, as bgzip writes them : a compressed block must fit in 64 KiB
+BGZF_BLOCK_SIZE: int = 0xff00
+#? empty BGZF block closing every file, readers use it to tell a complete file from a truncated one
+BGZF_EOF: bytes = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+#? blocks compressed ahead of the writer per thread, bounds the memory of a file to a few MiB
+BLOCKS_IN_FLIGHT: int = 8
+COMPARE_CHUNK: int = 1 << 20
+#? read throughput assumed for the Nextflow / Docker bind mounts when estimating the read time saved
+READ_THROUGHPUT_MB_S: float = 200.0
+
+
+@dataclass(slots=True)
+class CompressionStats:
+    """
+    Bytes of the FASTQ files of one barcode compressed in this run, before and after
+    compression, the files already compressed by a previous run and the files that failed
+    (file name -> error), whose originals are left in place.
+    """
+    barcode: str
+    files: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    seconds: float = 0.0
+    already_compressed: int = 0
+    failed: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+
+def is_uncompressed_fastq(path: Path) -> bool:
+    return path.is_file() and path.name.endswith(UNCOMPRESSED_SUFFIXES) and not path.name.startswith('.')
+
+
+def uncompressed_files(folder: Path) -> list[Path]:
+    return sorted(file for file in folder.iterdir() if is_uncompressed_fastq(file))
+
+
+def find_uncompressed_barcodes(fastq_pass: Path) -> list[Path]:
+    """Barcode folders of `fastq_pass`, at any depth, still holding uncompressed FASTQ files."""
+    return [folder for folder in find_barcode_folders(fastq_pass) if uncompressed_files(folder)]
+
+
+def compress_block(data: bytes, level: int) -> bytes:
+    """One BGZF block : a gzip member with the `BC` extra field giving its compressed size."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    if len(deflated) + 26 > 0x10000:
+        #? incompressible data : stored blocks always fit
+        compressor = zlib.compressobj(0, zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+    header = struct.pack('<4BI2BH2BHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2, len(deflated) + 25)
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+def compress_file(source: Path, target: Path, level: int, pool: ThreadPoolExecutor, threads: int) -> None:
+    """
+    Brief
+    -------------
+    Compress `source` to BGZF in `target`. Blocks are independent, so they are deflated by
+    the threads of `pool` (zlib releases the GIL) while this thread reads the next ones and
+    writes the finished ones in order.
+    """
+    in_flight = deque()
+    with open(source, 'rb') as f, open(target, 'wb') as out:
+        while data := f.read(BGZF_BLOCK_SIZE):
+            in_flight.append(pool.submit(compress_block, data, level))
+            if len(in_flight) >= threads * BLOCKS_IN_FLIGHT:
+                out.write(in_flight.popleft().result())
+        while in_flight:
+            out.write(in_flight.popleft().result())
+        out.write(BGZF_EOF)
+
+
+def round_trips(source: Path, target: Path) -> bool:
+    """Whether `target` decompresses to exactly the bytes of `source` (False as well when it is not valid gzip)."""
+    with open(source, 'rb') as original, gzip.open(target, 'rb') as compressed:
+        try:
+            while True:
+                expected = original.read(COMPARE_CHUNK)
+                if compressed.read(len(expected) or 1) != expected:
+                    return False
+                if not expected:
+                    return True
+        except (gzip.BadGzipFile, EOFError, zlib.error):
+            return False
+
+
+def release_original(source: Path, keep_dir: Path | None) -> None:
+    """Remove the original of a verified `.gz`, or move it to `keep_dir`."""
+    if keep_dir is None:
+        source.unlink()
+        return
+    keep_dir.mkdir(parents=True, exist_ok=True)
+    shutil.move(source, keep_dir / source.name)
+
+
+def compress_barcode(folder: Path, level: int, threads: int, keep_dir: Path | None, label: str) -> CompressionStats:
+    """
+    Brief
+    -------------
+    Compress every uncompressed FASTQ file of `folder` next to it (`<name>.gz`). Each file
+    is written to a temporary file and checked to decompress to the original bytes before
+    it takes its final name; only then is the original removed, or moved to `keep_dir`.
+
+    A source whose `.gz` already exists and round-trips (an interrupted run) is not
+    compressed again. A file that fails is recorded in the stats with its original left in
+    place, and the next files are still compressed.
+    """
+    stats = CompressionStats(barcode=label)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for source in uncompressed_files(folder):
+            target = source.with_name(source.name + COMPRESSED_SUFFIX)
+            tmp_file = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+            try:
+                if target.is_file() and round_trips(source, target):
+                    release_original(source, keep_dir)
+                    stats.already_compressed += 1
+                    continue
+                compress_file(source, tmp_file, level, pool, threads)
+                if not round_trips(source, tmp_file):
+                    raise ValueError(f"❌ {tmp_file.name} does not decompress to {source.name}, original kept")
+                os.replace(tmp_file, target)
+                bytes_in = source.stat().st_size
+                release_original(source, keep_dir)
+            except (OSError, ValueError, EOFError, zlib.error) as e:
+                stats.failed[source.name] = str(e)
+                continue
+            finally:
+                tmp_file.unlink(missing_ok=True)
+            stats.files += 1
+            stats.bytes_in += bytes_in
+            stats.bytes_out += target.stat().st_size
+    stats.seconds = time.perf_counter() - start
+    return stats
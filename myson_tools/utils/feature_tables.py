@@ -0,0 +1,149 @@
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+OTU_ID_COLUMN: str = '#OTU ID'
+BIOM_HEADER: str = '# Constructed from biom file'
+WRITE_CHUNK_ROWS: int = 1024
+#? features parsed at a time by `read_sparse_feature_table`, only this many rows are ever dense
+READ_CHUNK_ROWS: int = 1024
+EXTENSION: str = '.tsv'
+FREQ_LEVEL_FOLDER = re.compile(r'^(?P<freq>absfreq|relfreq)_(?P<level>level\d+)$')
+
+
+@dataclass(frozen=True, slots=True)
+class SparseFeatureTable:
+    """Feature table with features as rows and samples as columns, only non-zero counts are stored."""
+    features: list[str]
+    samples: list[str]
+    matrix: sparse.csr_matrix
+
+
+def read_feature_tsv(source) -> pd.DataFrame:
+    """
+    Read a `biom convert --to-tsv` table (features as rows, samples as columns) from a
+    path or a binary buffer. The '# Constructed from biom file' line is skipped when present.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            first_line = f.readline()
+    else:
+        first_line = source.readline()
+        source.seek(0)
+    skip = [0] if first_line.startswith(BIOM_HEADER.encode()) else None
+    return pd.read_csv(source, sep='\t', skiprows=skip, index_col=0)
+
+
+def find_freq_level_folders(path: Path) -> dict[tuple[str, str], list[Path]]:
+    """
+    The `<freq>_<level>` folders produced by get_feature_table and the tables they contain,
+    keyed by (frequency, level).
+    """
+    folders: dict[tuple[str, str], list[Path]] = {}
+    for folder in sorted(path.iterdir()):
+        match = FREQ_LEVEL_FOLDER.match(folder.name)
+        if folder.is_dir() and match:
+            tables = sorted(f for f in folder.iterdir() if f.is_file() and f.suffix == EXTENSION)
+            if tables:
+                folders[(match['freq'], match['level'])] = tables
+    return folders
+
+
+def read_sparse_feature_table(path: Path) -> SparseFeatureTable:
+    """
+    Read a feature TSV `READ_CHUNK_ROWS` features at a time, keeping only the (row, col, value)
+    triplets of the non-zero counts of each chunk : memory grows with the non-zero counts
+    plus one dense chunk, not with features × samples.
+    """
+    with open(path, 'rb') as f:
+        skip = [0] if f.readline().startswith(BIOM_HEADER.encode()) else None
+    samples = [str(s) for s in pd.read_csv(path, sep='\t', skiprows=skip, index_col=0, nrows=0).columns]
+    features: list[str] = []
+    rows, cols, data = [], [], []
+    with pd.read_csv(path, sep='\t', skiprows=skip, index_col=0, chunksize=READ_CHUNK_ROWS) as chunks:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            values = chunk.to_numpy()
+            chunk_rows, chunk_cols = np.nonzero(values)
+            rows.append(chunk_rows + len(features))
+            cols.append(chunk_cols)
+            data.append(values[chunk_rows, chunk_cols])
+            features.extend(str(f) for f in chunk.index)
+    shape = (len(features), len(samples))
+    if not data:
+        return SparseFeatureTable(features=features, samples=samples, matrix=sparse.csr_matrix(shape))
+    matrix = sparse.coo_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=shape).tocsr()
+    return SparseFeatureTable(features=features, samples=samples, matrix=matrix)
+
+
+def merge_sparse_tables(tables: list[SparseFeatureTable], overlap: str = 'error') -> SparseFeatureTable:
+    """
+    Brief
+    -------------
+    Outer-join feature tables on their feature ids, keeping only the non-zero entries.
+
+    Every table is remapped onto shared feature/sample dictionaries and the (row, col, value)
+    triplets are assembled into one sparse matrix, so memory grows with the number of
+    non-zero counts and not with features × samples. Features are sorted in the output.
+
+    Args
+    --------------
+        overlap (str) : 'error' to refuse a sample id present in several tables (like
+            `qiime feature-table merge`), 'sum' to add their counts together
+    """
+    feature_index: dict[str, int] = {}
+    sample_index: dict[str, int] = {}
+    rows, cols, data = [], [], []
+
+    for table in tables:
+        overlapping = [s for s in table.samples if s in sample_index]
+        if overlapping and overlap == 'error':
+            raise ValueError(f"❌ Sample ids present in several tables: {', '.join(overlapping[:10])}. Use the 'sum' overlap method to add them up.")
+        feature_map = np.fromiter(
+            (feature_index.setdefault(f, len(feature_index)) for f in table.features),
+            dtype=np.int64, count=len(table.features),
+        )
+        sample_map = np.fromiter(
+            (sample_index.setdefault(s, len(sample_index)) for s in table.samples),
+            dtype=np.int64, count=len(table.samples),
+        )
+        coo = table.matrix.tocoo()
+        rows.append(feature_map[coo.row])
+        cols.append(sample_map[coo.col])
+        data.append(coo.data)
+
+    shape = (len(feature_index), len(sample_index))
+    if not data:
+        return SparseFeatureTable(features=[], samples=[], matrix=sparse.csr_matrix(shape))
+
+    #? duplicated (row, col) pairs are summed by the COO -> CSR conversion
+    matrix = sparse.coo_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=shape).tocsr()
+    features = list(feature_index)
+    order = np.argsort(features, kind='stable')
+    return SparseFeatureTable(
+        features=[features[i] for i in order],
+        samples=list(sample_index),
+        matrix=matrix[order],
+    )
+
+
+def write_feature_tsv(df: pd.DataFrame, path: Path) -> None:
+    """Write a feature table in the layout of `qiime tools export` + `biom convert --to-tsv`."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(f'{BIOM_HEADER}\n')
+        df.to_csv(f, sep='\t', index_label=OTU_ID_COLUMN)
+
+
+def write_sparse_feature_tsv(table: SparseFeatureTable, path: Path) -> None:
+    """Same layout as `write_feature_tsv`, densifying only `WRITE_CHUNK_ROWS` features at a time."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(f'{BIOM_HEADER}\n')
+        f.write('\t'.join([OTU_ID_COLUMN, *table.samples]) + '\n')
+        for start in range(0, len(table.features), WRITE_CHUNK_ROWS):
+            chunk = table.matrix[start:start + WRITE_CHUNK_ROWS].toarray()
+            pd.DataFrame(chunk, index=table.features[start:start + WRITE_CHUNK_ROWS]).to_csv(f, sep='\t', header=False)
@@ -1,6 +1,6 @@
-from .path_utils import normalize_id_with_text, get_barcode_value
+from .batch_output import item
 from .io_utils import read_data_frame
-from .verifications import REFERENCE
+from .sample_ids import REFERENCE, normalize_ids, parse_sample_ids, reference_tokens
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -14,18 +14,17 @@ def create_patient_folders(base_path: Path, patient_ids: np.ndarray):
 
     all_created = True
 
-    for pid in patient_ids:
-        folder_name = "Patient_" + '_'.join(str(REFERENCE.get(word, word)) for word in pid.split())
+    for folder_name in "Patient_" + reference_tokens(pd.Series(patient_ids), '_'):
         folder_path:Path = base_path / folder_name
         if folder_path.exists():
-            print(f"[WARNING] Folder exists: {folder_name}")
+            item('create', 'WARNING', f"Folder exists: {folder_name}")
             all_created = False
         else:
             try:
                 folder_path.mkdir()
-                print(f"[OK] Created folder: {folder_name}")
+                item('create', 'OK', f"Created folder: {folder_name}")
             except Exception as e:
-                print(f"[ERROR] Failed creating folder {folder_name}: {e}")
+                item('create', 'ERROR', f"Failed creating folder {folder_name}: {e}")
                 all_created = False
 
     if all_created:
@@ -52,7 +51,7 @@ def sort_samples_to_patients(main_dir: Path, excel_path: Path):
         print("[ERROR] Dataframe is Empty, please verify the Excel file's content.")
         return
     all_items = list(main_dir.iterdir())
-    sample_folders = [item for item in all_items if item.is_dir() and item.name.startswith("barcode")]
+    sample_folders = [entry for entry in all_items if entry.is_dir() and entry.name.startswith("barcode")]
 
     moved_count = 0
     failed_count = 0
@@ -62,54 +61,51 @@ def sort_samples_to_patients(main_dir: Path, excel_path: Path):
     df['ID échantillon'] = df['ID échantillon'].astype(str).str.strip()
     df['Patient'] = df['Patient'].astype(str).str.strip()
 
-    df['normalized_id_full'] = df['ID échantillon'].apply(lambda x: normalize_id_with_text(x, REFERENCE, is_patient=False))
-    df['normalized_patient'] = df['Patient'].apply(lambda x: normalize_id_with_text(x, REFERENCE, is_patient=True))
-
-    for sample in sample_folders:
+    df['normalized_id_full'] = normalize_ids(df['ID échantillon']).to_numpy()
+    df['normalized_patient'] = normalize_ids(df['Patient'], is_patient=True).replace(REFERENCE).to_numpy()
+
+    #? every folder × every sheet row of its barcode, matched in one pass instead of filtering the sheet per folder
+    folders = pd.DataFrame({'name': [sample.name for sample in sample_folders]}, dtype=str)
+    folders['barcode'] = parse_sample_ids(sample_folders)['barcode'].to_numpy()
+    candidates = folders.merge(df[['Barcode', 'normalized_id_full', 'normalized_patient']], how='left', left_on='barcode', right_on='Barcode')
+    #? why zfill ? because barcode values are generated in this format : barcodeXX with XX : {01, 02,..,10..}
+    expected = ('barcode' + candidates['barcode'].astype(str).str.zfill(2) + '-' + candidates['normalized_id_full']).str.lower()
+    candidates['matched'] = [isinstance(e, str) and e in n for e, n in zip(expected, candidates['name'].str.lower())]
+    in_sheet = set(candidates.loc[candidates['Barcode'].notna(), 'name'])
+    #? first matching row of the sheet wins, as when the rows were scanned in order
+    destinations = candidates[candidates['matched']].drop_duplicates('name').set_index('name')['normalized_patient']
+
+    for sample, barcode_val in zip(sample_folders, folders['barcode']):
         sample_name = sample.name
-        barcode_val = get_barcode_value(sample_name)
 
         if barcode_val == -1:
-            print(f"[WARNING] Could not extract barcode from: {sample_name}")
+            item('sort', 'WARNING', f"Could not extract barcode from: {sample_name}")
             failed_count += 1
             continue
 
-        match_df = df[df['Barcode'] == barcode_val]
+        if sample_name not in in_sheet:
+            item('sort', 'WARNING', f"No match in DataFrame for barcode: {barcode_val} (from {sample_name})")
+            failed_count += 1
+            continue
 
-        if match_df.empty:
-            print(f"[WARNING] No match in DataFrame for barcode: {barcode_val} (from {sample_name})")
+        if sample_name not in destinations.index:
+            item('sort', 'WARNING', f"Barcode matched but no matching patient ID in folder name for {sample_name}")
             failed_count += 1
             continue
 
-        #? why ? because barcode values are generated in this format : barcodeXX with XX : {01, 02,..,10..}
-        def normalize_barcode_val(x:int) -> (str | int): return f'0{x}' if x < 10 else x
-
-        matched = False
-        for _, row in match_df.iterrows():
-            expected_sample_name = f"barcode{normalize_barcode_val(barcode_val)}-{row['normalized_id_full']}"
-            print(f'sample : {sample_name}')
-            print(f'expected : {expected_sample_name}')
-            if expected_sample_name.lower() in sample_name.lower():
-                pid = row['normalized_patient']
-                patient_id = REFERENCE.get(pid, pid)
-                dest_folder = main_dir / f"Patient_{patient_id}"
-                dest_path = dest_folder / sample_name
-
-                # Make sure destination folder exists
-                dest_folder.mkdir(parents=True, exist_ok=True)
-
-                try:
-                    shutil.move(str(sample), str(dest_path))
-                    print(f"[OK] Moved '{sample_name}' -> 'Patient_{patient_id}/'")
-                    moved_count += 1
-                except Exception as e:
-                    print(f"[ERROR] Failed to move '{sample_name}': {e}")
-                    failed_count += 1
-                matched = True
-                break
-
-        if not matched:
-            print(f"[WARNING] Barcode matched but no matching patient ID in folder name for {sample_name}")
+        patient_id = destinations[sample_name]
+        dest_folder = main_dir / f"Patient_{patient_id}"
+        dest_path = dest_folder / sample_name
+
+        # Make sure destination folder exists
+        dest_folder.mkdir(parents=True, exist_ok=True)
+
+        try:
+            shutil.move(str(sample), str(dest_path))
+            item('sort', 'OK', f"Moved '{sample_name}' -> 'Patient_{patient_id}/'")
+            moved_count += 1
+        except Exception as e:
+            item('sort', 'ERROR', f"Failed to move '{sample_name}': {e}")
             failed_count += 1
 
     total = moved_count + failed_count
@@ -125,13 +121,13 @@ def sort_samples_to_patients(main_dir: Path, excel_path: Path):
 def rename_folder(old_path: Path, new_path: Path):
     try:
         old_path.rename(new_path)
-        print(f"[OK] Renamed '{old_path.name}' to '{new_path.name}'")
+        item('rename', 'OK', f"Renamed '{old_path.name}' to '{new_path.name}'")
     except FileNotFoundError:
-        print(f"[ERROR] Folder '{old_path.name}' does not exist.")
+        item('rename', 'ERROR', f"Folder '{old_path.name}' does not exist.")
     except FileExistsError:
-        print(f"[ERROR] A file or folder with name '{new_path.name}' already exists.")
+        item('rename', 'ERROR', f"A file or folder with name '{new_path.name}' already exists.")
     except Exception as e:
-        print(f"[ERROR] Unexpected error: {e}")
+        item('rename', 'ERROR', f"Unexpected error: {e}")
 
 
 def rename_barcode_folders(main_path: Path, df: pd.DataFrame):
@@ -139,23 +135,22 @@ def rename_barcode_folders(main_path: Path, df: pd.DataFrame):
         print("[ERROR] DataFrame is empty. Please provide valid sample data.")
         return
 
-    for folder in main_path.iterdir():
-        if folder.is_dir() and 'barcode' in folder.name:
-            barcode_value = get_barcode_value(folder.name)
-            temp_df = df[df["Barcode"] == barcode_value]
-
-            if temp_df.empty:
-                print(f"[WARNING] No matching sample for barcode {barcode_value} (folder: {folder.name})")
-                continue
+    folders = [folder for folder in main_path.iterdir() if folder.is_dir() and 'barcode' in folder.name]
+    #? suffix of every barcode from its first row in the sheet, built once for all folders and keyed by barcode number
+    sheet_barcodes = pd.to_numeric(df["Barcode"], errors='coerce')
+    first_rows = df.assign(Barcode=sheet_barcodes)[sheet_barcodes.notna()].drop_duplicates("Barcode")
+    suffixes = pd.Series(reference_tokens(first_rows["ID échantillon"], '-').to_numpy(), index=first_rows["Barcode"].astype(int))
 
-            sample = str(temp_df["ID échantillon"].iloc[0]).strip()
-            sample_parts = sample.split()
-            final_sample = '-'.join(REFERENCE.get(p, p) for p in sample_parts)
+    for folder, barcode_value in zip(folders, parse_sample_ids(folders)['barcode']):
+        if barcode_value not in suffixes.index:
+            item('rename', 'WARNING', f"No matching sample for barcode {barcode_value} (folder: {folder.name})")
+            continue
+        final_sample = suffixes.loc[barcode_value]
 
-            if final_sample in folder.name:
-                print(f"[WARNING] Folder '{folder.name}' is already renamed.")
-            else:
-                new_folder_name = f"{folder.name}-{final_sample}"
-                rename_folder(folder, main_path / new_folder_name)
+        if final_sample in folder.name:
+            item('rename', 'SKIP', f"Folder '{folder.name}' is already renamed.")
+        else:
+            new_folder_name = f"{folder.name}-{final_sample}"
+            rename_folder(folder, main_path / new_folder_name)
 
 
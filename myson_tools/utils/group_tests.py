@@ -0,0 +1,145 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from .batch_output import item
+
+DEFAULT_GROUPINGS: tuple[str, ...] = ('Patient', 'Prélèvement')
+DEFAULT_PERMUTATIONS: int = 9999
+#? permutations drawn by one task, the seed streams depend on it only (not on the worker count)
+PERMUTATIONS_PER_TASK: int = 1000
+MIN_GROUP_SIZE: int = 2
+
+
+@dataclass(frozen=True, slots=True)
+class GroupTestSettings:
+    groupings: tuple[str, ...] = DEFAULT_GROUPINGS
+    permutations: int = DEFAULT_PERMUTATIONS
+    seed: int | None = None
+    workers: int | None = None
+
+
+def _rank_statistics(ranks: np.ndarray, codes: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Statistic of every (labelling × metric) : Kruskal–Wallis H without tie correction
+    (constant under permutation), or |U - n1 n2 / 2| of Mann–Whitney with two groups.
+
+    `ranks` is (samples × metrics), `codes` is (labellings × samples).
+    """
+    n_labellings, n_samples = codes.shape
+    flat = (np.arange(n_labellings)[:, None] * n_groups + codes).ravel()
+    sizes = np.bincount(codes[0], minlength=n_groups)
+    statistics = np.empty((n_labellings, ranks.shape[1]))
+    for m in range(ranks.shape[1]):
+        sums = np.bincount(flat, weights=np.tile(ranks[:, m], n_labellings), minlength=n_labellings * n_groups)
+        sums = sums.reshape(n_labellings, n_groups)
+        if n_groups == 2:
+            u = sums[:, 0] - sizes[0] * (sizes[0] + 1) / 2
+            statistics[:, m] = np.abs(u - sizes[0] * sizes[1] / 2)
+        else:
+            statistics[:, m] = 12.0 / (n_samples * (n_samples + 1)) * (sums ** 2 / sizes).sum(axis=1) - 3 * (n_samples + 1)
+    return statistics
+
+
+def _permutation_block(ranks: np.ndarray, codes: np.ndarray, n_groups: int, observed: np.ndarray,
+                       permutations: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Number of permuted labellings at least as extreme as the observed one, per metric."""
+    rng = np.random.default_rng(seed)
+    shuffled = rng.permuted(np.tile(codes, (permutations, 1)), axis=1)
+    #? relative tolerance : equal statistics computed in another order must count as ties
+    return (_rank_statistics(ranks, shuffled, n_groups) >= observed * (1 - 1e-12)).sum(axis=0)
+
+
+def _task_sizes(permutations: int) -> list[int]:
+    full, rest = divmod(permutations, PERMUTATIONS_PER_TASK)
+    return [PERMUTATIONS_PER_TASK] * full + ([rest] if rest else [])
+
+
+def _prepare(df: pd.DataFrame, grouping: str, metrics: list[str]) -> tuple[np.ndarray, np.ndarray, list[str], np.ndarray] | None:
+    """Samples with every metric and a group label, in groups of at least `MIN_GROUP_SIZE`."""
+    values = df[metrics].apply(pd.to_numeric, errors='coerce')
+    labels = df[grouping].astype(str).where(df[grouping].notna() & (df[grouping].astype(str) != 'N/A'))
+    keep = values.notna().all(axis=1) & labels.notna()
+    labels = labels[keep]
+    counts = labels.value_counts()
+    keep_groups = counts.index[counts >= MIN_GROUP_SIZE]
+    selected = labels.isin(keep_groups)
+    if len(keep_groups) < 2:
+        return None
+    codes, groups = pd.factorize(labels[selected], sort=True)
+    matrix = values[keep][selected].to_numpy(dtype=np.float64)
+    ranks = np.apply_along_axis(stats.rankdata, 0, matrix)
+    return matrix, codes, list(groups), ranks
+
+
+def group_tests(df: pd.DataFrame, metrics: list[str], settings: GroupTestSettings) -> pd.DataFrame:
+    """
+    Brief
+    -------------
+    Compare the metrics of `df` between the groups of every column of `settings.groupings`.
+
+    Each grouping gets a Mann–Whitney U test (two groups) or a Kruskal–Wallis H test (more
+    groups), with scipy's asymptotic p-value and a permutation p-value. Permutations are
+    drawn in blocks, one `SeedSequence(seed)` stream per block, and each block tests every
+    metric at once on the ranks. Blocks of all groupings share one process pool.
+
+    Returns
+    --------------
+    One row per grouping and metric
+    """
+    prepared = {}
+    for grouping in settings.groupings:
+        if grouping not in df.columns:
+            item('group tests', 'WARNING', f"No '{grouping}' column, grouping skipped.")
+            continue
+        data = _prepare(df, grouping, metrics)
+        if data is None:
+            item('group tests', 'WARNING', f"'{grouping}': fewer than 2 groups of {MIN_GROUP_SIZE} samples, grouping skipped.")
+            continue
+        matrix, codes, groups, ranks = data
+        observed = _rank_statistics(ranks, codes[None, :], len(groups))[0]
+        prepared[grouping] = (matrix, codes, groups, ranks, observed)
+
+    sizes = _task_sizes(settings.permutations)
+    seeds = np.random.SeedSequence(settings.seed).spawn(len(sizes) * max(len(prepared), 1))
+    tasks = []
+    for g, (grouping, (_, codes, groups, ranks, observed)) in enumerate(prepared.items()):
+        for b, size in enumerate(sizes):
+            tasks.append((grouping, (ranks, codes, len(groups), observed, size, seeds[g * len(sizes) + b])))
+
+    extreme = {grouping: np.zeros(len(metrics), dtype=np.int64) for grouping in prepared}
+    if settings.workers == 1:
+        for grouping, args in tasks:
+            extreme[grouping] += _permutation_block(*args)
+    else:
+        with ProcessPoolExecutor(max_workers=settings.workers) as pool:
+            futures = [(grouping, pool.submit(_permutation_block, *args)) for grouping, args in tasks]
+            for grouping, future in futures:
+                extreme[grouping] += future.result()
+
+    rows = []
+    for grouping, (matrix, codes, groups, _, _) in prepared.items():
+        for m, metric in enumerate(metrics):
+            samples = [matrix[codes == g, m] for g in range(len(groups))]
+            if len(groups) == 2:
+                test = 'Mann-Whitney U'
+                statistic, p_value = stats.mannwhitneyu(*samples, alternative='two-sided')
+            else:
+                test = 'Kruskal-Wallis H'
+                #? all values equal : the statistic is undefined
+                statistic, p_value = stats.kruskal(*samples) if np.ptp(matrix[:, m]) > 0 else (np.nan, np.nan)
+            rows.append({
+                'grouping': grouping,
+                'metric': metric,
+                'test': test,
+                'n_groups': len(groups),
+                'n_samples': len(codes),
+                'statistic': statistic,
+                'p_value': p_value,
+                'p_permutation': (1 + extreme[grouping][m]) / (1 + settings.permutations),
+                'permutations': settings.permutations,
+            })
+    return pd.DataFrame(rows, columns=['grouping', 'metric', 'test', 'n_groups', 'n_samples', 'statistic', 'p_value', 'p_permutation', 'permutations'])
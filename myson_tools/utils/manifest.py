@@ -0,0 +1,64 @@
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+MANIFEST_FILENAME: str = '.extraction_manifest.json'
+
+
+@dataclass(frozen=True, slots=True)
+class ManifestEntry:
+    source: str
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+def load_manifest(output_dir: Path) -> dict[str, ManifestEntry]:
+    """Entries of the manifest kept in `output_dir`, keyed by destination path relative to it."""
+    manifest_file = output_dir / MANIFEST_FILENAME
+    if not manifest_file.is_file():
+        return {}
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {}
+    return {destination: ManifestEntry(**entry) for destination, entry in raw.items()}
+
+
+def save_manifest(output_dir: Path, entries: dict[str, ManifestEntry]) -> None:
+    manifest_file = output_dir / MANIFEST_FILENAME
+    tmp_file = manifest_file.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({destination: asdict(entry) for destination, entry in sorted(entries.items())}, f, indent=1)
+    os.replace(tmp_file, manifest_file)
+
+
+def destination_key(output_dir: Path, destination: Path) -> str:
+    return destination.relative_to(output_dir).as_posix()
+
+
+def is_tracked(entry: ManifestEntry | None, source: Path, destination: Path) -> bool:
+    """The destination still exists and was copied from `source` : its content can be compared with `entry.digest`."""
+    return entry is not None and entry.source == str(source) and destination.exists()
+
+
+def is_unchanged(entry: ManifestEntry | None, source: Path, source_stat: os.stat_result, destination: Path) -> bool:
+    """
+    Fast path of the change detection : a tracked destination whose source has the same
+    size and modification time as when it was copied is up to date, nothing is read or
+    hashed. A source whose size or mtime differs is hashed and only copied again when its
+    digest differs; a rewrite keeping both size and mtime (e.g. `cp -p`) goes unnoticed,
+    use --force for those.
+    """
+    return (
+        is_tracked(entry, source, destination)
+        and entry.size == source_stat.st_size
+        and entry.mtime_ns == source_stat.st_mtime_ns
+    )
+
+
+def vanished_sources(entries: dict[str, ManifestEntry]) -> dict[str, str]:
+    """Outputs (relative destination -> source) whose source no longer exists."""
+    return {destination: entry.source for destination, entry in entries.items() if not os.path.exists(entry.source)}
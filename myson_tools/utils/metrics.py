@@ -0,0 +1,175 @@
+from contextlib import contextmanager
+from pathlib import Path
+import os
+import threading
+import time
+
+ENV_VAR: str = 'PROMETHEUS_TEXTFILE_DIR'
+PREFIX: str = 'myson_tools_'
+EXTENSION: str = '.prom'
+#? counters of hot loops are written at most this often, lifecycle events always flush
+FLUSH_INTERVAL: float = 5.0
+
+#? name (without prefix) -> (type, help), declared once so every job writes consistent HELP / TYPE lines
+METRICS: dict[str, tuple[str, str]] = {
+    'run_in_progress': ('gauge', 'Whether the command is currently running (1) or finished (0).'),
+    'run_start_timestamp_seconds': ('gauge', 'Unix time at which the command started.'),
+    'run_end_timestamp_seconds': ('gauge', 'Unix time at which the command finished.'),
+    'run_success': ('gauge', 'Whether the last run of the command exited successfully.'),
+    'last_update_timestamp_seconds': ('gauge', 'Unix time of the last metrics update, for stall alerts.'),
+    'folders_processed_total': ('counter', 'Run folders analysed successfully by the launcher.'),
+    'folders_failed_total': ('counter', 'Run folders whose analysis failed.'),
+    'queue_folders': ('gauge', 'Folders still waiting to be analysed by the launcher.'),
+    'nextflow_run_duration_seconds': ('summary', 'Duration of the Nextflow runs of the launcher.'),
+    'disk_space_wait_seconds_total': ('counter', 'Time spent holding launches back for free disk space.'),
+    'extraction_files_total': ('counter', 'Artifacts written by the extractors, by method.'),
+    'extraction_bytes_total': ('counter', 'Bytes written by the extractors, copied or linked.'),
+    'merged_tables_total': ('counter', 'Feature tables merged, by frequency and level.'),
+    'alpha_tables_total': ('counter', 'Feature tables analysed for alpha diversity, by status.'),
+    'alpha_samples_total': ('counter', 'Samples whose alpha diversity was computed or reused from the cache.'),
+    'beta_samples': ('gauge', 'Samples of the last beta diversity matrices.'),
+    'beta_pairs_total': ('counter', 'Sample pairs whose distance was computed, by metric.'),
+    'audit_folders': ('gauge', 'Results folders of the last audit, by status.'),
+    'filter_reads_total': ('counter', 'Reads kept or dropped by the read filter, by outcome.'),
+    'compress_fastq_bytes_total': ('counter', 'FASTQ bytes before and after compression, by state.'),
+    'compress_fastq_files_total': ('counter', 'FASTQ files compressed or failed, by status.'),
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(labels: dict[str, str]) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())) + '}'
+
+
+class TextfileMetrics:
+    """
+    Brief
+    -------------
+    Metrics of one command written for node_exporter's textfile collector.
+
+    Every job owns `<directory>/myson_tools_<job>.prom`, rewritten as a whole through a
+    temporary file and `os.replace`, so the collector never reads a partial file. Values
+    are kept in memory and keyed by metric name and labels; summaries keep a `_sum` and
+    a `_count`. Updates are thread-safe (the extractors update from their copy threads).
+    """
+
+    def __init__(self, job: str, directory: Path):
+        self.job = job
+        self.path = directory / f'{PREFIX}{job}{EXTENSION}'
+        self.values: dict[tuple[str, str], float] = {}
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+        #? pool workers forked from the command inherit the writer, only the command itself writes the file
+        self.pid = os.getpid()
+
+    def _update(self, name: str, suffix: str, labels: dict[str, str], value: float, add: bool) -> None:
+        if name not in METRICS:
+            raise KeyError(f"❌ Unknown metric '{name}', declare it in METRICS first.")
+        key = (name + suffix, _label_text({'job': self.job, **labels}))
+        self.values[key] = self.values.get(key, 0.0) + value if add else value
+        self.values[('last_update_timestamp_seconds', _label_text({'job': self.job}))] = time.time()
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        with self.lock:
+            self._update(name, '', labels, amount, add=True)
+        self.flush(force=False)
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self.lock:
+            self._update(name, '', labels, value, add=False)
+        self.flush(force=False)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        with self.lock:
+            self._update(name, '_sum', labels, value, add=True)
+            self._update(name, '_count', labels, 1, add=True)
+        self.flush(force=False)
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            samples = sorted((key, value) for key, value in self.values.items() if key[0] in (name, f'{name}_sum', f'{name}_count'))
+            if not samples:
+                continue
+            lines.append(f'# HELP {PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+            lines.extend(f'{PREFIX}{sample}{labels} {value:.17g}' for (sample, labels), value in samples)
+        return '\n'.join(lines) + '\n'
+
+    def flush(self, force: bool = True) -> None:
+        if os.getpid() != self.pid:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last_flush < FLUSH_INTERVAL:
+                return
+            self.last_flush = now
+            #? not ending in .prom : the collector ignores it until the rename
+            tmp_file = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+            try:
+                tmp_file.write_text(self.render(), encoding='utf-8')
+                os.replace(tmp_file, self.path)
+            except OSError as e:
+                print(f"[WARNING] Could not write the metrics file {self.path}: {e}")
+
+
+#? one writer per process, None when PROMETHEUS_TEXTFILE_DIR is not set : every helper is then a no-op
+_metrics: TextfileMetrics | None = None
+
+
+def inc(name: str, amount: float = 1.0, **labels) -> None:
+    if _metrics is not None:
+        _metrics.inc(name, amount, **labels)
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    if _metrics is not None:
+        _metrics.set(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if _metrics is not None:
+        _metrics.observe(name, value, **labels)
+
+
+def flush() -> None:
+    if _metrics is not None:
+        _metrics.flush()
+
+
+@contextmanager
+def metrics_run(job: str):
+    """
+    Export the metrics of the wrapped command to PROMETHEUS_TEXTFILE_DIR when it is set :
+    start time and in-progress flag up front, end time and success (exit code 0) at the end.
+    """
+    global _metrics
+    directory = os.getenv(ENV_VAR)
+    if not directory:
+        yield
+        return
+    if not Path(directory).is_dir():
+        print(f"[WARNING] {ENV_VAR} '{directory}' is not a directory, metrics are not exported.")
+        yield
+        return
+
+    _metrics = TextfileMetrics(job, Path(directory))
+    _metrics.set('run_in_progress', 1)
+    _metrics.set('run_start_timestamp_seconds', time.time())
+    _metrics.flush()
+    success = False
+    try:
+        yield
+        success = True
+    except SystemExit as e:
+        success = e.code in (0, None)
+        raise
+    finally:
+        _metrics.set('run_in_progress', 0)
+        _metrics.set('run_end_timestamp_seconds', time.time())
+        _metrics.set('run_success', int(success))
+        _metrics.flush()
+        _metrics = None
@@ -1,10 +1,11 @@
 from pathlib import Path
-import re
 
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 
+from .sample_ids import BARCODE_PATTERN
+
 
 def normalize_id_with_text(val: str, reference: dict, is_patient:bool) -> str:
     val = val.strip().replace('\u00A0', ' ') #removing nbsp to be able to split, it's not always there but it's safer
@@ -21,7 +22,7 @@ def normalize_id_with_text(val: str, reference: dict, is_patient:bool) -> str:
 
 
 def get_barcode_value(name: str) -> int:
-    match = re.search(r'\d+', name)
+    match = BARCODE_PATTERN.search(name)
     return int(match.group()) if match else -1
 
 
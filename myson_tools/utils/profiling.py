@@ -0,0 +1,194 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+import argparse
+import cProfile
+import os
+import pstats
+import resource
+import time
+import tracemalloc
+
+from rich.console import Console
+from rich.table import Table
+
+PROFILE_SUFFIX: str = '.prof'
+TOP_FUNCTIONS: int = 20
+TOP_ALLOCATIONS: int = 10
+TOTAL_STAGE: str = 'total'
+
+
+@dataclass(slots=True)
+class StageTiming:
+    name: str
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_memory_mb: float = 0.0
+    read_bytes: int = 0
+    written_bytes: int = 0
+
+
+def peak_memory_mb() -> float:
+    """Peak resident memory of the process so far (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def io_counters() -> tuple[int, int]:
+    """Bytes read and written by the process so far (rchar / wchar, page cache hits included), (0, 0) where /proc is unavailable."""
+    try:
+        with open('/proc/self/io', 'r', encoding='ascii') as f:
+            fields = dict(line.split(':', 1) for line in f)
+        return int(fields['rchar']), int(fields['wchar'])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def cpu_seconds() -> float:
+    """User and system time of the process and of its waited-for children (Nextflow, finished pool workers)."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class StageProfiler:
+    """
+    Brief
+    -------------
+    Wall time, CPU time, peak memory and I/O bytes of the named stages of a command.
+
+    Stages are accumulated by name, so a stage entered once per folder or per table is
+    reported as one line with its number of calls. When disabled, `stage` costs a
+    single attribute check. Peak memory is the Python heap peak of the stage with
+    `--trace-memory` (tracemalloc), otherwise the resident high-water mark of the process.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages: dict[str, StageTiming] = {}
+        #? traced peak of every open stage, a nested stage resets the tracemalloc peak of its parents
+        self._open_peaks: list[int] = []
+
+    def _fold_traced_peak(self) -> None:
+        peak = tracemalloc.get_traced_memory()[1]
+        self._open_peaks = [max(open_peak, peak) for open_peak in self._open_peaks]
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            self._fold_traced_peak()
+            tracemalloc.reset_peak()
+            self._open_peaks.append(0)
+        read_start, written_start = io_counters()
+        cpu_start = cpu_seconds()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = self.stages.setdefault(name, StageTiming(name=name))
+            timing.calls += 1
+            timing.wall += time.perf_counter() - start
+            timing.cpu += cpu_seconds() - cpu_start
+            read_end, written_end = io_counters()
+            timing.read_bytes += read_end - read_start
+            timing.written_bytes += written_end - written_start
+            if tracing:
+                self._fold_traced_peak()
+                peak = self._open_peaks.pop() / 1024 ** 2
+            else:
+                peak = peak_memory_mb()
+            timing.peak_memory_mb = max(timing.peak_memory_mb, peak)
+
+    def report(self, console: Console) -> None:
+        table = Table(title="Stage timings")
+        for column in ('stage', 'calls', 'wall (s)', 'cpu (s)', 'peak memory (MB)', 'read (MB)', 'written (MB)'):
+            table.add_column(column, justify='left' if column == 'stage' else 'right')
+        for timing in self.stages.values():
+            table.add_row(
+                timing.name,
+                str(timing.calls),
+                f'{timing.wall:.3f}',
+                f'{timing.cpu:.3f}',
+                f'{timing.peak_memory_mb:.1f}',
+                f'{timing.read_bytes / 1024 ** 2:.1f}',
+                f'{timing.written_bytes / 1024 ** 2:.1f}',
+            )
+        console.print(table)
+
+
+#? one profiler per process : commands and the helpers they call share it without passing it around
+_profiler = StageProfiler()
+
+
+def stage(name: str):
+    """Context manager timing `name` when the command runs with --timings, --profile or --trace-memory."""
+    return _profiler.stage(name)
+
+
+def add_profiling_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("profiling")
+    group.add_argument("--timings", action="store_true", help="Print the wall time, CPU time, peak memory and I/O bytes of every stage at the end.")
+    group.add_argument("--profile", type=Path, default=None, metavar="PATH", help=f"Run under cProfile and write the statistics to PATH (a directory gets <command>_<timestamp>{PROFILE_SUFFIX}). Implies --timings.")
+    group.add_argument("--trace-memory", action="store_true", help="Trace Python allocations (tracemalloc) for exact per-stage peaks and the top allocation sites. Implies --timings.")
+
+
+def profile_output_path(path: Path, command: str) -> Path:
+    if path.is_dir() or not path.suffix:
+        path.mkdir(parents=True, exist_ok=True)
+        return path / f"{command}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{PROFILE_SUFFIX}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+@contextmanager
+def profiled_run(args: argparse.Namespace, command: str):
+    """
+    Brief
+    -------------
+    Wrap the body of a command's `main` : enables the stage profiler according to the
+    profiling arguments and prints the report when the command ends, `sys.exit` included.
+
+    With --profile the cProfile statistics are dumped (open them with `python -m pstats`
+    or snakeviz) and the most expensive functions are listed; with --trace-memory the
+    allocation sites holding the most memory at the end are listed.
+    """
+    timings = getattr(args, 'timings', False)
+    profile_path = getattr(args, 'profile', None)
+    trace_memory = getattr(args, 'trace_memory', False)
+    if not (timings or profile_path or trace_memory):
+        yield
+        return
+
+    console = Console(soft_wrap=True)
+    _profiler.enabled = True
+    if trace_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile_path else None
+    try:
+        with _profiler.stage(TOTAL_STAGE):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+    finally:
+        #? the total goes last in the table
+        _profiler.stages[TOTAL_STAGE] = _profiler.stages.pop(TOTAL_STAGE)
+        _profiler.report(console)
+        if profiler is not None:
+            output = profile_output_path(profile_path, command)
+            profiler.dump_stats(output)
+            console.print(f"[OK] cProfile statistics written to {output}")
+            pstats.Stats(profiler, stream=console.file).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+        if trace_memory:
+            console.print(f"Top {TOP_ALLOCATIONS} allocation sites still held:")
+            for statistic in tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]:
+                console.print(f"  {statistic}")
+            tracemalloc.stop()
+        _profiler.enabled = False
@@ -0,0 +1,113 @@
+import io
+import json
+import zipfile
+from pathlib import Path, PurePosixPath
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .feature_tables import OTU_ID_COLUMN, SparseFeatureTable, read_feature_tsv, write_sparse_feature_tsv
+
+
+def _payload_name(archive: zipfile.ZipFile, suffixes: tuple[str, ...]) -> str:
+    """Name of the first file stored under `<uuid>/data/` with one of the given suffixes."""
+    for name in archive.namelist():
+        parts = PurePosixPath(name).parts
+        if len(parts) >= 3 and parts[1] == 'data' and name.endswith(suffixes):
+            return name
+    raise ValueError(f"❌ No {'/'.join(suffixes)} payload found in artifact: {archive.filename}")
+
+
+def _decode_ids(ids) -> list[str]:
+    return [i.decode('utf-8') if isinstance(i, bytes) else str(i) for i in ids]
+
+
+def _read_biom_hdf5(payload: bytes) -> tuple[list[str], list[str], sparse.csr_matrix]:
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("❌ h5py is required to read BIOM 2.x (HDF5) tables. Install it with 'pip install h5py'.")
+
+    with h5py.File(io.BytesIO(payload), 'r') as biom:
+        observations = _decode_ids(biom['observation/ids'][:])
+        samples = _decode_ids(biom['sample/ids'][:])
+        matrix = sparse.csr_matrix(
+            (
+                biom['observation/matrix/data'][:],
+                biom['observation/matrix/indices'][:],
+                biom['observation/matrix/indptr'][:],
+            ),
+            shape=(len(observations), len(samples)),
+        )
+    return observations, samples, matrix
+
+
+def _read_biom_json(payload: bytes) -> tuple[list[str], list[str], sparse.csr_matrix]:
+    biom = json.loads(payload)
+    observations = [row['id'] for row in biom['rows']]
+    samples = [column['id'] for column in biom['columns']]
+    shape = tuple(biom['shape'])
+    if biom.get('matrix_type') == 'dense':
+        return observations, samples, sparse.csr_matrix(np.asarray(biom['data'], dtype=float).reshape(shape))
+    entries = np.asarray(biom['data'], dtype=float).reshape(-1, 3)
+    matrix = sparse.coo_matrix((entries[:, 2], (entries[:, 0].astype(int), entries[:, 1].astype(int))), shape=shape)
+    return observations, samples, matrix.tocsr()
+
+
+def _read_tsv_table(payload: bytes) -> tuple[list[str], list[str], sparse.csr_matrix]:
+    df = read_feature_tsv(io.BytesIO(payload))
+    return list(df.index), list(df.columns), sparse.csr_matrix(df.to_numpy())
+
+
+def read_qza_matrix(path: Path) -> tuple[list[str], list[str], sparse.csr_matrix]:
+    """
+    Brief
+    -------------
+    Read the feature table embedded in a `.qza` without QIIME 2 and without extracting it to disk.
+
+    The artifact is a zip archive holding a `<uuid>/data/` folder whose payload is a
+    BIOM 2.x (HDF5) table, a BIOM 1.0 (JSON) table or a TSV table.
+
+    Returns
+    --------------
+    The feature ids (rows), the sample ids (columns) and the counts as a CSR matrix
+    """
+    with zipfile.ZipFile(path) as archive:
+        name = _payload_name(archive, ('.biom', '.tsv'))
+        payload = archive.read(name)
+
+    if name.endswith('.tsv'):
+        return _read_tsv_table(payload)
+    if payload.startswith(b'\x89HDF'):
+        return _read_biom_hdf5(payload)
+    return _read_biom_json(payload)
+
+
+def read_qza_table(path: Path, as_sparse: bool = False) -> pd.DataFrame:
+    """
+    Feature table of a `.qza`, laid out like the exported TSV : features as the index
+    (named '#OTU ID') and one column per sample. With `as_sparse`, each column is a pandas
+    SparseArray holding only the non-zero counts of the matrix, with 0 as fill value.
+    """
+    observations, samples, matrix = read_qza_matrix(path)
+    if as_sparse:
+        #? built from the CSC column slices : DataFrame.sparse.from_spmatrix uses NaN as the fill value
+        columns = matrix.tocsc()
+        df = pd.DataFrame(
+            {
+                sample: pd.arrays.SparseArray.from_spmatrix(columns[:, idx])
+                for idx, sample in enumerate(samples)
+            },
+            index=observations,
+        )
+    else:
+        df = pd.DataFrame(matrix.toarray(), index=observations, columns=samples)
+    df.index.name = OTU_ID_COLUMN
+    return df
+
+
+def qza_to_tsv(source: Path, destination: Path) -> None:
+    """Export the feature table of a `.qza` as TSV without ever holding it as a dense matrix."""
+    features, samples, matrix = read_qza_matrix(source)
+    write_sparse_feature_tsv(SparseFeatureTable(features=features, samples=samples, matrix=matrix), destination)
@@ -0,0 +1,167 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import warnings
+
+import numpy as np
+from scipy import sparse
+
+from .alpha_diversity import METRICS, alpha_diversity
+
+#? iterations drawn by one task : the seed streams depend on this block size only, so results
+#? are identical whatever the number of workers
+ITERATIONS_PER_TASK: int = 10
+#? draws held at once by a task (iterations × non-zero counts of a block of samples), about 32 MB of int64
+BLOCK_ENTRIES: int = 1 << 22
+DEFAULT_ITERATIONS: int = 100
+DEFAULT_CURVE_STEPS: int = 10
+
+
+@dataclass(frozen=True, slots=True)
+class RarefactionSettings:
+    """`depth` is None when the settings only drive rarefaction curves."""
+    depth: int | None
+    iterations: int = DEFAULT_ITERATIONS
+    seed: int | None = None
+    workers: int | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class RarefiedMetrics:
+    """Mean and standard deviation over the iterations of each metric, NaN for samples shallower than `depth`."""
+    depth: int
+    mean: dict[str, np.ndarray]
+    std: dict[str, np.ndarray]
+
+
+def as_count_matrix(counts: np.ndarray | sparse.spmatrix) -> sparse.csr_matrix:
+    """(samples × taxa) int64 CSR matrix, rarefaction needs absolute counts (absfreq tables)."""
+    matrix = sparse.csr_matrix(counts)
+    matrix.eliminate_zeros()
+    if matrix.nnz and not np.all(np.mod(matrix.data, 1) == 0):
+        raise ValueError("❌ Rarefaction needs absolute counts, use an absfreq table.")
+    return sparse.csr_matrix(matrix, dtype=np.int64)
+
+
+def subsample(counts: sparse.csr_matrix, depth: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Brief
+    -------------
+    `iterations` random subsamples without replacement of `depth` reads for every sample of
+    a CSR matrix whose samples all hold at least `depth` reads, as an (iterations × nnz)
+    array of drawn counts aligned with `counts.data`.
+
+    The multivariate hypergeometric draw of a sample is made of one hypergeometric draw per
+    non-zero count, conditioned on the reads left to draw. Step k draws the k-th non-zero
+    count of every sample and every iteration at once, so the Python loop runs over the
+    longest row and the zero counts are never touched.
+    """
+    lengths = np.diff(counts.indptr)
+    totals = np.asarray(counts.sum(axis=1)).ravel()
+    reads_left = np.tile(totals, (iterations, 1))
+    depth_left = np.full((iterations, counts.shape[0]), depth, dtype=np.int64)
+    draws = np.empty((iterations, counts.nnz), dtype=np.int64)
+    for k in range(int(lengths.max(initial=0))):
+        rows = np.flatnonzero(lengths > k)
+        positions = counts.indptr[rows] + k
+        good = np.broadcast_to(counts.data[positions], (iterations, len(rows)))
+        drawn = rng.hypergeometric(good, reads_left[:, rows] - good, depth_left[:, rows])
+        draws[:, positions] = drawn
+        reads_left[:, rows] -= good
+        depth_left[:, rows] -= drawn
+    return draws
+
+
+def _row_blocks(indptr: np.ndarray, iterations: int) -> list[tuple[int, int]]:
+    """Consecutive row ranges whose draws over `iterations` fit in BLOCK_ENTRIES (at least one row each)."""
+    blocks, start = [], 0
+    per_block = max(BLOCK_ENTRIES // max(iterations, 1), 1)
+    while start < len(indptr) - 1:
+        stop = int(np.searchsorted(indptr, indptr[start] + per_block, side='right')) - 1
+        stop = max(stop, start + 1)
+        blocks.append((start, stop))
+        start = stop
+    return blocks
+
+
+def _iteration_metrics(counts: sparse.csr_matrix, depth: int, iterations: int, seed: np.random.SeedSequence) -> dict[str, np.ndarray]:
+    """
+    Metrics of `iterations` subsamples, as (iterations × samples) arrays, NaN for samples
+    shallower than `depth`. Samples are drawn block by block and each block is reduced to
+    its metrics before the next one is drawn.
+    """
+    rng = np.random.default_rng(seed)
+    totals = np.asarray(counts.sum(axis=1)).ravel()
+    metrics = {name: np.full((iterations, counts.shape[0]), np.nan) for name in METRICS}
+    for start, stop in _row_blocks(counts.indptr, iterations):
+        deep = start + np.flatnonzero(totals[start:stop] >= depth)
+        if not len(deep):
+            continue
+        block = counts[deep]
+        draws = subsample(block, depth, iterations, rng)
+        #? the iterations of the block stacked as the rows of one sparse matrix : one kernel call
+        indptr = np.concatenate(([0], (block.indptr[1:] + block.nnz * np.arange(iterations)[:, None]).ravel()))
+        stacked = sparse.csr_matrix((draws.ravel(), np.tile(block.indices, iterations), indptr), shape=(iterations * len(deep), block.shape[1]))
+        for name, values in alpha_diversity(stacked).items():
+            metrics[name][:, deep] = values.reshape(iterations, len(deep))
+    return metrics
+
+
+def _task_sizes(iterations: int) -> list[int]:
+    full, rest = divmod(iterations, ITERATIONS_PER_TASK)
+    return [ITERATIONS_PER_TASK] * full + ([rest] if rest else [])
+
+
+def rarefied_alpha(counts: np.ndarray | sparse.spmatrix, settings: RarefactionSettings, pool: ProcessPoolExecutor | None = None) -> RarefiedMetrics:
+    """
+    Brief
+    -------------
+    Alpha diversity of a (samples × taxa) count matrix rarefied to `settings.depth`,
+    averaged over `settings.iterations` random subsamples.
+
+    Iterations are split in blocks, each with its own stream spawned from
+    `SeedSequence(settings.seed)`, and run in `pool` (or in a new pool of
+    `settings.workers` processes, or inline when `workers` is 1).
+
+    Returns
+    --------------
+    A `RarefiedMetrics` with the mean and standard deviation of each of `METRICS` per sample
+    """
+    matrix = as_count_matrix(counts)
+    sizes = _task_sizes(settings.iterations)
+    seeds = np.random.SeedSequence(settings.seed).spawn(len(sizes))
+    args = ([matrix] * len(sizes), [settings.depth] * len(sizes), sizes, seeds)
+
+    if pool is not None:
+        blocks = list(pool.map(_iteration_metrics, *args))
+    elif settings.workers == 1:
+        blocks = list(map(_iteration_metrics, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=settings.workers) as own_pool:
+            blocks = list(own_pool.map(_iteration_metrics, *args))
+
+    mean, std = {}, {}
+    for name in METRICS:
+        values = np.concatenate([block[name] for block in blocks])
+        #? all-NaN columns (shallow samples) warn on nanmean / nanstd
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean[name] = np.nanmean(values, axis=0)
+            std[name] = np.nanstd(values, axis=0)
+    return RarefiedMetrics(depth=settings.depth, mean=mean, std=std)
+
+
+def depth_grid(counts: np.ndarray | sparse.spmatrix, steps: int = DEFAULT_CURVE_STEPS) -> list[int]:
+    """`steps` evenly spaced depths, from the deepest sample / steps up to the deepest sample."""
+    totals = np.asarray(counts.sum(axis=1)).ravel()
+    deepest = int(totals.max()) if totals.size else 0
+    return sorted({int(d) for d in np.linspace(deepest / steps, deepest, steps) if d >= 1})
+
+
+def rarefaction_curves(counts: np.ndarray | sparse.spmatrix, depths: list[int], settings: RarefactionSettings) -> list[RarefiedMetrics]:
+    """Rarefied metrics at every depth of `depths`, sharing one process pool; `settings.depth` is ignored."""
+    matrix = as_count_matrix(counts)
+    runs = [RarefactionSettings(depth, settings.iterations, settings.seed, settings.workers) for depth in depths]
+    if settings.workers == 1:
+        return [rarefied_alpha(matrix, run) for run in runs]
+    with ProcessPoolExecutor(max_workers=settings.workers) as pool:
+        return [rarefied_alpha(matrix, run, pool) for run in runs]
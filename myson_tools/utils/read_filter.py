@@ -0,0 +1,253 @@
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Iterator
+import csv
+import gzip
+import os
+import random
+
+import numpy as np
+
+FASTQ_SUFFIXES: tuple[str, ...] = ('.fastq', '.fq', '.fastq.gz', '.fq.gz')
+STAGING_FOLDER: str = 'fastq_staged'
+STATS_FILENAME: str = 'read_filter_stats.tsv'
+FILTERED_SUFFIX: str = '_filtered.fastq.gz'
+#? the staged files are only read by MetONTIIME and can be rebuilt from fastq_pass : fast compression beats small files
+COMPRESSLEVEL: int = 1
+#? records are written to gzip in blocks of this many bytes rather than one call per read
+WRITE_BLOCK: int = 1 << 20
+PHRED_OFFSET: int = 33
+#? error probability of every quality byte, the mean Q of a read is the Q of its mean error probability
+#? (as Dorado / NanoFilt report it), not the mean of its Q values
+ERROR_PROBABILITY: np.ndarray = 10.0 ** (-np.clip(np.arange(256) - PHRED_OFFSET, 0, None) / 10.0)
+
+
+@dataclass(frozen=True, slots=True)
+class FilterSettings:
+    """
+    Length window in bases (`max_length` None : no upper bound), minimum mean read quality
+    (Phred) and cap on the reads kept per barcode (`max_reads` None : no cap), drawn with `seed`.
+    """
+    min_length: int = 0
+    max_length: int | None = None
+    min_quality: float = 0.0
+    max_reads: int | None = None
+    seed: int = 0
+
+    def describe(self) -> str:
+        description = f"length {self.min_length}-{self.max_length if self.max_length is not None else 'inf'}, mean Q >= {self.min_quality:g}"
+        if self.max_reads is not None:
+            description += f", at most {self.max_reads} reads (seed {self.seed})"
+        return description
+
+
+@dataclass(slots=True)
+class FilterStats:
+    """Reads and bases of one barcode before and after filtering, one row of the stats file."""
+    barcode: str
+    settings: str = ''
+    files: int = 0
+    reads_in: int = 0
+    bases_in: int = 0
+    reads_kept: int = 0
+    bases_kept: int = 0
+    too_short: int = 0
+    too_long: int = 0
+    low_quality: int = 0
+    downsampled: int = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.reads_in - self.reads_kept
+
+
+def is_fastq(path: Path) -> bool:
+    return path.is_file() and path.name.endswith(FASTQ_SUFFIXES) and not path.name.startswith('.')
+
+
+def fastq_files(folder: Path) -> list[Path]:
+    """FASTQ chunks of `folder`; a `.fastq` next to its own `.fastq.gz` (interrupted compression) is read once, from the `.gz`."""
+    files = sorted(file for file in folder.iterdir() if is_fastq(file))
+    names = {file.name for file in files}
+    return [file for file in files if f'{file.name}.gz' not in names]
+
+
+def find_barcode_folders(fastq_pass: Path) -> list[Path]:
+    """Barcode folders holding FASTQ chunks, at any depth (`barcodeNN/` or `Patient_X/barcodeNN-…/`)."""
+    return sorted(
+        folder for folder in [fastq_pass, *fastq_pass.rglob('*')]
+        if folder.is_dir() and 'barcode' in folder.name.lower() and any(is_fastq(file) for file in folder.iterdir())
+    )
+
+
+def staged_file(folder: Path, fastq_pass: Path, staging_dir: Path) -> Path:
+    """Staging layout : the tree of `fastq_pass` mirrored under `staging_dir`, one FASTQ per barcode folder."""
+    return staging_dir / folder.relative_to(fastq_pass) / f'{folder.name}{FILTERED_SUFFIX}'
+
+
+def read_fastq(path: Path) -> Iterator[tuple[bytes, bytes, bytes, bytes]]:
+    """Stream the (header, sequence, separator, quality) lines of a FASTQ file, gzip or plain, newlines included."""
+    opener = gzip.open if path.name.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        for header in f:
+            sequence = next(f, b'')
+            separator = next(f, b'')
+            quality = next(f, b'')
+            if not quality:
+                raise ValueError(f"❌ Truncated FASTQ record at the end of {path}")
+            yield header, sequence, separator, quality
+
+
+def mean_error_probability(quality: bytes) -> float:
+    return float(ERROR_PROBABILITY[np.frombuffer(quality, dtype=np.uint8)].mean()) if quality else 1.0
+
+
+class Reservoir:
+    """
+    Uniform sample of at most `size` records out of a stream of unknown length (reservoir
+    sampling, Vitter's algorithm R), drawn from a generator seeded by the seed and the barcode
+    so that a barcode gets the same reads whatever the order or the process it is filtered in.
+    """
+    __slots__ = ('size', 'seen', 'records', 'random')
+
+    def __init__(self, size: int, seed: int, label: str) -> None:
+        self.size = size
+        self.seen = 0
+        #? (position in the stream, length, record) : the sample is written back in stream order
+        self.records: list[tuple[int, int, bytes]] = []
+        self.random = random.Random(f'{seed}:{label}')
+
+    def add(self, length: int, record: bytes) -> None:
+        if self.seen < self.size:
+            self.records.append((self.seen, length, record))
+        else:
+            slot = self.random.randrange(self.seen + 1)
+            if slot < self.size:
+                self.records[slot] = (self.seen, length, record)
+        self.seen += 1
+
+    def sample(self) -> list[tuple[int, int, bytes]]:
+        return sorted(self.records)
+
+
+def filter_barcode(folder: Path, output_file: Path, settings: FilterSettings, label: str) -> FilterStats:
+    """
+    Brief
+    -------------
+    Stream every FASTQ chunk of `folder` once and write the reads passing `settings` to
+    `output_file` (gzip), through a temporary file renamed at the end so that an
+    interrupted run never leaves a partial file behind. When every read is dropped, no file
+    is written and the barcode folder is removed from the staging tree : the launcher starts
+    MetONTIIME on every barcode folder it finds and cannot analyse an empty sample.
+
+    With `settings.max_reads`, the reads passing the filters go through a reservoir instead
+    and only the sample is written, still in one pass over the chunks; at most `max_reads`
+    records are held in memory.
+    """
+    stats = FilterStats(barcode=label, settings=settings.describe())
+    max_length = settings.max_length if settings.max_length is not None else float('inf')
+    max_error = 10.0 ** (-settings.min_quality / 10.0)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = output_file.with_name(f'.{output_file.name}.{os.getpid()}.tmp')
+    reservoir = Reservoir(settings.max_reads, settings.seed, label) if settings.max_reads is not None else None
+
+    try:
+        with gzip.open(tmp_file, 'wb', compresslevel=COMPRESSLEVEL) as out:
+            block: list[bytes] = []
+            block_size = 0
+            for file in fastq_files(folder):
+                stats.files += 1
+                for header, sequence, separator, quality in read_fastq(file):
+                    length = len(sequence.rstrip(b'\r\n'))
+                    stats.reads_in += 1
+                    stats.bases_in += length
+                    if length < settings.min_length:
+                        stats.too_short += 1
+                        continue
+                    if length > max_length:
+                        stats.too_long += 1
+                        continue
+                    if settings.min_quality > 0 and mean_error_probability(quality.rstrip(b'\r\n')) > max_error:
+                        stats.low_quality += 1
+                        continue
+                    if reservoir is not None:
+                        reservoir.add(length, b''.join((header, sequence, separator, quality)))
+                        continue
+                    stats.reads_kept += 1
+                    stats.bases_kept += length
+                    block.extend((header, sequence, separator, quality))
+                    block_size += len(sequence) + len(quality)
+                    if block_size >= WRITE_BLOCK:
+                        out.write(b''.join(block))
+                        block.clear()
+                        block_size = 0
+            if reservoir is not None:
+                sample = reservoir.sample()
+                stats.reads_kept = len(sample)
+                stats.bases_kept = sum(length for _, length, _ in sample)
+                stats.downsampled = reservoir.seen - stats.reads_kept
+                block = [record for _, _, record in sample]
+            out.write(b''.join(block))
+        if stats.reads_kept:
+            os.replace(tmp_file, output_file)
+        else:
+            output_file.unlink(missing_ok=True)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+    if not stats.reads_kept:
+        #? only this barcode's own folder : its parents may be shared with barcodes filtered by other processes
+        try:
+            output_file.parent.rmdir()
+        except OSError:
+            pass
+    return stats
+
+
+def remove_empty_folders(folder: Path, staging_dir: Path) -> None:
+    """Remove `folder` and its parents, up to `staging_dir` excluded, as long as they are empty."""
+    while folder != staging_dir and folder.is_relative_to(staging_dir):
+        try:
+            folder.rmdir()
+        except OSError:
+            return
+        folder = folder.parent
+
+
+def is_up_to_date(output_file: Path, folder: Path, previous: FilterStats | None, settings: FilterSettings, stats_file: Path) -> bool:
+    """
+    The barcode was filtered with the same settings from the same chunks, all older than its
+    staged file. A barcode that lost every read has no staged file : its chunks are compared
+    with the stats file written at the end of the run that filtered it.
+    """
+    if previous is None or previous.settings != settings.describe():
+        return False
+    reference = output_file if previous.reads_kept else stats_file
+    if not reference.is_file():
+        return False
+    files = fastq_files(folder)
+    staged_mtime = reference.stat().st_mtime_ns
+    return previous.files == len(files) and all(file.stat().st_mtime_ns <= staged_mtime for file in files)
+
+
+def load_stats(staging_dir: Path) -> dict[str, FilterStats]:
+    stats_file = staging_dir / STATS_FILENAME
+    if not stats_file.is_file():
+        return {}
+    types = {field.name: field.type for field in fields(FilterStats)}
+    with open(stats_file, 'r', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f, delimiter='\t'))
+    return {
+        row['barcode']: FilterStats(**{key: (value if types[key] is str else int(value)) for key, value in row.items() if key in types})
+        for row in rows
+    }
+
+
+def save_stats(staging_dir: Path, stats: dict[str, FilterStats]) -> Path:
+    stats_file = staging_dir / STATS_FILENAME
+    #? a staging tree whose only barcode lost every read has been removed with it
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    with open(stats_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=[field.name for field in fields(FilterStats)], delimiter='\t')
+        writer.writeheader()
+        writer.writerows(asdict(row) for _, row in sorted(stats.items()))
+    return stats_file
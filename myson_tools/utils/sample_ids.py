@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from pathlib import Path
+import re
+
+import pandas as pd
+
+#? control samples are written 'T+' / 'T-' in the sheets but cannot be used as is in folder and file names
+REFERENCE: dict[str, str] = {'T+': 'Tpos', 'T-': 'Tneg'}
+NBSP: str = '\u00A0'
+
+BARCODE_PATTERN: re.Pattern = re.compile(r'\d+')
+RUN_PATTERN: re.Pattern = re.compile(r'\d{6}_ICMc')
+PATIENT_PATTERN: re.Pattern = re.compile(r'Patient_([^/\\]+)')
+#? one pattern per reference, matching it as a whole whitespace-separated token
+REFERENCE_TOKEN_PATTERNS: dict[str, re.Pattern] = {
+    key: re.compile(rf'(?<!\S){re.escape(key)}(?!\S)') for key in REFERENCE
+}
+
+
+@dataclass(frozen=True, slots=True)
+class SampleID:
+    """
+    Canonical identity of a sample folder : the run it belongs to (`<YYMMDD>_ICMc…`),
+    its barcode number, its patient folder and its sample code (the part of the folder
+    name after `barcodeNN-` without separators, as matched against the compacted
+    'ID échantillon' of the metadata).
+    """
+    run: str | None
+    barcode: int
+    patient: str | None
+    sample_code: str
+
+    @property
+    def barcode_folder(self) -> str:
+        return f'barcode{self.barcode:02d}'
+
+    @classmethod
+    def from_path(cls, path: Path | str) -> 'SampleID':
+        text = str(path)
+        name = Path(text).name
+        run = RUN_PATTERN.search(text)
+        #? the innermost patient folder, the path above it may hold other 'Patient_' names
+        patients = PATIENT_PATTERN.findall(text)
+        barcode = BARCODE_PATTERN.search(name)
+        return cls(
+            run=run.group(0) if run else None,
+            barcode=int(barcode.group()) if barcode else -1,
+            patient=patients[-1] if patients else None,
+            sample_code=name.partition('-')[2].replace('-', '').strip().replace(NBSP, ''),
+        )
+
+
+def barcode_values(names: pd.Series | pd.Index) -> pd.Series:
+    """Barcode number of every folder name (its first run of digits), -1 where there is none."""
+    digits = pd.Series(names, dtype=str).str.extract(f'({BARCODE_PATTERN.pattern})', expand=False)
+    return pd.to_numeric(digits, errors='coerce').fillna(-1).astype(int)
+
+
+def normalize_ids(ids: pd.Series, is_patient: bool = False) -> pd.Series:
+    """
+    Brief
+    -------------
+    Column version of `normalize_id_with_text` with the REFERENCE mapping : the first word
+    of every id is replaced by its reference tag when it starts with 'T+' / 'T-', and the
+    rest of the id is appended with '-' (sample ids) or '_' (patient ids).
+    """
+    ids = pd.Series(ids, dtype=str).str.strip().str.replace(NBSP, ' ', regex=False)
+    if ids.empty:
+        return ids
+    parts = ids.str.split(' ', n=1, expand=True)
+    base = parts[0]
+    tail = parts[1].fillna('') if 1 in parts.columns else pd.Series('', index=ids.index)
+    mapped = pd.Series(False, index=ids.index)
+    for key, tag in REFERENCE.items():
+        starts = base.str.startswith(key) & ~mapped
+        base = base.mask(starts, tag)
+        mapped |= starts
+    separator = '_' if is_patient else '-'
+    return base.where(tail == '', base + separator + tail)
+
+
+def reference_tokens(ids: pd.Series, separator: str) -> pd.Series:
+    """Words of every id joined by `separator`, 'T+' / 'T-' words replaced by their reference tag (folder names)."""
+    ids = pd.Series(ids, dtype=str).str.strip()
+    for key, pattern in REFERENCE_TOKEN_PATTERNS.items():
+        ids = ids.str.replace(pattern, REFERENCE[key], regex=True)
+    return ids.str.replace(r'\s+', separator, regex=True)
+
+
+def sample_codes(names: pd.Series | pd.Index) -> pd.Series:
+    """Sample code of every `barcodeNN-<code>` name : everything after the first '-', without '-' and non-breaking spaces."""
+    names = pd.Series(names, dtype=str)
+    return names.str.partition('-')[2].str.replace('-', '', regex=False).str.strip().str.replace(NBSP, '', regex=False)
+
+
+def compact_ids(ids: pd.Series) -> pd.Series:
+    """'ID échantillon' values as they appear in sample codes : without spaces (breaking or not)."""
+    return pd.Series(ids, dtype=str).str.replace(NBSP, '', regex=False).str.replace(' ', '', regex=False).str.strip()
+
+
+def parse_sample_ids(paths: list[Path | str]) -> pd.DataFrame:
+    """One row per sample folder path with the `SampleID` fields as columns (run, barcode, patient, sample_code)."""
+    names = pd.Series([Path(path).name for path in paths], dtype=str)
+    paths = pd.Series([str(path) for path in paths], dtype=str)
+    return pd.DataFrame({
+        'run': paths.str.extract(f'({RUN_PATTERN.pattern})', expand=False),
+        'barcode': barcode_values(names),
+        'patient': paths.str.findall(PATIENT_PATTERN.pattern).str[-1],
+        'sample_code': sample_codes(names),
+    })
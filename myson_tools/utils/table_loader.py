@@ -0,0 +1,166 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .abundance_store import STORE_EXTENSION, compact_dtype, read_abundance_store
+from .feature_tables import BIOM_HEADER, read_sparse_feature_table
+from .profiling import peak_memory_mb
+from .qza_reader import read_qza_matrix
+
+#? rows checked at once when looking for a non-integer value
+CHECK_ROWS: int = 256
+TABLE_EXTENSIONS: tuple[str, ...] = ('.tsv', '.qza', STORE_EXTENSION)
+
+
+@dataclass(frozen=True, slots=True)
+class LoadedTable:
+    """
+    Feature table laid out sample-major : `counts[i]` holds the counts of `samples[i]` over
+    `features`, dense from `load_feature_matrix`, CSR from `load_sparse_feature_matrix`.
+    """
+    samples: list[str]
+    features: list[str]
+    counts: np.ndarray | sparse.csr_matrix
+    engine: str
+    peak_memory_mb: float
+
+
+def _csv_engine() -> str:
+    """pyarrow parses several times faster than the C engine when it is installed."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return 'c'
+    return 'pyarrow'
+
+
+def _read_header(path: Path) -> tuple[int, list[str]]:
+    """Number of lines before the column names, and the column names of a biom TSV."""
+    with open(path, 'r', encoding='utf-8') as f:
+        first_line = f.readline()
+        skip = 1 if first_line.startswith(BIOM_HEADER) else 0
+        header = f.readline() if skip else first_line
+    return skip, header.rstrip('\n').split('\t')
+
+
+def _select(available: list[str], wanted: list[str] | None, kind: str) -> list[int]:
+    """Positions of `wanted` in `available`, all positions when nothing is selected."""
+    if wanted is None:
+        return list(range(len(available)))
+    positions = {name: idx for idx, name in enumerate(available)}
+    missing = [name for name in wanted if name not in positions]
+    if missing:
+        raise ValueError(f"❌ {len(missing)} selected {kind} not found in the table: {', '.join(missing[:5])}")
+    return [positions[name] for name in wanted]
+
+
+def _whole_numbers(counts: np.ndarray) -> bool:
+    """True when every value is a whole number, checked `CHECK_ROWS` rows at a time to bound the temporaries."""
+    return all(compact_dtype(counts[start:start + CHECK_ROWS]) == np.int32 for start in range(0, counts.shape[0], CHECK_ROWS))
+
+
+def _load_tsv(path: Path, samples: list[str] | None, taxa: list[str] | None) -> tuple[list[str], list[str], np.ndarray, str]:
+    skip, columns = _read_header(path)
+    sample_columns = [columns[1:][idx] for idx in _select(columns[1:], samples, 'samples')]
+    engine = _csv_engine()
+    #? only the selected columns are parsed, straight to float32 (biom writes counts as '12.0')
+    df = pd.read_csv(
+        path,
+        sep='\t',
+        skiprows=skip,
+        usecols=[columns[0]] + sample_columns,
+        index_col=0,
+        dtype={columns[0]: str, **{sample: np.float32 for sample in sample_columns}},
+        engine=engine,
+    )
+    #? usecols parses the columns in file order, the samples come back in the order they were asked for
+    if list(df.columns) != sample_columns:
+        df = df[sample_columns]
+    features = df.index.tolist()
+    #? pandas stores the single float32 block as (columns × rows), i.e. already sample-major :
+    #? the transpose of the taxa-major view is that block itself, not a copy
+    counts = df.to_numpy(copy=False).T
+    del df
+    if taxa is not None:
+        counts = counts[:, _select(features, taxa, 'taxa')]
+        features = list(taxa)
+    counts = np.ascontiguousarray(counts)
+    if _whole_numbers(counts):
+        counts = counts.astype(np.int32)
+    return sample_columns, features, counts, engine
+
+
+def _select_sparse(features: list[str], samples: list[str], matrix: sparse.spmatrix, wanted_samples: list[str] | None,
+                   wanted_taxa: list[str] | None) -> tuple[list[str], list[str], sparse.csr_matrix]:
+    """The selected part of a (features × samples) matrix as a (samples × taxa) CSR matrix in the compact dtype."""
+    sample_idx = _select(samples, wanted_samples, 'samples')
+    feature_idx = _select(features, wanted_taxa, 'taxa')
+    matrix = sparse.csc_matrix(matrix)[:, sample_idx][feature_idx, :]
+    counts = sparse.csr_matrix(matrix.T, dtype=compact_dtype(matrix.data))
+    return [samples[i] for i in sample_idx], [features[i] for i in feature_idx], counts
+
+
+def _load_sparse(features: list[str], samples: list[str], matrix: sparse.spmatrix,
+                 wanted_samples: list[str] | None, wanted_taxa: list[str] | None) -> tuple[list[str], list[str], np.ndarray]:
+    """Densify a (features × samples) matrix as (samples × taxa), in the compact dtype, after the selection."""
+    selected, features, counts = _select_sparse(features, samples, matrix, wanted_samples, wanted_taxa)
+    return selected, features, counts.toarray()
+
+
+def load_feature_matrix(path: Path, samples: list[str] | None = None, taxa: list[str] | None = None) -> LoadedTable:
+    """
+    Brief
+    -------------
+    Load a feature table (`.tsv`, `.qza` or `.npz` store) as a compact sample-major matrix.
+
+    TSV tables are parsed with pyarrow when available (else pandas' C engine) directly
+    as float32, then stored as int32 when every value is a whole number. Only the
+    `samples` columns are parsed and only the `taxa` rows are kept when given.
+
+    Returns
+    --------------
+    A `LoadedTable`, with the peak memory of the process after loading
+    """
+    suffix = path.suffix.lower()
+    if suffix == '.qza':
+        features, all_samples, matrix = read_qza_matrix(path)
+        selected, features, counts = _load_sparse(features, all_samples, matrix, samples, taxa)
+        engine = 'qza'
+    elif suffix == STORE_EXTENSION:
+        table = read_abundance_store(path)
+        selected, features, counts = _load_sparse(table.features, table.samples, table.matrix, samples, taxa)
+        engine = 'npz'
+    else:
+        selected, features, counts, engine = _load_tsv(path, samples, taxa)
+    return LoadedTable(samples=selected, features=features, counts=counts, engine=engine, peak_memory_mb=peak_memory_mb())
+
+
+def load_sparse_feature_matrix(path: Path, samples: list[str] | None = None, taxa: list[str] | None = None) -> LoadedTable:
+    """
+    Same as `load_feature_matrix` but the counts stay a sparse (samples × taxa) CSR matrix :
+    TSV tables are parsed chunk by chunk into their non-zero counts, `.qza` artifacts and
+    `.npz` stores are never densified.
+    """
+    suffix = path.suffix.lower()
+    if suffix == '.qza':
+        features, all_samples, matrix = read_qza_matrix(path)
+        engine = 'qza'
+    elif suffix == STORE_EXTENSION:
+        table = read_abundance_store(path)
+        features, all_samples, matrix = table.features, table.samples, table.matrix
+        engine = 'npz'
+    else:
+        table = read_sparse_feature_table(path)
+        features, all_samples, matrix = table.features, table.samples, table.matrix
+        engine = 'sparse'
+    selected, features, counts = _select_sparse(features, all_samples, matrix, samples, taxa)
+    return LoadedTable(samples=selected, features=features, counts=counts, engine=engine, peak_memory_mb=peak_memory_mb())
+
+
+def read_id_list(path: Path) -> list[str]:
+    """One id per line, blank lines ignored (sample or taxa selection files)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .feature_tables import SparseFeatureTable
+
+LINEAGE_SEPARATOR: str = ';'
+#? QIIME 2 pads lineages shorter than the requested level with empty ranks
+MISSING_RANK: str = '__'
+MAX_LEVEL: int = 7
+
+
+class LineageIndex:
+    """
+    Brief
+    -------------
+    Integer encoding of the lineages of a level-7 table, computed once for every rank.
+
+    `codes[:, level - 1]` gives, for each feature, the id of its lineage truncated to
+    `level` ranks, and `labels[level - 1]` the truncated lineage of each id. Collapsing
+    to a level is then a group-by on these codes, done as one sparse product.
+    """
+
+    def __init__(self, features: list[str], max_level: int = MAX_LEVEL):
+        ranks = pd.Series(features, dtype=object).str.split(LINEAGE_SEPARATOR, expand=True, n=max_level - 1)
+        ranks = ranks.reindex(columns=range(max_level)).fillna(MISSING_RANK)
+        ranks = ranks.apply(lambda column: column.str.strip())
+
+        self.codes = np.empty((len(features), max_level), dtype=np.int64)
+        self.labels: list[pd.Index] = []
+        prefixes = pd.Series([''] * len(features), dtype=object)
+        for rank in range(max_level):
+            prefixes = ranks[rank] if rank == 0 else prefixes + LINEAGE_SEPARATOR + ranks[rank]
+            codes, labels = pd.factorize(prefixes, sort=True)
+            self.codes[:, rank] = codes
+            self.labels.append(labels)
+
+    def indicator(self, level: int) -> sparse.csr_matrix:
+        """(lineages at `level`) × (features) matrix with a 1 where a feature belongs to a lineage."""
+        codes = self.codes[:, level - 1]
+        return sparse.csr_matrix(
+            (np.ones(len(codes)), (codes, np.arange(len(codes)))),
+            shape=(len(self.labels[level - 1]), len(codes)),
+        )
+
+
+def relative_frequencies(matrix: sparse.spmatrix) -> sparse.csr_matrix:
+    """Divide every sample (column) by its total, empty samples stay at 0."""
+    totals = np.asarray(matrix.sum(axis=0)).ravel()
+    scale = np.divide(1.0, totals, out=np.zeros_like(totals, dtype=float), where=totals > 0)
+    return sparse.csr_matrix(matrix @ sparse.diags(scale))
+
+
+def collapse_table(table: SparseFeatureTable, level: int, relative: bool = False, index: LineageIndex | None = None) -> SparseFeatureTable:
+    """
+    Aggregate the absolute counts of a level-7 table to any rank between 1 and 7 by lineage
+    prefix, optionally as relative frequencies. Pass a prebuilt `index` to derive several
+    levels from the same table without encoding the lineages again.
+    """
+    if not 1 <= level <= MAX_LEVEL:
+        raise ValueError(f"❌ Level must be between 1 and {MAX_LEVEL}, got {level}.")
+    index = index or LineageIndex(table.features)
+    matrix = sparse.csr_matrix(index.indicator(level) @ table.matrix)
+    if relative:
+        matrix = relative_frequencies(matrix)
+    return SparseFeatureTable(
+        features=list(index.labels[level - 1]),
+        samples=list(table.samples),
+        matrix=matrix,
+    )
@@ -1,32 +1,23 @@
-from .path_utils import normalize_id_with_text , get_barcode_value
 from .io_utils import read_data_frame
+from .sample_ids import REFERENCE, barcode_values, normalize_ids
 from pathlib import Path
+import pandas as pd
 import sys
 
-REFERENCE:dict[str, str] = {'T+': 'Tpos', 'T-': 'Tneg'}
-
 def verify_folders_creation(main_dir: Path, excel_path: Path):
     df = read_data_frame(excel_path)
     if df is None:
         print("[ERROR] Dataframe is Empty, please verify the Excel file's content.")
         return
 
-    df['normalized_patient'] = df['Patient'].apply(lambda x: normalize_id_with_text(x, REFERENCE, is_patient=True))
+    df['normalized_patient'] = normalize_ids(df['Patient'], is_patient=True).to_numpy()
 
     # Build mapping: normalized_patient → list of barcodes
-    patient_to_barcodes = {}
-    for _, row in df.iterrows():
-        pid = row['normalized_patient']
-        barcode = row['Barcode']
-        patient_to_barcodes.setdefault(pid, []).append(barcode)
+    patient_to_barcodes = {pid: barcodes.tolist() for pid, barcodes in df.groupby('normalized_patient', sort=False)['Barcode']}
 
     # Extract patient folder IDs that actually exist
-    patient_folders = [item for item in main_dir.iterdir() if item.name.startswith("Patient_")]
-    existing_patient_ids = set()
-    for folder in patient_folders:
-        raw_id = folder.name[len("Patient_"):]
-        normalized_id = normalize_id_with_text(raw_id, REFERENCE, is_patient=True)
-        existing_patient_ids.add(normalized_id)
+    patient_folders = [item.name[len("Patient_"):] for item in main_dir.iterdir() if item.name.startswith("Patient_")]
+    existing_patient_ids = set(normalize_ids(pd.Series(patient_folders, dtype=str), is_patient=True))
 
     created_count = 0
     failed_count = 0
@@ -61,29 +52,21 @@ def verify_folders_creation(main_dir: Path, excel_path: Path):
 def verify_renaming(folders_path: Path):
     all_items = list(folders_path.iterdir())
 
-    sample_folders = [item for item in all_items if item.name.startswith("barcode")]
-
-    failed_count = 0
-    matched_count = 0
-    not_renamed = []
-
-    for sample in sample_folders:
-        barcode_val = get_barcode_value(sample.name)
-        if barcode_val == -1:
-            print(f"❌ Could not extract barcode from sample folder name: {sample.name}")
-            not_renamed.append(sample.name)
-            failed_count += 1
-            continue
+    sample_folders = pd.Series([item.name for item in all_items if item.name.startswith("barcode")], dtype=str)
 
-        # Extract the normalized id part from the sample folder name 
-        parts = sample.name.split('-', 1)
-        if len(parts) < 2:
-            print(f"❌ Sample folder '{sample.name}' does not contain expected '-' separator after barcode value")
-            not_renamed.append(sample.name)
-            failed_count += 1
-            continue
+    no_barcode = barcode_values(sample_folders) == -1
+    # The normalized id part follows the barcode value after a '-'
+    no_separator = ~no_barcode & ~sample_folders.str.contains('-', regex=False)
+    failed = no_barcode | no_separator
+    not_renamed = sample_folders[failed].tolist()
+    failed_count = len(not_renamed)
+    matched_count = len(sample_folders) - failed_count
 
-        matched_count += 1
+    for name, missing_barcode in zip(not_renamed, no_barcode[failed]):
+        if missing_barcode:
+            print(f"❌ Could not extract barcode from sample folder name: {name}")
+        else:
+            print(f"❌ Sample folder '{name}' does not contain expected '-' separator after barcode value")
 
     if failed_count > 0:
         #FIXME: add check if __name__ == '__main__' to show what do :
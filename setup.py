@@ -7,7 +7,7 @@ setup(
     author="Myson Dio",
     license='GPL-3.0',
     url="https://github.com/gtRZync/myson-tools",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     install_requires=[
         "pandas",
         "openpyxl",
@@ -15,6 +15,9 @@ setup(
         "python-dotenv",
         "odfpy",
         "scikit-bio",
+        "numpy",
+        "scipy",
+        "h5py",
     ],
     entry_points={
         "console_scripts": [
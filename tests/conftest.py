@@ -0,0 +1,24 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from benchmarks import synthetic
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(42)
+
+
+@pytest.fixture
+def samples() -> list[synthetic.Sample]:
+    return synthetic.make_samples(patients=2, barcodes_per_patient=2)
+
+
+@pytest.fixture
+def results_dir(tmp_path: Path, samples, rng) -> Path:
+    """A `2_Results` folder with one complete Results_Patient_<id> per patient."""
+    results_dir = tmp_path / '2_Results'
+    synthetic.write_results_tree(results_dir, samples, taxa=40, density=0.5, rng=rng)
+    return results_dir
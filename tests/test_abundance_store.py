@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from myson_tools.utils.abundance_store import TaxonDictionary, read_abundance_store, write_abundance_store
+from myson_tools.utils.feature_tables import SparseFeatureTable
+
+
+def table(features, values) -> SparseFeatureTable:
+    values = np.array(values, dtype=float)
+    return SparseFeatureTable(features=features, samples=[f'S{i}' for i in range(values.shape[1])], matrix=sparse.csr_matrix(values))
+
+
+def test_dictionary_ids_are_stable_across_runs(tmp_path):
+    path = tmp_path / 'taxon_dictionary.tsv'
+    dictionary = TaxonDictionary(path)
+    assert dictionary.encode(['d__A', 'd__B', 'd__A']).tolist() == [0, 1, 0]
+    dictionary.save()
+
+    reloaded = TaxonDictionary(path)
+    assert reloaded.encode(['d__C', 'd__B']).tolist() == [2, 1]
+    reloaded.save()
+    assert path.read_text(encoding='utf-8').splitlines() == ['0\td__A', '1\td__B', '2\td__C']
+    assert TaxonDictionary(path).decode(np.array([2, 0])) == ['d__C', 'd__A']
+
+
+@pytest.mark.parametrize('values, dtype', [([[3, 0], [0, 7]], np.int32), ([[0.25, 0], [0.75, 1.0]], np.float32)])
+def test_store_round_trip_in_the_compact_dtype(tmp_path, values, dtype):
+    dictionary = TaxonDictionary(tmp_path / 'taxon_dictionary.tsv')
+    written = table(['d__A;p__X', 'd__B;p__Y'], values)
+
+    write_abundance_store(written, tmp_path / 'table.npz', dictionary)
+    read = read_abundance_store(tmp_path / 'table.npz', TaxonDictionary(tmp_path / 'taxon_dictionary.tsv'))
+
+    assert read.features == written.features and read.samples == written.samples
+    assert read.matrix.dtype == dtype
+    assert np.array_equal(read.matrix.toarray(), written.matrix.toarray())
+    assert read_abundance_store(tmp_path / 'table.npz').features == ['taxon:0', 'taxon:1']
+    assert [p.name for p in tmp_path.iterdir() if 'tmp' in p.name] == []
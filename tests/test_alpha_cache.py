@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from myson_tools.utils.alpha_cache import cached_alpha_diversity, load_alpha_cache, sample_keys, save_alpha_cache
+from myson_tools.utils.alpha_diversity import METRICS
+
+
+@pytest.fixture
+def counts(rng) -> np.ndarray:
+    counts = rng.negative_binomial(n=0.5, p=0.02, size=(25, 40))
+    counts[rng.random(counts.shape) > 0.4] = 0
+    return counts
+
+
+def test_cache_reuses_unchanged_samples(counts):
+    features = [f'taxon{i}' for i in range(counts.shape[1])]
+    first, entries = cached_alpha_diversity(counts, features, {})
+
+    #? a new taxon column and reordered columns leave the keys of the samples unchanged
+    order = np.arange(counts.shape[1])[::-1]
+    widened = np.column_stack([counts[:, order], np.zeros(len(counts), dtype=counts.dtype)])
+    widened_features = [features[i] for i in order] + ['taxon_new']
+    again, new_entries = cached_alpha_diversity(widened, widened_features, entries)
+
+    assert new_entries == {}
+    for name in METRICS:
+        assert np.allclose(again[name], first[name])
+    assert sample_keys(counts[:1] + 1, features) != sample_keys(counts[:1], features)
+
+
+def test_cache_round_trip(tmp_path, counts):
+    features = [f'taxon{i}' for i in range(counts.shape[1])]
+    _, entries = cached_alpha_diversity(counts, features, {})
+    path = tmp_path / 'cache.json'
+
+    save_alpha_cache(path, entries)
+
+    assert load_alpha_cache(path) == entries
+    path.write_text('{not json', encoding='utf-8')
+    assert load_alpha_cache(path) == {}
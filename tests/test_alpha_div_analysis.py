@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from myson_tools.command.alpha_div_analysis import resolve_feature_tables, table_labels
+
+
+def touch(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text('#OTU ID\ts1\n')
+    return path
+
+
+def test_get_feature_table_output_gives_only_the_folder_tables(tmp_path):
+    tables = [
+        touch(tmp_path / 'absfreq_level7' / 'collapsed_table-absfreq-level7-P001.tsv'),
+        touch(tmp_path / 'relfreq_level7' / 'collapsed_table-relfreq-level7-P001.tsv'),
+    ]
+    touch(tmp_path / 'taxon_dictionary.tsv')
+    touch(tmp_path / 'absfreq_level7.npz')
+    touch(tmp_path / 'absfreq_level7' / 'taxon_dictionary.tsv')
+
+    assert resolve_feature_tables(str(tmp_path)) == sorted(tables)
+
+
+def test_other_folders_give_one_extension(tmp_path):
+    tsv = touch(tmp_path / 'merged-absfreq-level7.tsv')
+    touch(tmp_path / 'merged-absfreq-level7.npz')
+    touch(tmp_path / 'taxon_dictionary.tsv')
+
+    assert resolve_feature_tables(str(tmp_path)) == [tsv]
+    assert resolve_feature_tables(str(tmp_path / '*.npz')) == [tmp_path / 'merged-absfreq-level7.npz']
+
+
+def test_tables_of_the_same_name_get_distinct_labels(tmp_path):
+    tables = [touch(tmp_path / folder / 'merged.tsv') for folder in ('absfreq_level6', 'absfreq_level7')]
+    assert table_labels(tables) == {tables[0]: 'absfreq_level6_merged', tables[1]: 'absfreq_level7_merged'}
+    assert table_labels(tables[:1]) == {tables[0]: 'merged'}
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from skbio.diversity.alpha import observed_features, pielou_e, shannon, simpson
+
+from myson_tools.utils import alpha_diversity as kernel
+from myson_tools.utils.alpha_diversity import METRICS, alpha_diversity
+
+
+@pytest.fixture
+def counts(rng) -> np.ndarray:
+    counts = rng.negative_binomial(n=0.5, p=0.02, size=(25, 40))
+    counts[rng.random(counts.shape) > 0.4] = 0
+    #? at least two taxa per sample, so evenness is defined for skbio as well
+    counts[:, :2] += 1
+    return counts
+
+
+def skbio_metrics(row: np.ndarray) -> dict[str, float]:
+    return {
+        'shannon': shannon(row, base=np.e),
+        'simpson': simpson(row),
+        'richness': observed_features(row),
+        'evenness': pielou_e(row),
+    }
+
+
+def test_dense_metrics_match_skbio(counts, monkeypatch):
+    #? several chunks of rows
+    monkeypatch.setattr(kernel, 'CHUNK_ROWS', 4)
+
+    metrics = alpha_diversity(counts)
+
+    for idx, row in enumerate(counts):
+        for name, expected in skbio_metrics(row).items():
+            assert metrics[name][idx] == pytest.approx(expected)
+
+
+def test_sparse_metrics_match_dense(counts):
+    dense = alpha_diversity(counts)
+    sparse_metrics = alpha_diversity(sparse.csr_matrix(counts))
+
+    for name in METRICS:
+        assert np.allclose(sparse_metrics[name], dense[name])
+
+
+def test_empty_and_single_taxon_samples():
+    counts = np.array([[0, 0, 0], [5, 0, 0]])
+
+    for metrics in (alpha_diversity(counts), alpha_diversity(sparse.csr_matrix(counts))):
+        assert np.isnan(metrics['shannon'][0]) and np.isnan(metrics['simpson'][0])
+        assert metrics['richness'].tolist() == [0, 1]
+        assert metrics['shannon'][1] == 0.0 and metrics['evenness'].tolist() == [0.0, 0.0]
+
@@ -0,0 +1,56 @@
+from pathlib import Path
+import zipfile
+
+from myson_tools.command.audit_results import audit_results, check_artifact
+from myson_tools.utils.extraction import LEVELS
+from myson_tools.utils.extraction import COLLAPSE_FOLDER
+
+
+def flip_member_bytes(path: Path, member_suffix: str, count: int) -> None:
+    """Damage `count` bytes in the middle of the deflate stream of the member ending with `member_suffix`."""
+    with zipfile.ZipFile(path) as archive:
+        info = next(info for info in archive.infolist() if info.filename.endswith(member_suffix))
+    data = bytearray(path.read_bytes())
+    #? local file header : 30 fixed bytes, then the file name and the extra field
+    start = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+    middle = start + info.compress_size // 2
+    for idx in range(middle, middle + count):
+        data[idx] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+
+def test_complete_tree(results_dir):
+    audits = audit_results(results_dir, LEVELS, with_tsv=True, check_crc=True, workers=2)
+    assert audits and all(audit.status == 'complete' for audit in audits)
+
+
+def test_byte_flipped_qza_is_reported_corrupt(results_dir):
+    folder = sorted(results_dir.iterdir())[0]
+    artifact = folder / COLLAPSE_FOLDER / 'collapsed_table-absfreq-level7.qza'
+    flip_member_bytes(artifact, 'feature-table.biom', count=64)
+
+    assert check_artifact(artifact, check_crc=True).startswith('corrupt compressed data')
+    audits = {audit.name: audit for audit in audit_results(results_dir, LEVELS, with_tsv=True, check_crc=True, workers=2)}
+    assert audits[folder.name].status == 'corrupt'
+    assert f'{COLLAPSE_FOLDER}/{artifact.name}' in audits[folder.name].corrupt
+    assert all(audit.status == 'complete' for name, audit in audits.items() if name != folder.name)
+
+
+def test_truncated_qza_is_reported_corrupt(results_dir):
+    folder = sorted(results_dir.iterdir())[0]
+    artifact = folder / COLLAPSE_FOLDER / 'collapsed_table-relfreq-level4.qza'
+    artifact.write_bytes(artifact.read_bytes()[:200])
+
+    audits = {audit.name: audit for audit in audit_results(results_dir, LEVELS, with_tsv=False, check_crc=False, workers=2)}
+    assert audits[folder.name].status == 'corrupt'
+
+
+def test_tables_matched_like_the_extractors(results_dir):
+    folder = sorted(results_dir.iterdir())[0]
+    for table in (folder / COLLAPSE_FOLDER).glob('collapsed_table-*'):
+        table.rename(table.with_name(table.name.replace('collapsed_table-', 'Patient-collapsed-')))
+    (folder / COLLAPSE_FOLDER / 'Patient-collapsed-absfreq-level5.tsv').unlink()
+
+    audits = {audit.name: audit for audit in audit_results(results_dir, ['level5', 'level7'], with_tsv=True, check_crc=True, workers=2)}
+    assert audits[folder.name].status == 'incomplete'
+    assert audits[folder.name].missing == [f'{COLLAPSE_FOLDER}/*absfreq-level5.tsv']
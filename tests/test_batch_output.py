@@ -0,0 +1,58 @@
+import argparse
+
+import pytest
+
+from myson_tools.utils import batch_output
+from myson_tools.utils.batch_output import item, output_run
+
+
+@pytest.fixture(autouse=True)
+def reset_output():
+    yield
+    batch_output._output.level = batch_output.NORMAL
+    batch_output._output.counts.clear()
+
+
+def run_args(tmp_path, **flags) -> argparse.Namespace:
+    return argparse.Namespace(quiet=False, verbose=False, log_file=tmp_path / 'logs' / 'command.log', **flags)
+
+
+def test_no_log_without_items(tmp_path):
+    args = run_args(tmp_path)
+
+    with output_run(args, 'command'):
+        pass
+
+    assert not args.log_file.exists()
+    assert not args.log_file.parent.exists()
+
+
+def test_items_are_logged_and_counted(tmp_path, capsys):
+    args = run_args(tmp_path)
+
+    with output_run(args, 'command'):
+        item('sort', 'OK', 'barcode01 -> Patient_1')
+        item('sort', 'OK', 'barcode02 -> Patient_1')
+        item('sort', 'ERROR', 'barcode03: no sheet row')
+
+    lines = args.log_file.read_text(encoding='utf-8').splitlines()
+    assert [line.split(' ', 2)[2] for line in lines] == [
+        '[OK] sort: barcode01 -> Patient_1', '[OK] sort: barcode02 -> Patient_1', '[ERROR] sort: barcode03: no sheet row',
+    ]
+    out = capsys.readouterr().out
+    assert '[ERROR] barcode03: no sheet row' in out
+    assert 'barcode01 -> Patient_1' not in out
+    assert str(args.log_file) in out
+
+
+def test_quiet_still_shows_warnings(tmp_path, capsys):
+    args = run_args(tmp_path)
+    args.quiet = True
+
+    with output_run(args, 'command'):
+        item('rename', 'WARNING', 'No matching sample for barcode 4')
+        item('rename', 'OK', 'Renamed barcode01')
+
+    out = capsys.readouterr().out
+    assert '[WARNING] No matching sample for barcode 4' in out
+    assert 'Renamed barcode01' not in out
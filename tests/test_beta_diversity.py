@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.spatial.distance import pdist
+
+from benchmarks import synthetic
+from myson_tools.command.beta_div_analysis import beta_div_analysis
+from myson_tools.utils.abundance_store import TaxonDictionary, write_abundance_store
+from myson_tools.utils.beta_diversity import beta_diversity
+from myson_tools.utils.feature_tables import SparseFeatureTable, write_sparse_feature_tsv
+from myson_tools.utils.table_loader import load_feature_matrix, load_sparse_feature_matrix
+
+
+@pytest.fixture
+def table(samples, rng):
+    table = synthetic.make_counts(synthetic.make_lineages(60, rng), [s.renamed_folder for s in samples] * 5, 0.3, rng)
+    #? unique sample ids, and at least one read per sample so that Bray–Curtis is defined
+    counts = table.matrix.toarray()
+    counts[0] += 1
+    return SparseFeatureTable(features=table.features, samples=[f'S{i}' for i in range(counts.shape[1])], matrix=sparse.csr_matrix(counts))
+
+
+@pytest.mark.parametrize('metric', ['braycurtis', 'jaccard'])
+def test_distances_match_pdist(tmp_path, table, metric):
+    counts = table.matrix.T.tocsr()
+
+    condensed = beta_diversity(counts, metric, tmp_path / f'{metric}.npy', block_size=3, workers=2)
+
+    expected = pdist(counts.toarray() > 0 if metric == 'jaccard' else counts.toarray(), metric)
+    assert np.allclose(condensed, expected)
+
+
+def test_jaccard_of_empty_samples_is_zero(tmp_path):
+    counts = sparse.csr_matrix(np.array([[0, 0], [0, 0], [1, 0]]))
+
+    condensed = beta_diversity(counts, 'jaccard', tmp_path / 'jaccard.npy')
+
+    assert condensed.tolist() == [0.0, 1.0, 1.0]
+
+
+@pytest.mark.parametrize('suffix', ['.tsv', '.qza', '.npz'])
+def test_sparse_loader_matches_dense_loader(tmp_path, table, suffix):
+    path = tmp_path / f'table{suffix}'
+    if suffix == '.tsv':
+        write_sparse_feature_tsv(table, path)
+    elif suffix == '.qza':
+        synthetic.write_qza(path, table, 'FeatureTable[Frequency]')
+    else:
+        write_abundance_store(table, path, TaxonDictionary(tmp_path / 'taxon_dictionary.tsv'))
+    wanted = ['S0', 'S3', 'S7']
+
+    loaded = load_sparse_feature_matrix(path, samples=wanted)
+    dense = load_feature_matrix(path, samples=wanted)
+
+    assert sparse.issparse(loaded.counts)
+    assert loaded.samples == dense.samples == wanted
+    assert loaded.features == dense.features
+    assert np.array_equal(loaded.counts.toarray(), dense.counts)
+
+
+def test_command_writes_pdist_layout(tmp_path, table):
+    path = tmp_path / 'merged-absfreq-level7.tsv'
+    write_sparse_feature_tsv(table, path)
+
+    beta_div_analysis(path, tmp_path / 'out', ['braycurtis'], block_size=4, workers=1, tsv=False)
+
+    samples = (tmp_path / 'out' / 'merged-absfreq-level7_samples.txt').read_text(encoding='utf-8').split()
+    assert samples == table.samples
+    condensed = np.load(tmp_path / 'out' / 'merged-absfreq-level7_braycurtis.npy')
+    assert np.allclose(condensed, pdist(table.matrix.T.toarray(), 'braycurtis'))
+
+
+def test_loaders_keep_the_requested_sample_order(tmp_path, table):
+    path = tmp_path / 'table.tsv'
+    write_sparse_feature_tsv(table, path)
+    wanted = ['S7', 'S0', 'S3']
+    expected = table.matrix.T.toarray()[[7, 0, 3]]
+
+    for loader in (load_feature_matrix, load_sparse_feature_matrix):
+        loaded = loader(path, samples=wanted)
+        counts = loaded.counts.toarray() if sparse.issparse(loaded.counts) else loaded.counts
+        assert loaded.samples == wanted
+        assert np.array_equal(counts, expected)
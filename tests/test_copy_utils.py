@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+from myson_tools.utils import copy_utils
+from myson_tools.utils.copy_utils import COPY, HARDLINK, copy_deduplicated, file_digest, group_by_content, link_or_copy
+
+
+@pytest.fixture
+def sources(tmp_path) -> dict[str, Path]:
+    folder = tmp_path / 'sources'
+    folder.mkdir()
+    contents = {'taxonomy_a.qza': b'same taxonomy', 'taxonomy_b.qza': b'same taxonomy', 'table.qza': b'other content',
+                'table_bis.qza': b'other contenT'}
+    for name, content in contents.items():
+        (folder / name).write_bytes(content)
+    return {name: folder / name for name in contents}
+
+
+def test_identical_contents_are_grouped(sources, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(copy_utils, 'file_digest', lambda path: hashed.append(path.name) or file_digest(path))
+
+    groups = group_by_content(list(sources.values()))
+
+    assert sorted(sorted(p.name for p in group) for group in groups) == [['table.qza'], ['table_bis.qza'], ['taxonomy_a.qza', 'taxonomy_b.qza']]
+    assert len(hashed) == 4
+
+
+def test_unique_sizes_are_not_hashed(tmp_path, monkeypatch):
+    for size in range(3):
+        (tmp_path / f'{size}.bin').write_bytes(b'x' * size)
+    monkeypatch.setattr(copy_utils, 'file_digest', lambda path: pytest.fail(f'{path} hashed'))
+
+    assert len(group_by_content(sorted(tmp_path.iterdir()))) == 3
+
+
+@pytest.mark.parametrize('allow_links', [True, False])
+def test_each_content_is_stored_once(sources, tmp_path, allow_links):
+    outputs = [tmp_path / f'out{i}' for i in range(3)]
+    for output in outputs:
+        output.mkdir()
+    pairs = [(source, output / name) for name, source in sources.items() for output in outputs]
+
+    report = copy_deduplicated(pairs, workers=2, allow_links=allow_links, with_digests=True)
+
+    assert report.failed == []
+    assert all(destination.read_bytes() == source.read_bytes() for source, destination in pairs)
+    inodes = {destination.stat().st_ino for source, destination in pairs if source.read_bytes() == b'same taxonomy'}
+    assert len(inodes) == 1
+    assert len({destination.stat().st_ino for _, destination in pairs}) == 3
+    if allow_links:
+        #? on the same filesystem the first destination is a link to its source as well
+        assert report.methods.get(COPY, 0) == 0 and report.bytes_copied == 0
+    else:
+        assert report.methods[COPY] == 3 and report.methods[HARDLINK] == len(pairs) - 3
+    assert set(report.digests) == set(sources.values())
+
+
+def test_link_or_copy_replaces_the_destination(sources, tmp_path):
+    destination = tmp_path / 'out.qza'
+    destination.write_bytes(b'stale')
+
+    assert link_or_copy(sources['table.qza'], destination, allow_links=False) == COPY
+    assert destination.read_bytes() == b'other content'
+    assert destination.stat().st_ino != sources['table.qza'].stat().st_ino
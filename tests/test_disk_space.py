@@ -0,0 +1,39 @@
+from myson_tools.utils.disk_space import (
+    GIGABYTE,
+    SAFETY_FACTOR,
+    WatchedVolume,
+    existing_parent,
+    load_usage_history,
+    record_usage,
+    required_free_bytes,
+    usage_ratios,
+    watched_volumes,
+)
+
+
+def test_roles_on_one_device_are_watched_once(tmp_path):
+    volumes = watched_volumes({'work': tmp_path / 'work' / 'not_created', 'results': tmp_path, 'docker': None})
+
+    assert [(volume.role, volume.path) for volume in volumes] == [('work+results', tmp_path)]
+    assert existing_parent(tmp_path / 'a' / 'b') == tmp_path
+
+
+def test_required_space_follows_the_worst_past_run(tmp_path):
+    history_file = tmp_path / 'usage.json'
+    record_usage(history_file, 'run1', 2 * GIGABYTE, {'work': 6 * GIGABYTE})
+    record_usage(history_file, 'run2', 1 * GIGABYTE, {'work': 4 * GIGABYTE, 'docker': GIGABYTE})
+    record_usage(history_file, 'empty', 0, {'work': 50 * GIGABYTE})
+    history = load_usage_history(history_file)
+
+    assert usage_ratios(history) == {'work': 4.0, 'docker': 1.0}
+    volumes = [WatchedVolume('work', tmp_path, 1), WatchedVolume('docker', tmp_path, 2), WatchedVolume('results', tmp_path, 3)]
+    required = required_free_bytes(volumes, 10 * GIGABYTE, history, min_free_bytes=5 * GIGABYTE)
+    assert required == {1: int(40 * SAFETY_FACTOR * GIGABYTE), 2: int(10 * SAFETY_FACTOR * GIGABYTE), 3: 5 * GIGABYTE}
+
+
+def test_unreadable_history_is_empty(tmp_path):
+    history_file = tmp_path / 'usage.json'
+    history_file.write_text('[{', encoding='utf-8')
+
+    assert load_usage_history(history_file) == []
+    assert load_usage_history(tmp_path / 'missing.json') == []
@@ -0,0 +1,132 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from benchmarks import synthetic
+from myson_tools.command.get_qza_tables_and_taxonomy import extraction_patterns
+from myson_tools.utils import extraction
+from myson_tools.utils.extraction import FREQUENCY, LEVELS, output_folder_names, run_extraction
+from myson_tools.utils.manifest import load_manifest, vanished_sources
+
+
+@pytest.fixture
+def run_results(tmp_path, samples, rng) -> Path:
+    results = tmp_path / '250101_ICMc_run' / '2_Results'
+    synthetic.write_results_tree(results, samples, taxa=40, density=0.5, rng=rng)
+    return results
+
+
+def extract(results: Path, output: Path, **kwargs):
+    return run_extraction(results, extraction_patterns(), output_folder_names(LEVELS, FREQUENCY), output, workers=2, **kwargs)
+
+
+def test_tables_and_taxonomy_are_extracted_in_one_pass(run_results, tmp_path):
+    output = tmp_path / 'out'
+
+    plan = extract(run_results, output)
+
+    patients = sorted(folder.name.removeprefix('Results_Patient_') for folder in run_results.iterdir())
+    names = [f'250101_ICMc_{patient}' if patient.startswith('T') else patient for patient in patients]
+    assert plan.found == {'collapsed table': 4 * len(LEVELS) * len(FREQUENCY), 'taxonomy': 4}
+    for folder in output_folder_names(LEVELS, FREQUENCY):
+        freq, level = folder.split('_')
+        assert sorted(p.name for p in (output / folder).iterdir()) == sorted(
+            [f'collapsed_table-{freq}-{level}-{name}.qza' for name in names] + [f'taxonomy-{name}.qza' for name in names]
+        )
+    #? every copy of a source is the same file
+    taxonomies = {(output / folder / 'taxonomy-P001.qza').stat().st_ino for folder in output_folder_names(LEVELS, FREQUENCY)}
+    assert len(taxonomies) == 1
+
+
+def test_results_folder_without_taxonomy_is_skipped(run_results, tmp_path):
+    (run_results / 'Results_Patient_P001' / 'assignTaxonomy' / 'taxonomy.qza').unlink()
+    (run_results / 'Results_Patient_P001' / 'assignTaxonomy').rmdir()
+
+    plan = extract(run_results, tmp_path / 'out')
+
+    assert list(plan.skipped) == ['Results_Patient_P001']
+    assert not any('P001' in copy.destination.name for copy in plan.copies)
+
+
+@pytest.fixture
+def copied(monkeypatch) -> list[Path]:
+    """Sources handed to the copy engine by every run."""
+    sources = []
+    copy_deduplicated = extraction.copy_deduplicated
+
+    def recording(pairs, **kwargs):
+        sources.extend(source for source, _ in pairs)
+        return copy_deduplicated(pairs, **kwargs)
+
+    monkeypatch.setattr(extraction, 'copy_deduplicated', recording)
+    return sources
+
+
+def test_unchanged_artifacts_are_not_copied_again(run_results, tmp_path, copied):
+    output = tmp_path / 'out'
+    extract(run_results, output)
+    first_run = len(copied)
+    copied.clear()
+
+    extract(run_results, output)
+    assert copied == []
+
+    table = run_results / 'Results_Patient_P002' / 'collapseTables' / 'collapsed_table-absfreq-level6.qza'
+    table.write_bytes(table.read_bytes() + b'\0')
+    extract(run_results, output)
+    assert copied == [table]
+
+    copied.clear()
+    extract(run_results, output, force=True)
+    assert len(copied) == first_run
+
+
+def test_deleted_output_is_copied_again(run_results, tmp_path, copied):
+    output = tmp_path / 'out'
+    extract(run_results, output)
+    copied.clear()
+
+    (output / 'relfreq_level5' / 'taxonomy-P001.qza').unlink()
+    extract(run_results, output)
+
+    assert copied == [run_results / 'Results_Patient_P001' / 'assignTaxonomy' / 'taxonomy.qza']
+    entries = load_manifest(output)
+    assert entries['relfreq_level5/taxonomy-P001.qza'].source == str(copied[0])
+
+
+def test_vanished_sources_are_reported(run_results, tmp_path):
+    output = tmp_path / 'out'
+    extract(run_results, output)
+    source = run_results / 'Results_Patient_P001' / 'collapseTables' / 'collapsed_table-absfreq-level7.qza'
+    source.unlink()
+
+    assert vanished_sources(load_manifest(output)) == {'absfreq_level7/collapsed_table-absfreq-level7-P001.qza': str(source)}
+
+
+def test_touched_but_identical_source_is_not_copied_again(run_results, tmp_path, copied):
+    output = tmp_path / 'out'
+    extract(run_results, output)
+    copied.clear()
+    table = run_results / 'Results_Patient_P002' / 'collapseTables' / 'collapsed_table-absfreq-level6.qza'
+    mtime_ns = table.stat().st_mtime_ns + 10**9
+    os.utime(table, ns=(mtime_ns, mtime_ns))
+
+    extract(run_results, output)
+
+    assert copied == []
+    assert load_manifest(output)['absfreq_level6/collapsed_table-absfreq-level6-P002.qza'].mtime_ns == mtime_ns
+
+
+def test_vanished_sources_are_dropped_from_the_manifest(run_results, tmp_path):
+    output = tmp_path / 'out'
+    extract(run_results, output)
+    source = run_results / 'Results_Patient_P001' / 'collapseTables' / 'collapsed_table-absfreq-level7.qza'
+    source.unlink()
+
+    extract(run_results, output)
+
+    entries = load_manifest(output)
+    assert vanished_sources(entries) == {}
+    assert 'absfreq_level7/collapsed_table-absfreq-level7-P001.qza' not in entries
+    assert (output / 'absfreq_level7' / 'collapsed_table-absfreq-level7-P001.qza').exists()
@@ -0,0 +1,94 @@
+from pathlib import Path
+import gzip
+import struct
+
+import pytest
+
+from benchmarks import synthetic
+from myson_tools.command.compress_fastq import compress_fastq
+from myson_tools.utils import fastq_compression
+from myson_tools.utils.fastq_compression import BGZF_EOF, compress_barcode, round_trips
+from myson_tools.utils.read_filter import fastq_files
+
+
+@pytest.fixture
+def fastq_pass(tmp_path: Path, rng) -> Path:
+    """Two barcodes of three uncompressed chunks, large enough to span several BGZF blocks."""
+    fastq_pass = tmp_path / 'fastq_pass'
+    synthetic.write_fastq_tree(fastq_pass, synthetic.make_samples(1, 2, references=False), chunks=3, reads_per_chunk=100, read_length=800, rng=rng)
+    for chunk in list(fastq_pass.rglob('*.fastq.gz')):
+        chunk.with_suffix('').write_bytes(gzip.decompress(chunk.read_bytes()))
+        chunk.unlink()
+    return fastq_pass
+
+
+def bgzf_blocks(data: bytes) -> list[bytes]:
+    blocks, pos = [], 0
+    while pos < len(data):
+        assert data[pos:pos + 4] == b'\x1f\x8b\x08\x04' and data[pos + 12:pos + 14] == b'BC'
+        size = struct.unpack('<H', data[pos + 16:pos + 18])[0] + 1
+        blocks.append(data[pos:pos + size])
+        pos += size
+    return blocks
+
+
+def test_bgzf_round_trip_and_eof_block(fastq_pass):
+    folder = fastq_pass / 'barcode01'
+    originals = {path.name: path.read_bytes() for path in folder.iterdir()}
+    stats = compress_barcode(folder, level=6, threads=2, keep_dir=None, label='barcode01')
+
+    assert stats.files == 3 and not stats.failed
+    assert sorted(path.name for path in folder.iterdir()) == sorted(f'{name}.gz' for name in originals)
+    for name, data in originals.items():
+        compressed = (folder / f'{name}.gz').read_bytes()
+        blocks = bgzf_blocks(compressed)
+        assert len(blocks) > 2 and blocks[-1] == BGZF_EOF
+        assert gzip.decompress(compressed) == data
+    assert stats.bytes_in == sum(len(data) for data in originals.values())
+
+
+def test_corrupt_output_does_not_round_trip(fastq_pass, tmp_path):
+    source = next((fastq_pass / 'barcode01').iterdir())
+    target = tmp_path / 'copy.fastq.gz'
+    target.write_bytes(gzip.compress(source.read_bytes())[:-40])
+    assert not round_trips(source, target)
+
+
+def test_kept_originals_leave_the_barcode_folders(fastq_pass, tmp_path):
+    keep_dir = tmp_path / 'fastq_uncompressed'
+    compress_fastq(fastq_pass, level=1, workers=1, threads=1, keep_dir=keep_dir)
+
+    assert len(list(keep_dir.glob('barcode0*/*.fastq'))) == 6
+    assert all(path.name.endswith('.fastq.gz') for path in fastq_pass.rglob('*') if path.is_file())
+    assert compress_fastq(fastq_pass, level=1, workers=1, threads=1, keep_dir=keep_dir) == {}
+
+
+def test_interrupted_run_is_not_compressed_again(fastq_pass):
+    folder = fastq_pass / 'barcode01'
+    source = sorted(folder.iterdir())[0]
+    (folder / f'{source.name}.gz').write_bytes(gzip.compress(source.read_bytes()))
+    assert len(fastq_files(folder)) == 3
+
+    stats = compress_barcode(folder, level=1, threads=1, keep_dir=None, label='barcode01')
+    assert stats.already_compressed == 1 and stats.files == 2
+    assert not source.exists()
+
+
+def test_failed_file_keeps_its_original_and_the_others_are_counted(fastq_pass, monkeypatch):
+    folder = fastq_pass / 'barcode01'
+    broken = sorted(folder.iterdir())[1]
+    compress_file = fastq_compression.compress_file
+
+    def failing(source, target, *args):
+        if source == broken:
+            raise OSError('No space left on device')
+        compress_file(source, target, *args)
+
+    monkeypatch.setattr(fastq_compression, 'compress_file', failing)
+    stats = compress_barcode(folder, level=1, threads=1, keep_dir=None, label='barcode01')
+
+    assert list(stats.failed) == [broken.name]
+    assert stats.files == 2
+    assert broken.exists() and not (folder / f'{broken.name}.gz').exists()
+    assert stats.bytes_out == sum(path.stat().st_size for path in folder.glob('*.gz'))
+    assert not list(folder.glob('.*.tmp'))
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from benchmarks import synthetic
+from myson_tools.utils import feature_tables
+from myson_tools.utils.feature_tables import (
+    SparseFeatureTable,
+    merge_sparse_tables,
+    read_feature_tsv,
+    read_sparse_feature_table,
+    write_sparse_feature_tsv,
+)
+
+
+def test_sparse_read_matches_dense_read_across_chunks(tmp_path, samples, rng, monkeypatch):
+    monkeypatch.setattr(feature_tables, 'READ_CHUNK_ROWS', 7)
+    path = tmp_path / 'table.tsv'
+    synthetic.write_merged_table(path, samples, taxa=50, density=0.3, rng=rng)
+
+    table = read_sparse_feature_table(path)
+    dense = read_feature_tsv(path)
+
+    assert table.features == list(dense.index)
+    assert table.samples == list(dense.columns)
+    assert np.array_equal(table.matrix.toarray(), dense.to_numpy())
+    assert table.matrix.nnz == np.count_nonzero(dense.to_numpy())
+
+
+def test_sparse_read_of_an_empty_table(tmp_path):
+    path = tmp_path / 'empty.tsv'
+    write_sparse_feature_tsv(SparseFeatureTable(features=[], samples=['s1', 's2'], matrix=sparse.csr_matrix((0, 2))), path)
+
+    table = read_sparse_feature_table(path)
+
+    assert table.features == [] and table.samples == ['s1', 's2'] and table.matrix.shape == (0, 2)
+
+
+def table(features, samples, values) -> SparseFeatureTable:
+    return SparseFeatureTable(features=features, samples=samples, matrix=sparse.csr_matrix(np.array(values, dtype=float)))
+
+
+def test_merge_outer_joins_features():
+    left = table(['b', 'a'], ['s1'], [[1], [2]])
+    right = table(['c', 'a'], ['s2', 's3'], [[3, 0], [0, 4]])
+
+    merged = merge_sparse_tables([left, right])
+
+    expected = pd.DataFrame({'s1': [2, 1, 0], 's2': [0, 0, 3], 's3': [4, 0, 0]}, index=['a', 'b', 'c'], dtype=float)
+    assert merged.features == list(expected.index) and merged.samples == list(expected.columns)
+    assert np.array_equal(merged.matrix.toarray(), expected.to_numpy())
+
+
+def test_merge_overlapping_samples():
+    left = table(['a'], ['s1'], [[1]])
+    right = table(['a', 'b'], ['s1'], [[2], [5]])
+
+    with pytest.raises(ValueError):
+        merge_sparse_tables([left, right])
+    merged = merge_sparse_tables([left, right], overlap='sum')
+    assert merged.matrix.toarray().tolist() == [[3.0], [5.0]]
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from myson_tools.command import get_feature_table
+from myson_tools.command.get_feature_table import derive_table
+from myson_tools.utils.extraction import FREQUENCY, PlannedCopy, convert_artifacts, output_folder_names
+from myson_tools.utils.feature_tables import SparseFeatureTable, read_sparse_feature_table, write_sparse_feature_tsv
+from myson_tools.utils.taxonomy_collapse import collapse_table
+
+LINEAGES = [
+    'd__B;p__P1;c__C1;o__O1;f__F1;g__G1;s__S1',
+    'd__B;p__P1;c__C1;o__O1;f__F1;g__G1;s__S2',
+    'd__B;p__P1;c__C2;o__O2;f__F2;g__G2;s__S3',
+    'd__B;p__P2',
+]
+
+
+@pytest.fixture
+def level7(tmp_path: Path) -> Path:
+    counts = np.array([[1, 0], [2, 5], [3, 0], [4, 5]], dtype=float)
+    path = tmp_path / 'collapsed_table-absfreq-level7-P001.tsv'
+    write_sparse_feature_tsv(SparseFeatureTable(LINEAGES, ['s1', 's2'], sparse.csr_matrix(counts)), path)
+    get_feature_table._read_level7_table.cache_clear()
+    return path
+
+
+def test_collapse_sums_counts_by_lineage_prefix(level7):
+    table = read_sparse_feature_table(level7)
+    phylum = collapse_table(table, 2)
+    assert phylum.features == ['d__B;p__P1', 'd__B;p__P2']
+    np.testing.assert_array_equal(phylum.matrix.toarray(), [[6, 5], [4, 5]])
+    #? ranks missing from a short lineage are padded like QIIME 2 does
+    assert collapse_table(table, 3).features[-1] == 'd__B;p__P2;__'
+    np.testing.assert_allclose(collapse_table(table, 2, relative=True).matrix.toarray(), [[0.6, 0.5], [0.4, 0.5]])
+
+
+def test_every_level_is_derived_from_one_read(level7, tmp_path, monkeypatch):
+    reads = []
+    read = get_feature_table.read_sparse_feature_table
+    monkeypatch.setattr(get_feature_table, 'read_sparse_feature_table', lambda path: reads.append(path) or read(path))
+
+    levels = [f'level{level}' for level in range(1, 8)]
+    copies = [
+        PlannedCopy(label='level-7 table', source=level7, destination=tmp_path / folder / f'{folder}.tsv', convert=derive_table)
+        for folder in output_folder_names(levels, FREQUENCY)
+    ]
+    for copy in copies:
+        copy.destination.parent.mkdir()
+    failed = []
+    convert_artifacts(copies, {}, failed, workers=8)
+
+    assert not failed
+    assert reads == [level7]
+    genus = read_sparse_feature_table(tmp_path / 'absfreq_level6' / 'absfreq_level6.tsv')
+    np.testing.assert_array_equal(genus.matrix.toarray(), [[3, 5], [3, 0], [4, 5]])
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from myson_tools.utils.group_tests import GroupTestSettings, _rank_statistics, group_tests
+
+
+@pytest.fixture
+def results(rng) -> pd.DataFrame:
+    """Three patients of eight samples, shannon shifted for patient C, simpson unrelated to the patient."""
+    patients = np.repeat(['A', 'B', 'C'], 8)
+    return pd.DataFrame({
+        'Patient': patients,
+        'Prélèvement': np.tile(['nez', 'gorge'], 12),
+        'shannon': rng.normal(size=24) + 3.0 * (patients == 'C'),
+        'simpson': rng.normal(size=24),
+    })
+
+
+def test_rank_statistics_match_scipy(results):
+    values = results[['shannon', 'simpson']].to_numpy()
+    ranks = np.apply_along_axis(stats.rankdata, 0, values)
+    patients = pd.factorize(results['Patient'], sort=True)[0]
+    sites = pd.factorize(results['Prélèvement'], sort=True)[0]
+
+    kruskal = _rank_statistics(ranks, patients[None, :], 3)[0]
+    mann_whitney = _rank_statistics(ranks, sites[None, :], 2)[0]
+
+    for m in range(values.shape[1]):
+        groups = [values[patients == g, m] for g in range(3)]
+        assert kruskal[m] == pytest.approx(stats.kruskal(*groups).statistic)
+        first, second = values[sites == 0, m], values[sites == 1, m]
+        u = stats.mannwhitneyu(first, second).statistic
+        assert mann_whitney[m] == pytest.approx(abs(u - len(first) * len(second) / 2))
+
+
+def test_permutation_p_values(results):
+    settings = GroupTestSettings(groupings=('Patient', 'Prélèvement'), permutations=999, seed=3, workers=1)
+
+    tests = group_tests(results, ['shannon', 'simpson'], settings).set_index(['grouping', 'metric'])
+
+    assert tests.loc[('Patient', 'shannon'), 'test'] == 'Kruskal-Wallis H'
+    assert tests.loc[('Prélèvement', 'shannon'), 'test'] == 'Mann-Whitney U'
+    assert tests.loc[('Patient', 'shannon'), 'p_permutation'] == pytest.approx(1 / 1000)
+    assert tests.loc[('Patient', 'simpson'), 'p_permutation'] > 0.01
+    #? the permutation p-value follows the asymptotic one
+    assert tests['p_permutation'].corr(tests['p_value']) > 0.9
+
+
+def test_seeded_results_do_not_depend_on_the_workers(results):
+    one = group_tests(results, ['shannon', 'simpson'], GroupTestSettings(permutations=2500, seed=11, workers=1))
+    two = group_tests(results, ['shannon', 'simpson'], GroupTestSettings(permutations=2500, seed=11, workers=2))
+
+    pd.testing.assert_frame_equal(one, two)
+
+
+def test_unusable_groupings_are_skipped(results):
+    results = results.assign(Patient=np.where(results['Patient'] == 'A', 'A', 'N/A'))
+
+    tests = group_tests(results, ['shannon'], GroupTestSettings(groupings=('Patient', 'Missing'), permutations=10, workers=1))
+
+    assert tests.empty
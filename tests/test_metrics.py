@@ -0,0 +1,46 @@
+import pytest
+
+from myson_tools.utils import metrics
+from myson_tools.utils.metrics import TextfileMetrics, metrics_run
+
+
+def test_render_declares_each_metric_once(tmp_path):
+    writer = TextfileMetrics('job', tmp_path)
+
+    writer.inc('beta_pairs_total', 3, metric='jaccard')
+    writer.inc('beta_pairs_total', 2, metric='jaccard')
+    writer.observe('nextflow_run_duration_seconds', 1.5)
+    writer.observe('nextflow_run_duration_seconds', 2.5)
+    text = writer.render()
+
+    assert text.count('# TYPE myson_tools_beta_pairs_total counter') == 1
+    assert 'myson_tools_beta_pairs_total{job="job",metric="jaccard"} 5' in text
+    assert 'myson_tools_nextflow_run_duration_seconds_sum{job="job"} 4' in text
+    assert 'myson_tools_nextflow_run_duration_seconds_count{job="job"} 2' in text
+
+
+def test_unknown_metrics_are_refused(tmp_path):
+    with pytest.raises(KeyError):
+        TextfileMetrics('job', tmp_path).inc('not_declared_total')
+
+
+def test_run_records_failure_and_resets(tmp_path, monkeypatch):
+    monkeypatch.setenv(metrics.ENV_VAR, str(tmp_path))
+
+    with pytest.raises(SystemExit), metrics_run('job'):
+        metrics.inc('folders_failed_total')
+        raise SystemExit(1)
+
+    text = (tmp_path / 'myson_tools_job.prom').read_text(encoding='utf-8')
+    assert 'myson_tools_run_success{job="job"} 0' in text
+    assert 'myson_tools_run_in_progress{job="job"} 0' in text
+    assert 'myson_tools_folders_failed_total{job="job"} 1' in text
+    assert metrics._metrics is None
+    assert [p.name for p in tmp_path.iterdir()] == ['myson_tools_job.prom']
+
+
+def test_helpers_are_no_ops_without_the_directory(monkeypatch):
+    monkeypatch.delenv(metrics.ENV_VAR, raising=False)
+
+    with metrics_run('job'):
+        metrics.inc('not_declared_total')
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+from myson_tools.utils.profiling import StageProfiler
+
+
+def test_profiling_does_not_import_the_table_stack():
+    code = (
+        "import sys, myson_tools.utils.profiling; "
+        "print(' '.join(m for m in ('scipy', 'myson_tools.utils.table_loader', 'myson_tools.utils.qza_reader') if m in sys.modules))"
+    )
+    loaded = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip()
+
+    assert loaded == ''
+
+
+def test_stages_accumulate_by_name():
+    profiler = StageProfiler()
+    profiler.enabled = True
+
+    for _ in range(3):
+        with profiler.stage('load'):
+            pass
+    with profiler.stage('write'):
+        pass
+
+    assert [(t.name, t.calls) for t in profiler.stages.values()] == [('load', 3), ('write', 1)]
+    assert profiler.stages['load'].peak_memory_mb > 0
@@ -0,0 +1,64 @@
+import uuid
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+from myson_tools.utils.feature_tables import read_feature_tsv, write_feature_tsv
+from myson_tools.utils.qza_reader import qza_to_tsv, read_qza_matrix, read_qza_table
+
+
+@pytest.fixture
+def table(rng):
+    lineages = synthetic.make_lineages(30, rng)
+    return synthetic.make_counts(lineages, [f'S{i}' for i in range(8)], 0.4, rng)
+
+
+def test_biom_json_payload(tmp_path, table):
+    path = tmp_path / 'table.qza'
+    synthetic.write_qza(path, table, 'FeatureTable[Frequency]')
+
+    features, samples, matrix = read_qza_matrix(path)
+
+    assert features == table.features and samples == table.samples
+    assert np.array_equal(matrix.toarray(), table.matrix.toarray())
+
+
+def test_tsv_payload(tmp_path, table):
+    tsv = tmp_path / 'feature-table.tsv'
+    write_feature_tsv(pd.DataFrame(table.matrix.toarray(), index=table.features, columns=table.samples), tsv)
+    path = tmp_path / 'table.qza'
+    artifact = str(uuid.uuid4())
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr(f'{artifact}/metadata.yaml', f'uuid: {artifact}\n')
+        archive.write(tsv, f'{artifact}/data/feature-table.tsv')
+
+    features, samples, matrix = read_qza_matrix(path)
+
+    assert features == table.features and samples == table.samples
+    assert np.array_equal(matrix.toarray(), table.matrix.toarray())
+
+
+def test_qza_to_tsv_and_sparse_frame(tmp_path, table):
+    path = tmp_path / 'table.qza'
+    synthetic.write_qza(path, table, 'FeatureTable[Frequency]')
+
+    qza_to_tsv(path, tmp_path / 'table.tsv')
+    sparse_df = read_qza_table(path, as_sparse=True)
+
+    exported = read_feature_tsv(tmp_path / 'table.tsv')
+    assert np.array_equal(exported.to_numpy(), table.matrix.toarray())
+    assert np.array_equal(sparse_df.sparse.to_dense().to_numpy(), table.matrix.toarray())
+    assert all(dtype.fill_value == 0 for dtype in sparse_df.dtypes)
+    assert sum(len(sparse_df[sample].array.sp_values) for sample in sparse_df.columns) == table.matrix.nnz
+
+
+def test_missing_payload(tmp_path):
+    path = tmp_path / 'empty.qza'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('artifact/metadata.yaml', 'uuid: artifact\n')
+
+    with pytest.raises(ValueError):
+        read_qza_matrix(path)
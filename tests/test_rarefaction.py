@@ -0,0 +1,57 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from myson_tools.utils import rarefaction
+from myson_tools.utils.rarefaction import RarefactionSettings, as_count_matrix, rarefied_alpha, subsample
+
+COUNTS = np.array([
+    [50, 0, 30, 20, 0, 0],
+    [5, 5, 5, 5, 5, 5],
+    [1, 2, 0, 0, 0, 0],
+    [0, 0, 0, 90, 9, 1],
+])
+
+
+def test_draws_are_subsamples_of_depth_reads():
+    matrix = as_count_matrix(COUNTS[[0, 1, 3]])
+    draws = subsample(matrix, 20, 200, np.random.default_rng(0))
+
+    assert draws.shape == (200, matrix.nnz)
+    assert np.all(draws >= 0) and np.all(draws <= matrix.data)
+    row_sums = np.add.reduceat(draws, matrix.indptr[:-1], axis=1)
+    assert np.all(row_sums == 20)
+
+
+def test_draws_follow_the_multivariate_hypergeometric_law():
+    matrix = as_count_matrix(COUNTS[[0, 3]])
+    draws = subsample(matrix, 25, 20_000, np.random.default_rng(1))
+
+    totals = np.repeat(np.asarray(matrix.sum(axis=1)).ravel(), np.diff(matrix.indptr))
+    np.testing.assert_allclose(draws.mean(axis=0), 25 * matrix.data / totals, rtol=0.03, atol=0.02)
+    reference = np.random.default_rng(2).multivariate_hypergeometric(COUNTS[0], 25, size=20_000)
+    np.testing.assert_allclose(draws[:, :3].var(axis=0), reference[:, [0, 2, 3]].var(axis=0), rtol=0.05)
+
+
+def test_seeded_and_independent_of_the_workers():
+    settings = RarefactionSettings(depth=10, iterations=25, seed=7, workers=1)
+    inline = rarefied_alpha(COUNTS, settings)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        pooled = rarefied_alpha(sparse.csr_matrix(COUNTS), settings, pool)
+
+    for name in inline.mean:
+        np.testing.assert_array_equal(inline.mean[name], pooled.mean[name])
+        np.testing.assert_array_equal(inline.std[name], pooled.std[name])
+    assert np.isnan(inline.mean['shannon'][2]) and not np.isnan(inline.mean['shannon'][[0, 1, 3]]).any()
+    #? every draw of the even sample keeps it even or loses taxa, never gains any
+    assert inline.mean['richness'][1] <= 6
+
+
+def test_wide_sparse_tables_stay_sparse(monkeypatch):
+    #? 4 samples × 5M taxa : a dense draw would need 1.6 GB per iteration
+    wide = sparse.csr_matrix((np.full(8, 40), (np.repeat(np.arange(4), 2), np.arange(0, 5_000_000, 625_000))), shape=(4, 5_000_000))
+    monkeypatch.setattr(rarefaction, 'BLOCK_ENTRIES', 20)
+    result = rarefied_alpha(wide, RarefactionSettings(depth=50, iterations=10, seed=0, workers=1))
+
+    assert np.all(result.mean['richness'] == 2)
@@ -0,0 +1,104 @@
+from pathlib import Path
+import gzip
+
+import pytest
+
+from benchmarks import synthetic
+from myson_tools.command.filter_reads import filter_reads
+from myson_tools.utils.read_filter import FILTERED_SUFFIX, STATS_FILENAME, FilterSettings, Reservoir, load_stats, read_fastq
+
+
+@pytest.fixture
+def fastq_pass(tmp_path: Path, rng) -> Path:
+    """Two patients of two barcodes, 3 chunks of 50 reads of 300 bases each."""
+    fastq_pass = tmp_path / 'fastq_pass'
+    synthetic.write_fastq_tree(fastq_pass, synthetic.make_samples(2, 2, references=False), chunks=3, reads_per_chunk=50, read_length=300, rng=rng)
+    return fastq_pass
+
+
+def staged_reads(path: Path) -> list[bytes]:
+    return [header for header, _, _, _ in read_fastq(path)]
+
+
+def test_filtered_reads_are_staged(fastq_pass, tmp_path):
+    staging = tmp_path / 'fastq_staged'
+    filtered = filter_reads(fastq_pass, staging, FilterSettings(min_length=100), workers=1, force=False)
+
+    assert set(filtered) == {'barcode01', 'barcode02', 'barcode03', 'barcode04'}
+    assert all(stats.reads_in == 150 and stats.reads_kept == 150 for stats in filtered.values())
+    assert len(staged_reads(staging / 'barcode01' / f'barcode01{FILTERED_SUFFIX}')) == 150
+    assert set(load_stats(staging)) == set(filtered)
+
+
+def test_short_reads_are_dropped(fastq_pass, tmp_path):
+    with gzip.open(fastq_pass / 'barcode01' / 'short.fastq.gz', 'wb') as f:
+        f.write(b'@short\nACGT\n+\nIIII\n' * 10)
+    filtered = filter_reads(fastq_pass, tmp_path / 'fastq_staged', FilterSettings(min_length=100), workers=1, force=False)
+
+    assert filtered['barcode01'].reads_in == 160
+    assert filtered['barcode01'].too_short == 10
+    assert filtered['barcode01'].reads_kept == 150
+
+
+def test_empty_barcodes_leave_no_folder_and_are_not_filtered_again(fastq_pass, tmp_path):
+    staging = tmp_path / 'fastq_staged'
+    filter_reads(fastq_pass, staging, FilterSettings(min_length=100), workers=1, force=False)
+    settings = FilterSettings(min_length=100_000)
+    filtered = filter_reads(fastq_pass, staging, settings, workers=1, force=False)
+
+    assert all(stats.reads_kept == 0 for stats in filtered.values())
+    assert [path.name for path in staging.iterdir()] == [STATS_FILENAME]
+    assert filter_reads(fastq_pass, staging, settings, workers=1, force=False) == {}
+
+
+def test_changed_barcode_is_filtered_again(fastq_pass, tmp_path):
+    staging = tmp_path / 'fastq_staged'
+    settings = FilterSettings(min_length=100_000)
+    filter_reads(fastq_pass, staging, settings, workers=1, force=False)
+    with gzip.open(fastq_pass / 'barcode02' / 'late.fastq.gz', 'wb') as f:
+        f.write(b'@late\nACGT\n+\nIIII\n')
+
+    assert set(filter_reads(fastq_pass, staging, settings, workers=1, force=False)) == {'barcode02'}
+
+
+def test_patient_folders_without_reads_are_removed(tmp_path, rng):
+    fastq_pass = tmp_path / 'fastq_pass'
+    synthetic.write_fastq_tree(fastq_pass / 'Patient_P001', synthetic.make_samples(1, 2, references=False), chunks=1, reads_per_chunk=10, read_length=50, rng=rng)
+    staging = tmp_path / 'fastq_staged'
+    filter_reads(fastq_pass, staging, FilterSettings(min_length=1000), workers=1, force=False)
+
+    assert not (staging / 'Patient_P001').exists()
+
+
+def test_reservoir_keeps_a_uniform_sample_in_stream_order():
+    reservoir = Reservoir(size=10, seed=7, label='barcode01')
+    for position in range(1000):
+        reservoir.add(position, b'%d' % position)
+
+    sample = reservoir.sample()
+    assert reservoir.seen == 1000 and len(sample) == 10
+    assert sample == sorted(sample)
+    assert all(record == b'%d' % position for position, _, record in sample)
+
+    #? each read has a size / seen chance to be kept : about 10 % of 200 draws over the first tenth of the stream
+    first_tenth = 0
+    for seed in range(200):
+        reservoir = Reservoir(size=10, seed=seed, label='barcode01')
+        for position in range(100):
+            reservoir.add(position, b'')
+        first_tenth += sum(position < 10 for position, _, _ in reservoir.sample())
+    assert 150 <= first_tenth <= 250
+
+
+def test_capped_reads_are_fixed_by_the_seed(fastq_pass, tmp_path):
+    def capped(seed: int, staging: str) -> list[bytes]:
+        filter_reads(fastq_pass, tmp_path / staging, FilterSettings(min_length=100, max_reads=20, seed=seed), workers=1, force=True)
+        return staged_reads(tmp_path / staging / 'barcode01' / f'barcode01{FILTERED_SUFFIX}')
+
+    first = capped(1, 'run_a')
+    assert len(first) == 20
+    assert capped(1, 'run_b') == first
+    assert capped(2, 'run_c') != first
+    #? another barcode of the same run draws its own sample
+    other = staged_reads(tmp_path / 'run_a' / 'barcode02' / f'barcode02{FILTERED_SUFFIX}')
+    assert len(other) == 20
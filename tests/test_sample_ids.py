@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pandas as pd
+
+from myson_tools.utils import extraction
+from myson_tools.utils.folder_manager import rename_barcode_folders
+from myson_tools.utils.sample_ids import SampleID, normalize_ids, parse_sample_ids
+
+
+def test_sample_id_from_path():
+    path = Path('/data/Patient_old/250101_ICMc_run/fastq_pass/Patient_Tpos_1/barcode07-T+-1')
+
+    sample = SampleID.from_path(path)
+
+    assert sample == SampleID(run='250101_ICMc', barcode=7, patient='Tpos_1', sample_code='T+1')
+    assert sample.barcode_folder == 'barcode07'
+
+
+def test_parse_sample_ids_matches_from_path():
+    paths = [
+        Path('250101_ICMc_run/fastq_pass/Patient_P001/barcode01-P001-S1'),
+        Path('fastq_pass/barcode12'),
+        Path('unclassified'),
+    ]
+
+    parsed = parse_sample_ids(paths)
+
+    for row, path in zip(parsed.itertuples(index=False), paths):
+        sample = SampleID.from_path(path)
+        assert row.barcode == sample.barcode
+        assert (row.run if isinstance(row.run, str) else None) == sample.run
+        assert (row.patient if isinstance(row.patient, str) else None) == sample.patient
+        assert row.sample_code == sample.sample_code
+
+
+def test_normalize_ids_maps_references():
+    ids = pd.Series(['T+ 1', 'T- ', 'P001 S1', 'P002'])
+
+    assert normalize_ids(ids).tolist() == ['Tpos-1', 'Tneg', 'P001-S1', 'P002']
+    assert normalize_ids(ids, is_patient=True).tolist() == ['Tpos_1', 'Tneg', 'P001_S1', 'P002']
+
+
+def test_new_file_name_from_results_folder():
+    run = Path('250101_ICMc_run/2_Results')
+
+    assert extraction.new_file_name(run / 'Results_Patient_P001', 'table.tsv') == 'table-P001.tsv'
+    assert extraction.new_file_name(run / 'Results_Patient_Tpos_1', 'table.tsv') == 'table-250101_ICMc_Tpos_1.tsv'
+
+
+def test_rename_looks_barcodes_up_by_value(tmp_path):
+    for name in ('barcode01', 'barcode03'):
+        (tmp_path / name).mkdir()
+    #? string barcodes : a positional fallback would give barcode 1 the second row and barcode 3 nothing found
+    sheet = pd.DataFrame({'Barcode': ['3', '1'], 'ID échantillon': ['P003 S1', 'P001 S1']})
+
+    rename_barcode_folders(tmp_path, sheet)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['barcode01-P001-S1', 'barcode03-P003-S1']
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+from myson_tools.command import separate_metadata
+from myson_tools.command.separate_metadata import collect_metadata, format_all_runs, index_patients, write_run_metadata
+
+
+@pytest.fixture
+def sheet(samples):
+    patients = sorted({s.patient for s in samples})
+    return pd.DataFrame({'#patientID': patients, 'Age': range(len(patients))})
+
+
+def make_run(workdir, samples, extra_patient: str | None = None):
+    for sample in samples:
+        (workdir / sample.patient_folder / sample.renamed_folder).mkdir(parents=True)
+    if extra_patient:
+        (workdir / f'Patient_{extra_patient}' / 'barcode99-X').mkdir(parents=True)
+    return workdir
+
+
+def test_collect_metadata_skips_references_and_unknown_patients(tmp_path, samples, sheet):
+    workdir = make_run(tmp_path / 'run', samples, extra_patient='UNKNOWN')
+    unmatched = []
+
+    data = collect_metadata(workdir, sheet, index_patients(sheet), verbose=False, unmatched=unmatched)
+
+    expected = sorted(s.renamed_folder for s in samples if s.patient.startswith('P'))
+    assert list(data.columns) == ['#SampleID', '#patientID', 'Age']
+    assert sorted(data['#SampleID']) == expected
+    by_sample = dict(zip(data['#SampleID'], data['#patientID']))
+    assert all(by_sample[s.renamed_folder] == s.patient for s in samples if s.patient.startswith('P'))
+    assert unmatched == [('UNKNOWN', 'barcode99-X')]
+
+
+def test_unknown_patients_are_reported_when_not_verbose(tmp_path, samples, sheet, capsys):
+    workdir = make_run(tmp_path / 'run', samples, extra_patient='UNKNOWN')
+
+    collect_metadata(workdir, sheet, index_patients(sheet), verbose=False)
+
+    assert capsys.readouterr().out.splitlines() == ['[WARNING] Unable to create dataframe: No data found for patient ID: UNKNOWN (barcode99-X)']
+
+
+def test_collect_metadata_of_a_run_without_patients(tmp_path, samples, sheet):
+    references = [s for s in samples if not s.patient.startswith('P')]
+    workdir = make_run(tmp_path / 'run', references)
+
+    data = collect_metadata(workdir, sheet, index_patients(sheet), verbose=False)
+
+    assert data.empty and list(data.columns) == ['#SampleID', '#patientID', 'Age']
+
+
+def test_write_run_metadata_statuses(tmp_path, samples, sheet, monkeypatch):
+    monkeypatch.setattr(separate_metadata, '_worker_df', sheet)
+    monkeypatch.setattr(separate_metadata, '_worker_patients', index_patients(sheet))
+    make_run(tmp_path / 'run1' / 'work', samples, extra_patient='UNKNOWN')
+    make_run(tmp_path / 'run2' / 'work', [s for s in samples if not s.patient.startswith('P')])
+    output = tmp_path / 'metadata'
+    output.mkdir()
+
+    assert write_run_metadata(tmp_path / 'run1', 'work', output, force=False)[::2] == ('created', [('UNKNOWN', 'barcode99-X')])
+    assert write_run_metadata(tmp_path / 'run1', 'work', output, force=False)[::2] == ('exists', [])
+    assert write_run_metadata(tmp_path / 'run1', 'work', output, force=True)[0] == 'created'
+    assert write_run_metadata(tmp_path / 'run2', 'work', output, force=False)[0] == 'empty'
+    assert not (output / 'run2_sample-metadata.tsv').exists()
+
+
+def test_format_all_runs_reads_the_sheet_once_for_every_run(tmp_path, samples, rng, capsys):
+    excel = tmp_path / 'patients.xlsx'
+    synthetic.write_patient_sheet(excel, samples, rng)
+    base = tmp_path / 'base'
+    for run in ('run1', 'run2'):
+        make_run(base / run / 'work', samples, extra_patient='UNKNOWN' if run == 'run2' else None)
+    (base / 'not_a_run').mkdir()
+    output = tmp_path / 'metadata'
+    output.mkdir()
+
+    format_all_runs(base, 'work', excel, output, force=False, workers=1)
+
+    assert sorted(p.name for p in output.iterdir()) == ['run1_sample-metadata.tsv', 'run2_sample-metadata.tsv']
+    data = pd.read_csv(output / 'run1_sample-metadata.tsv', sep='\t')
+    assert list(data.columns) == ['#SampleID', '#patientID', 'Age', 'Sexe', 'Site']
+    assert len(data) == sum(s.patient.startswith('P') for s in samples)
+    warnings = [line for line in capsys.readouterr().out.splitlines() if line.startswith('[WARNING]')]
+    assert warnings == ['[WARNING] run2: Unable to create dataframe: No data found for patient ID: UNKNOWN (barcode99-X)']